@@ -0,0 +1 @@
+"""Performance benchmarks for the pipeline, run with python -m benchmarks."""
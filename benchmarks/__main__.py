@@ -0,0 +1,106 @@
+"""Run or compare benchmarks: python -m benchmarks {run,compare}."""
+
+import argparse
+import sys
+from collections.abc import Sequence
+from datetime import UTC, datetime
+from pathlib import Path
+
+from benchmarks import (  # noqa: F401
+    bench_config,
+    bench_doctags,
+    bench_output,
+    bench_qa,
+    bench_segmentation,
+)
+from benchmarks.runner import (
+    REGISTRY,
+    compare,
+    load_results,
+    time_benchmark,
+    write_results,
+)
+
+RESULTS_DIR = Path(".benchmarks")
+
+
+def run_command(args: argparse.Namespace) -> int:
+    """Time the selected benchmarks and write their results as JSON."""
+    selected = [b for name, b in REGISTRY.items() if args.filter in name]
+    if not selected:
+        print(f"No benchmarks match {args.filter!r}", file=sys.stderr)
+        return 1
+
+    timings = {}
+    for bench in selected:
+        timing = time_benchmark(bench, args.min_time)
+        timings[bench.name] = timing
+        print(
+            f"{bench.name:<55} median {timing.median_s * 1e3:10.3f} ms "
+            f"(min {timing.min_s * 1e3:.3f}, {timing.rounds} rounds, "
+            f"peak +{timing.peak_memory_mb:.1f} MiB)"
+        )
+
+    stamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%S")
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{stamp}.json"
+    write_results(out, timings)
+    print(f"Wrote {out}")
+    return 0
+
+
+def compare_command(args: argparse.Namespace) -> int:
+    """Print median ratios between two runs. Fails on regressions."""
+    ratios = compare(
+        load_results(Path(args.baseline)), load_results(Path(args.current))
+    )
+    regressed = 0
+    for name, ratio in ratios.items():
+        flag = ""
+        if ratio > args.threshold:
+            flag = "  REGRESSED"
+            regressed += 1
+        print(f"{name:<55} {ratio:6.2f}x{flag}")
+    return 1 if regressed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="time benchmarks and write JSON results")
+    run.add_argument(
+        "-k", dest="filter", default="", help="only run names containing this"
+    )
+    run.add_argument(
+        "--min-time",
+        type=float,
+        default=1.0,
+        help="minimum seconds spent timing each benchmark (default 1.0)",
+    )
+    run.add_argument(
+        "--out", help="results file (default .benchmarks/<timestamp>.json)"
+    )
+    run.set_defaults(handler=run_command)
+
+    cmp = commands.add_parser("compare", help="compare two results files")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="median ratio above which a benchmark counts as regressed (default 1.2)",
+    )
+    cmp.set_defaults(handler=compare_command)
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Entry point for python -m benchmarks."""
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Benchmarks for the converter speed/quality profiles."""
+
+from collections.abc import Callable
+
+import torch
+from transformers import GenerationConfig
+
+from benchmarks.bench_doctags import SAMPLE_PDF
+from benchmarks.runner import benchmark
+from benchmarks.standins import tiny_granite_model
+from pipeline.config import CONVERTER_PROFILES
+from pipeline.doctags import render_pdf_pages
+
+# The message docling's picture description model sends with each image
+DESCRIPTION_MESSAGES = [
+    {
+        "role": "user",
+        "content": [
+            {"type": "image"},
+            {"type": "text", "text": "Describe the image in three sentences."},
+        ],
+    }
+]
+
+# docling crops pictures for description at PictureDescriptionBaseOptions.scale
+# (2.0) whatever the profile's images_scale
+DESCRIPTION_DPI = 144
+
+
+def _describe_picture(name: str) -> Callable[[], object]:
+    """Describe the same 2.0-scale picture crop with the profile's settings.
+
+    Only max_new_tokens and sampling differ between profiles. Each
+    description decodes the whole max_new_tokens, the most its cap allows,
+    since the stand-in model never stops on its own.
+    """
+    profile = CONVERTER_PROFILES[name]
+    processor, model = tiny_granite_model(decode_tokens=None)
+    prompt = processor.apply_chat_template(
+        DESCRIPTION_MESSAGES, add_generation_prompt=True
+    )
+    config = GenerationConfig(
+        **profile.generation_config,
+        pad_token_id=model.generation_config.pad_token_id,
+        eos_token_id=model.generation_config.eos_token_id,
+        bos_token_id=model.generation_config.bos_token_id,
+    )
+    page = render_pdf_pages(SAMPLE_PDF, dpi=DESCRIPTION_DPI, page_indices=[0])[0]
+    # A picture-sized region from the middle of the page
+    width, height = page.size
+    crop = page.crop((width // 4, height // 4, 3 * width // 4, height // 2))
+
+    def describe() -> list[str]:
+        inputs = processor(text=prompt, images=[crop], return_tensors="pt")
+        with torch.inference_mode():
+            ids = model.generate(
+                **inputs,
+                generation_config=config,
+                max_new_tokens=profile.max_new_tokens,
+            )
+        return processor.batch_decode(
+            ids[:, inputs["input_ids"].shape[1] :], skip_special_tokens=True
+        )
+
+    return describe
+
+
+def _render_page(name: str) -> Callable[[], object]:
+    """Render a page at the profile's images_scale, as the converter does."""
+    dpi = int(72 * CONVERTER_PROFILES[name].images_scale)
+    return lambda: render_pdf_pages(SAMPLE_PDF, dpi=dpi, page_indices=[0])
+
+
+@benchmark("config", min_rounds=3)
+def describe_picture_fast_profile() -> Callable[[], object]:
+    return _describe_picture("fast")
+
+
+@benchmark("config", min_rounds=3)
+def describe_picture_balanced_profile() -> Callable[[], object]:
+    return _describe_picture("balanced")
+
+
+@benchmark("config", min_rounds=3)
+def describe_picture_quality_profile() -> Callable[[], object]:
+    return _describe_picture("quality")
+
+
+@benchmark("config")
+def render_page_fast_profile() -> Callable[[], object]:
+    return _render_page("fast")
+
+
+@benchmark("config")
+def render_page_balanced_profile() -> Callable[[], object]:
+    return _render_page("balanced")
+
+
+@benchmark("config")
+def render_page_quality_profile() -> Callable[[], object]:
+    return _render_page("quality")
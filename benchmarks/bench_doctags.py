@@ -0,0 +1,81 @@
+"""Benchmarks for PDF rendering and DocTags generation."""
+
+from collections.abc import Callable
+from pathlib import Path
+
+from PIL import Image
+
+from benchmarks.runner import benchmark
+from benchmarks.standins import tiny_doctags_model
+from pipeline.cache import MemoryBlobCache
+from pipeline.doctags import (
+    PageRenderCache,
+    generate_doctags,
+    generate_doctags_batch,
+    parse_doctags,
+    render_pdf_pages,
+)
+
+SAMPLE_PDF = str(Path(__file__).parent.parent / "tests/data/pdf/test_pictures.pdf")
+
+
+def sample_doctags(paragraphs: int = 20, table_rows: int = 10) -> str:
+    """Return a one-page doctags string with a title, paragraphs and a table."""
+    body = "".join(
+        f"<text><loc_20><loc_{40 + i * 10}><loc_480><loc_{48 + i * 10}>"
+        f"Paragraph {i} of the page.</text>"
+        for i in range(paragraphs)
+    )
+    rows = "<fcel>a<fcel>b<fcel>c<nl>" * table_rows
+    return (
+        "<doctag><title><loc_20><loc_10><loc_480><loc_30>Report</title>"
+        f"{body}<otsl><loc_20><loc_300><loc_480><loc_450>{rows}</otsl></doctag>"
+    )
+
+
+@benchmark("doctags")
+def render_pdf_pages_144dpi() -> Callable[[], object]:
+    return lambda: render_pdf_pages(SAMPLE_PDF)
+
+
+@benchmark("doctags")
+def render_pdf_pages_144dpi_2_workers() -> Callable[[], object]:
+    # Warm the pool so worker startup is not timed
+    render_pdf_pages(SAMPLE_PDF, workers=2)
+    return lambda: render_pdf_pages(SAMPLE_PDF, workers=2)
+
+
+@benchmark("doctags")
+def render_pdf_pages_144dpi_cached() -> Callable[[], object]:
+    # Compare with render_pdf_pages_144dpi: pages are decoded from PNG
+    cache = PageRenderCache(MemoryBlobCache(256 * 1024**2))
+    render_pdf_pages(SAMPLE_PDF, cache=cache)
+    return lambda: render_pdf_pages(SAMPLE_PDF, cache=cache)
+
+
+@benchmark("doctags")
+def render_pdf_pages_72dpi_from_144dpi_cache() -> Callable[[], object]:
+    cache = PageRenderCache(MemoryBlobCache(256 * 1024**2))
+    render_pdf_pages(SAMPLE_PDF, cache=cache)
+    return lambda: render_pdf_pages(SAMPLE_PDF, dpi=72, cache=cache)
+
+
+@benchmark("doctags")
+def parse_doctags_page() -> Callable[[], object]:
+    doctags = sample_doctags()
+    image = Image.new("RGB", (1224, 1584), "white")
+    return lambda: parse_doctags(doctags, image)
+
+
+@benchmark("doctags", min_rounds=3)
+def generate_doctags_page() -> Callable[[], object]:
+    processor, model = tiny_doctags_model()
+    page = render_pdf_pages(SAMPLE_PDF, page_indices=[0])[0]
+    return lambda: generate_doctags(page, processor, model)
+
+
+@benchmark("doctags", min_rounds=3)
+def generate_doctags_batch_3_pages() -> Callable[[], object]:
+    processor, model = tiny_doctags_model()
+    pages = render_pdf_pages(SAMPLE_PDF)
+    return lambda: generate_doctags_batch(pages, processor, model, batch_size=3)
@@ -0,0 +1,181 @@
+"""Benchmarks for building the extraction output."""
+
+import json
+import os
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+
+from docling_core.types.doc.document import (
+    DescriptionMetaField,
+    DoclingDocument,
+    PictureMeta,
+    TableCell,
+    TableData,
+)
+from docling_core.types.doc.labels import DocItemLabel
+
+from benchmarks.runner import benchmark
+from pipeline.output import DocumentView, build_output, extract_table, write_output
+from pipeline.parquet import open_parquet_dataset, write_parquet
+
+
+def sample_document(
+    pictures: int = 50, tables: int = 20, rows: int = 20, cols: int = 8
+) -> DoclingDocument:
+    """Return a document with captioned, described pictures and tables."""
+    doc = DoclingDocument(name="sample")
+    for i in range(pictures):
+        caption = doc.add_text(label=DocItemLabel.CAPTION, text=f"Figure {i}.")
+        pic = doc.add_picture(caption=caption)
+        pic.meta = PictureMeta(
+            description=DescriptionMetaField(
+                text=f"A chart showing series {i}.", created_by="benchmark"
+            )
+        )
+    for i in range(tables):
+        cells = [
+            TableCell(
+                text=f"r{r}c{c}",
+                start_row_offset_idx=r,
+                end_row_offset_idx=r + 1,
+                start_col_offset_idx=c,
+                end_col_offset_idx=c + 1,
+                column_header=r == 0,
+            )
+            for r in range(rows)
+            for c in range(cols)
+        ]
+        caption = doc.add_text(label=DocItemLabel.CAPTION, text=f"Table {i}.")
+        doc.add_table(
+            data=TableData(table_cells=cells, num_rows=rows, num_cols=cols),
+            caption=caption,
+        )
+    return doc
+
+
+@benchmark("output")
+def build_output_50_pictures_20_tables() -> Callable[[], object]:
+    doc = sample_document()
+    return lambda: build_output(doc, 1.0)
+
+
+@benchmark("output")
+def build_output_50_pictures_20_tables_4_threads() -> Callable[[], object]:
+    # Compare with build_output_50_pictures_20_tables on a multi-core machine
+    doc = sample_document()
+    return lambda: build_output(doc, 1.0, view=DocumentView(doc, workers=4))
+
+
+@benchmark("output")
+def build_output_from_built_view_50_pictures_20_tables() -> Callable[[], object]:
+    # A rerun of the Streamlit page: elements are read from the job's view
+    doc = sample_document()
+    view = DocumentView(doc)
+    view.elements()
+    return lambda: build_output(doc, 1.0, view=view)
+
+
+@benchmark("output")
+def dumps_output_json_50_pictures_20_tables() -> Callable[[], object]:
+    doc = sample_document()
+    return lambda: json.dumps(build_output(doc, 1.0), indent=2)
+
+
+@benchmark("output")
+def write_output_json_50_pictures_20_tables() -> Callable[[], object]:
+    # Compare with dumps_output_json_50_pictures_20_tables
+    doc = sample_document()
+
+    def write() -> None:
+        with open(os.devnull, "w") as f:
+            write_output(doc, 1.0, f)
+
+    return write
+
+
+def _table_exports(rows: int, cols: int) -> Callable[[], object]:
+    # The DataFrame round-trip plus markdown export get_table_content used
+    doc = sample_document(pictures=0, tables=1, rows=rows, cols=cols)
+    table = doc.tables[0]
+
+    def export() -> object:
+        df = table.export_to_dataframe(doc=doc)
+        columns = [str(c) for c in df.columns]
+        return columns, df.values.tolist(), table.export_to_markdown(doc=doc)
+
+    return export
+
+
+def _extract_table(rows: int, cols: int) -> Callable[[], object]:
+    doc = sample_document(pictures=0, tables=1, rows=rows, cols=cols)
+    return lambda: extract_table(doc.tables[0], doc)
+
+
+@benchmark("output")
+def docling_table_exports_5000_cells() -> Callable[[], object]:
+    return _table_exports(500, 10)
+
+
+@benchmark("output")
+def extract_table_5000_cells() -> Callable[[], object]:
+    return _extract_table(500, 10)
+
+
+@benchmark("output")
+def docling_table_exports_20000_cells() -> Callable[[], object]:
+    return _table_exports(2000, 10)
+
+
+@benchmark("output")
+def extract_table_20000_cells() -> Callable[[], object]:
+    return _extract_table(2000, 10)
+
+
+@benchmark("output")
+def write_parquet_50_pictures_20_tables() -> Callable[[], object]:
+    # Compare with write_output_json_50_pictures_20_tables
+    doc = sample_document()
+    directory = tempfile.TemporaryDirectory()
+    return lambda: (directory, write_parquet(doc, 1.0, directory.name, "doc"))
+
+
+def _corpus(documents: int) -> tuple[tempfile.TemporaryDirectory, Path]:
+    """Write documents sample documents as JSON files and as a Parquet dataset."""
+    directory = tempfile.TemporaryDirectory()
+    root = Path(directory.name)
+    doc = sample_document()
+    (root / "json").mkdir()
+    for i in range(documents):
+        with open(root / "json" / f"{i}.json", "w") as f:
+            write_output(doc, 1.0, f)
+        write_parquet(doc, 1.0, root / "parquet", str(i))
+    return directory, root
+
+
+@benchmark("output")
+def load_table_values_json_100_documents() -> Callable[[], object]:
+    directory, root = _corpus(100)
+
+    def load() -> object:
+        values = []
+        for path in sorted((root / "json").iterdir()):
+            with open(path) as f:
+                for element in json.load(f)["elements"]:
+                    if element["type"] == "table":
+                        for row in element["content"]["data"]["rows"]:
+                            values += row
+        return directory, values
+
+    return load
+
+
+@benchmark("output")
+def load_table_values_parquet_100_documents() -> Callable[[], object]:
+    # Compare with load_table_values_json_100_documents
+    directory, root = _corpus(100)
+    dataset = root / "parquet"
+    return lambda: (
+        directory,
+        open_parquet_dataset(dataset, "table_cells").to_table(columns=["value"]),
+    )
@@ -0,0 +1,90 @@
+"""Benchmarks for multipage QA."""
+
+from collections.abc import Callable
+
+from benchmarks.bench_doctags import SAMPLE_PDF
+from benchmarks.runner import benchmark
+from benchmarks.standins import tiny_granite_model
+from pipeline.doctags import render_pdf_pages
+from pipeline.qa import (
+    QA_MAX_DIM,
+    QASession,
+    generate_qa_response,
+    qa_feature_cache,
+    resize_for_qa,
+    stream_qa_response,
+)
+
+
+@benchmark("qa")
+def resize_for_qa_page() -> Callable[[], object]:
+    page = render_pdf_pages(SAMPLE_PDF, page_indices=[0])[0]
+    return lambda: resize_for_qa(page)
+
+
+@benchmark("qa")
+def render_qa_pages_144dpi_then_resize() -> Callable[[], object]:
+    return lambda: [resize_for_qa(page) for page in render_pdf_pages(SAMPLE_PDF)]
+
+
+@benchmark("qa")
+def render_qa_pages_at_max_dim() -> Callable[[], object]:
+    # Compare with render_qa_pages_144dpi_then_resize
+    return lambda: render_pdf_pages(SAMPLE_PDF, max_dim=QA_MAX_DIM)
+
+
+@benchmark("qa", min_rounds=3)
+def generate_qa_response_1_page() -> Callable[[], object]:
+    processor, model = tiny_granite_model()
+    pages = render_pdf_pages(SAMPLE_PDF, page_indices=[0])
+
+    def answer() -> str:
+        qa_feature_cache(model).clear()
+        return generate_qa_response(pages, "What is shown?", processor, model)
+
+    return answer
+
+
+@benchmark("qa", min_rounds=3)
+def generate_qa_response_3_pages() -> Callable[[], object]:
+    processor, model = tiny_granite_model()
+    pages = render_pdf_pages(SAMPLE_PDF)
+
+    def answer() -> str:
+        qa_feature_cache(model).clear()
+        return generate_qa_response(pages, "What is shown?", processor, model)
+
+    return answer
+
+
+@benchmark("qa", min_rounds=3)
+def generate_qa_response_3_pages_cached_features() -> Callable[[], object]:
+    processor, model = tiny_granite_model()
+    pages = render_pdf_pages(SAMPLE_PDF)
+    generate_qa_response(pages, "What is shown?", processor, model)
+    return lambda: generate_qa_response(pages, "What is shown?", processor, model)
+
+
+@benchmark("qa", min_rounds=3)
+def qa_session_follow_up_3_pages() -> Callable[[], object]:
+    # Compare with generate_qa_response_3_pages: the page prefix is cached
+    processor, model = tiny_granite_model()
+    session = QASession(render_pdf_pages(SAMPLE_PDF))
+    session.ask("What is shown?", processor, model)
+    return lambda: session.ask("What is shown?", processor, model)
+
+
+@benchmark("qa", min_rounds=3)
+def stream_qa_response_first_chunk_1_page() -> Callable[[], object]:
+    processor, model = tiny_granite_model()
+    pages = render_pdf_pages(SAMPLE_PDF, page_indices=[0])
+
+    def first_chunk() -> str:
+        qa_feature_cache(model).clear()
+        chunks = stream_qa_response(pages, "What is shown?", processor, model)
+        try:
+            return next(chunks, "")
+        finally:
+            chunks.close()
+
+    return first_chunk
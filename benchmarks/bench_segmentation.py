@@ -0,0 +1,165 @@
+"""Benchmarks for segmentation mask handling."""
+
+import re
+from collections.abc import Callable
+
+import torch
+from PIL import Image
+
+from benchmarks.runner import benchmark
+from benchmarks.standins import tiny_granite_model, tiny_sam_model
+from pipeline.segmentation import (
+    _generate_segmentations,
+    compute_logits_from_mask,
+    decode_segmentation,
+    draw_mask,
+    extract_segmentation,
+    prepare_mask,
+    refine_many_with_sam,
+    refine_with_sam,
+    sam_embedding_cache,
+    sample_points,
+)
+
+IMAGE_SIZE = (1024, 768)
+
+
+def sample_segmentation(patch_h: int = 24, patch_w: int = 24) -> str:
+    """Return <seg> run-length text for a centred object on a patch grid."""
+    left, width = patch_w // 4, patch_w // 2
+    background = f"others *{patch_w}"
+    object_row = f"others *{left}| dog *{width}| others *{patch_w - left - width}"
+    rows = [
+        object_row if patch_h // 4 <= y < 3 * patch_h // 4 else background
+        for y in range(patch_h)
+    ]
+    return "<seg>" + "\n".join(rows) + "</seg>"
+
+
+def _extract_segmentation_lists(
+    text: str, patch_h: int = 24, patch_w: int = 24
+) -> list[int] | None:
+    """The list-based decoder extract_segmentation used before decode_segmentation.
+
+    Kept as the baseline the vectorized decoder is measured against.
+    """
+    match = re.search(r"<seg>(.*?)</seg>", text, re.DOTALL)
+    if match is None:
+        return None
+    try:
+        rows = match.group(1).strip().split("\n")
+        tokens = [token.split(" *") for row in rows for token in row.split("| ")]
+        tokens = [x[0].strip() for x in tokens for _ in range(int(x[1]))]
+    except (IndexError, ValueError):
+        return None
+
+    mask = [0 if item == "others" else 1 for item in tokens]
+
+    total_size = patch_h * patch_w
+    if len(mask) < total_size:
+        mask = mask + [mask[-1]] * (total_size - len(mask))
+    elif len(mask) > total_size:
+        mask = mask[:total_size]
+    return mask
+
+
+def _coarse_mask() -> torch.Tensor:
+    flat = extract_segmentation(sample_segmentation())
+    assert flat is not None
+    return prepare_mask(flat, 24, 24, IMAGE_SIZE)
+
+
+@benchmark("segmentation")
+def extract_segmentation_24x24() -> Callable[[], object]:
+    text = sample_segmentation()
+    return lambda: extract_segmentation(text)
+
+
+@benchmark("segmentation")
+def extract_segmentation_lists_24x24() -> Callable[[], object]:
+    text = sample_segmentation()
+    return lambda: _extract_segmentation_lists(text)
+
+
+@benchmark("segmentation")
+def decode_segmentation_96x96() -> Callable[[], object]:
+    text = sample_segmentation(96, 96)
+    return lambda: decode_segmentation(text, 96, 96)
+
+
+@benchmark("segmentation")
+def extract_segmentation_lists_96x96() -> Callable[[], object]:
+    text = sample_segmentation(96, 96)
+    return lambda: _extract_segmentation_lists(text, 96, 96)
+
+
+@benchmark("segmentation")
+def prepare_mask_24x24() -> Callable[[], object]:
+    flat = extract_segmentation(sample_segmentation())
+    assert flat is not None
+    return lambda: prepare_mask(flat, 24, 24, IMAGE_SIZE)
+
+
+@benchmark("segmentation")
+def sample_points_coarse_mask() -> Callable[[], object]:
+    mask = _coarse_mask()
+    return lambda: sample_points(mask, seed=0)
+
+
+@benchmark("segmentation")
+def compute_logits_from_mask_coarse_mask() -> Callable[[], object]:
+    mask = _coarse_mask()
+    return lambda: compute_logits_from_mask(mask)
+
+
+@benchmark("segmentation")
+def draw_mask_overlay() -> Callable[[], object]:
+    mask = Image.fromarray((_coarse_mask() * 255).to(torch.uint8).numpy())
+    image = Image.new("RGB", IMAGE_SIZE, (120, 160, 200))
+    return lambda: draw_mask(mask, image)
+
+
+@benchmark("segmentation", min_rounds=3)
+def refine_with_sam_cold() -> Callable[[], object]:
+    sam = tiny_sam_model()
+    mask = _coarse_mask()
+    image = Image.new("RGB", IMAGE_SIZE, (120, 160, 200))
+
+    def refine() -> torch.Tensor:
+        sam_embedding_cache(sam[1]).clear()
+        return refine_with_sam(mask, image, sam)
+
+    return refine
+
+
+@benchmark("segmentation", min_rounds=3)
+def refine_with_sam_cached_embedding() -> Callable[[], object]:
+    sam = tiny_sam_model()
+    mask = _coarse_mask()
+    image = Image.new("RGB", IMAGE_SIZE, (120, 160, 200))
+    return lambda: refine_with_sam(mask, image, sam)
+
+
+PROMPTS = ["the dog", "the cat", "the sofa", "the lamp"]
+
+
+@benchmark("segmentation", min_rounds=3)
+def generate_segmentations_4_prompts_sequential() -> Callable[[], object]:
+    granite = tiny_granite_model()
+    images = [Image.new("RGB", IMAGE_SIZE, (120, 160, 200))] * len(PROMPTS)
+    return lambda: _generate_segmentations(images, PROMPTS, granite, batch_size=1)
+
+
+@benchmark("segmentation", min_rounds=3)
+def generate_segmentations_4_prompts_batched() -> Callable[[], object]:
+    granite = tiny_granite_model()
+    images = [Image.new("RGB", IMAGE_SIZE, (120, 160, 200))] * len(PROMPTS)
+    return lambda: _generate_segmentations(images, PROMPTS, granite, batch_size=4)
+
+
+@benchmark("segmentation", min_rounds=3)
+def refine_many_with_sam_4_masks() -> Callable[[], object]:
+    sam = tiny_sam_model()
+    image = Image.new("RGB", IMAGE_SIZE, (120, 160, 200))
+    masks = [_coarse_mask()] * len(PROMPTS)
+    return lambda: refine_many_with_sam(masks, [image] * len(masks), sam)
@@ -0,0 +1,165 @@
+"""Benchmark registry, timer and JSON results."""
+
+import json
+import platform
+import statistics
+import subprocess
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+import psutil
+import torch
+import transformers
+
+# A benchmark is a setup function returning the callable to time, so loading
+# models and building inputs stays out of the measurement
+Setup = Callable[[], Callable[[], object]]
+
+
+@dataclass
+class Benchmark:
+    """A registered benchmark."""
+
+    name: str
+    group: str
+    setup: Setup
+    min_rounds: int
+
+
+@dataclass
+class Timing:
+    """Wall-clock timings of one benchmark, in seconds.
+
+    peak_memory_mb is how far the process's resident memory rose above its
+    starting value during the warm-up call, in MiB.
+    """
+
+    group: str
+    rounds: int
+    min_s: float
+    median_s: float
+    mean_s: float
+    stdev_s: float
+    peak_memory_mb: float = 0.0
+
+
+REGISTRY: dict[str, Benchmark] = {}
+
+
+def benchmark(group: str, min_rounds: int = 5) -> Callable[[Setup], Setup]:
+    """Register a setup function as the benchmark group.<function name>."""
+
+    def register(setup: Setup) -> Setup:
+        name = f"{group}.{setup.__name__}"  # type: ignore[unresolved-attribute]
+        REGISTRY[name] = Benchmark(name, group, setup, min_rounds)
+        return setup
+
+    return register
+
+
+def peak_memory_growth(fn: Callable[[], object], interval_s: float = 0.001) -> int:
+    """Call fn and return how far resident memory rose above its start, in bytes.
+
+    Memory is sampled every interval_s on a background thread, so peaks
+    shorter than that can be missed.
+    """
+    process = psutil.Process()
+    start = peak = process.memory_info().rss
+    done = threading.Event()
+
+    def sample() -> None:
+        nonlocal peak
+        while not done.wait(interval_s):
+            peak = max(peak, process.memory_info().rss)
+
+    sampler = threading.Thread(target=sample, name="memory-sampler", daemon=True)
+    sampler.start()
+    try:
+        fn()
+    finally:
+        done.set()
+        sampler.join()
+    return max(peak, process.memory_info().rss) - start
+
+
+def time_benchmark(bench: Benchmark, min_time_s: float = 1.0) -> Timing:
+    """Time a benchmark after one warm-up call, which measures peak memory.
+
+    Rounds repeat until both min_rounds and min_time_s are reached.
+    """
+    fn = bench.setup()
+    peak_memory = peak_memory_growth(fn)
+    samples: list[float] = []
+    start = time.perf_counter()
+    while len(samples) < bench.min_rounds or time.perf_counter() - start < min_time_s:
+        t0 = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - t0) / 1e9)
+    return Timing(
+        group=bench.group,
+        rounds=len(samples),
+        min_s=min(samples),
+        median_s=statistics.median(samples),
+        mean_s=statistics.fmean(samples),
+        stdev_s=statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        peak_memory_mb=peak_memory / 1024**2,
+    )
+
+
+def _git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def environment() -> dict[str, Any]:
+    """Describe the machine and library versions a run was made with."""
+    return {
+        "created": datetime.now(UTC).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "transformers": transformers.__version__,
+    }
+
+
+def write_results(path: Path, timings: dict[str, Timing]) -> None:
+    """Write a run's environment and timings as JSON."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    results = {
+        "environment": environment(),
+        "benchmarks": {name: asdict(t) for name, t in timings.items()},
+    }
+    path.write_text(json.dumps(results, indent=2) + "\n")
+
+
+def load_results(path: Path) -> dict[str, dict[str, Any]]:
+    """Return the per-benchmark timings stored in a results file."""
+    return json.loads(path.read_text())["benchmarks"]
+
+
+def compare(
+    baseline: dict[str, dict[str, Any]],
+    current: dict[str, dict[str, Any]],
+) -> dict[str, float]:
+    """Return current/baseline median ratios for benchmarks present in both."""
+    return {
+        name: current[name]["median_s"] / baseline[name]["median_s"]
+        for name in sorted(baseline.keys() & current.keys())
+        if baseline[name]["median_s"] > 0
+    }
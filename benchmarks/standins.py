@@ -0,0 +1,204 @@
+"""Tiny randomly initialised stand-ins for the pipeline's models.
+
+They share the real architectures and processors (Idefics3 for Granite
+Docling, LLaVA-NeXT for Granite Vision, SAM), scaled down so a benchmark
+run needs no downloads and finishes on a CPU. Their output is noise; only
+the shape of the work is realistic.
+"""
+
+from typing import Any
+
+import torch
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+from transformers import (
+    CLIPVisionConfig,
+    Idefics3Config,
+    Idefics3ForConditionalGeneration,
+    Idefics3ImageProcessor,
+    Idefics3Processor,
+    LlamaConfig,
+    LlavaNextConfig,
+    LlavaNextForConditionalGeneration,
+    LlavaNextImageProcessor,
+    LlavaNextProcessor,
+    PreTrainedTokenizerFast,
+    SamConfig,
+    SamImageProcessor,
+    SamModel,
+    SamProcessor,
+)
+
+# Decode steps per generate call, whatever max_new_tokens the caller passes
+DECODE_TOKENS = 32
+
+CHAT_TEMPLATE = (
+    "{%- for message in messages -%}"
+    "<|start_of_role|>{{ message['role'] }}<|end_of_role|>"
+    "{%- for part in message['content'] -%}"
+    "{%- if part['type'] == 'image' -%}<image>"
+    "{%- elif part['type'] == 'text' -%}{{ part['text'] }}"
+    "{%- endif -%}"
+    "{%- endfor -%}"
+    "<|end_of_text|>\n"
+    "{%- endfor -%}"
+    "{%- if add_generation_prompt -%}<|start_of_role|>assistant<|end_of_role|>"
+    "{%- endif -%}"
+)
+
+
+def _tokenizer(extra_tokens: list[str]) -> PreTrainedTokenizerFast:
+    """Byte-level tokenizer with no merges: one token per byte plus extras."""
+    alphabet = pre_tokenizers.ByteLevel.alphabet()
+    vocab = {char: i for i, char in enumerate(sorted(alphabet))}
+    backend = Tokenizer(models.BPE(vocab=vocab, merges=[]))
+    backend.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    backend.decoder = decoders.ByteLevel()
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend,
+        eos_token="<|end_of_text|>",
+        pad_token="<|pad|>",
+        model_input_names=["input_ids", "attention_mask"],
+        additional_special_tokens=[
+            "<|start_of_role|>",
+            "<|end_of_role|>",
+            "<image>",
+        ],
+    )
+    tokenizer.add_tokens(extra_tokens)
+    return tokenizer
+
+
+def _text_config(vocab_size: int, pad_token_id: int) -> LlamaConfig:
+    return LlamaConfig(
+        vocab_size=vocab_size,
+        hidden_size=64,
+        intermediate_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=8192,
+        pad_token_id=pad_token_id,
+    )
+
+
+def _fix_decode_length(
+    model: Any, tokenizer: PreTrainedTokenizerFast, tokens: int | None = DECODE_TOKENS
+) -> None:
+    """Make every generate call decode exactly tokens tokens.
+
+    A random model emits end-of-sequence at random or never, so the budget
+    the pipeline asks for (up to 8192) is replaced by a fixed count. With
+    tokens=None each call decodes its whole max_new_tokens instead, the
+    most that budget allows.
+    """
+    generate = model.generate
+
+    def fixed_generate(*args, **kwargs):
+        if tokens is not None:
+            kwargs["max_new_tokens"] = tokens
+        kwargs["min_new_tokens"] = kwargs["max_new_tokens"]
+        return generate(*args, **kwargs)
+
+    model.generate = fixed_generate
+    model.generation_config.eos_token_id = tokenizer.eos_token_id
+    model.generation_config.pad_token_id = tokenizer.pad_token_id
+    model.generation_config.do_sample = False
+
+
+def tiny_doctags_model() -> tuple[Any, Any]:
+    """Granite Docling stand-in: Idefics3 with 64px tiles, up to 4x4 per page."""
+    torch.manual_seed(0)
+    row_col = [f"<row_{i}_col_{j}>" for i in range(1, 7) for j in range(1, 7)]
+    tokenizer = _tokenizer(["<global-img>", *row_col])
+    processor = Idefics3Processor(
+        image_processor=Idefics3ImageProcessor(
+            size={"longest_edge": 256}, max_image_size={"longest_edge": 64}
+        ),
+        tokenizer=tokenizer,
+        image_seq_len=4,
+        chat_template=CHAT_TEMPLATE,
+    )
+    config = Idefics3Config(
+        vision_config={
+            "hidden_size": 32,
+            "intermediate_size": 64,
+            "num_hidden_layers": 2,
+            "num_attention_heads": 2,
+            "image_size": 64,
+            "patch_size": 16,
+        },
+        text_config=_text_config(len(tokenizer), tokenizer.pad_token_id).to_dict(),
+        scale_factor=2,
+        image_token_id=processor.image_token_id,
+        pad_token_id=tokenizer.pad_token_id,
+    )
+    model = Idefics3ForConditionalGeneration(config).eval()
+    _fix_decode_length(model, tokenizer)
+    return processor, model
+
+
+def tiny_granite_model(decode_tokens: int | None = DECODE_TOKENS) -> tuple[Any, Any]:
+    """Granite Vision stand-in: LLaVA-NeXT with a 32px CLIP tower.
+
+    generate decodes decode_tokens tokens, or all of max_new_tokens if None.
+    """
+    torch.manual_seed(0)
+    tokenizer = _tokenizer([])
+    pinpoints = [[32, 64], [64, 32], [64, 64]]
+    processor = LlavaNextProcessor(
+        image_processor=LlavaNextImageProcessor(
+            size={"shortest_edge": 32},
+            crop_size={"height": 32, "width": 32},
+            image_grid_pinpoints=pinpoints,
+        ),
+        tokenizer=tokenizer,
+        patch_size=8,
+        vision_feature_select_strategy="default",
+        chat_template=CHAT_TEMPLATE,
+        num_additional_image_tokens=1,
+    )
+    config = LlavaNextConfig(
+        vision_config=CLIPVisionConfig(
+            hidden_size=32,
+            intermediate_size=64,
+            num_hidden_layers=2,
+            num_attention_heads=2,
+            image_size=32,
+            patch_size=8,
+            projection_dim=32,
+        ).to_dict(),
+        text_config=_text_config(len(tokenizer), tokenizer.pad_token_id).to_dict(),
+        image_grid_pinpoints=pinpoints,
+        image_token_index=tokenizer.convert_tokens_to_ids("<image>"),
+        vision_feature_layer=-1,
+        vision_feature_select_strategy="default",
+    )
+    model = LlavaNextForConditionalGeneration(config).eval()
+    _fix_decode_length(model, tokenizer, decode_tokens)
+    return processor, model
+
+
+def tiny_sam_model() -> tuple[SamProcessor, SamModel]:
+    """SAM stand-in: a two-layer ViT encoder at SAM's 1024px input size."""
+    torch.manual_seed(0)
+    config = SamConfig(
+        vision_config={
+            "hidden_size": 32,
+            "output_channels": 32,
+            "num_hidden_layers": 2,
+            "num_attention_heads": 2,
+            "mlp_dim": 64,
+            "global_attn_indexes": [1],
+            "window_size": 8,
+            "num_pos_feats": 16,
+        },
+        prompt_encoder_config={"hidden_size": 32},
+        mask_decoder_config={
+            "hidden_size": 32,
+            "mlp_dim": 64,
+            "num_hidden_layers": 2,
+            "num_attention_heads": 2,
+            "iou_head_hidden_dim": 32,
+        },
+    )
+    return SamProcessor(SamImageProcessor()), SamModel(config).eval()
@@ -1,20 +1,98 @@
+import hashlib
+import io
 import tempfile
 import time
+from itertools import batched
 from pathlib import Path
+from typing import Any
 
 import streamlit as st
-from docling_core.types.doc.document import DoclingDocument
 from PIL import Image
 
 from pipeline import (
+    Job,
+    PageRenderCache,
+    count_pdf_pages,
     create_doctags_model,
+    create_render_cache,
     export_markdown,
     generate_doctags,
+    generate_doctags_batch,
+    get_job,
+    iter_pdf_pages,
     parse_doctags,
-    render_pdf_pages,
+    submit_job,
+    using_model,
 )
+from pipeline.models import GRANITE_DOCLING_REPO
+
+BATCH_SIZE = 4
+THUMBNAIL_SIZE = 1024
+THUMBNAIL_QUALITY = 85
+
+render_cache = st.cache_resource(create_render_cache)
+
+
+def pdf_doctags_job(job: Job, data: bytes, cache: PageRenderCache) -> dict[str, Any]:
+    """Generate doctags for every page of a PDF, reporting per batch."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+        tmp_file.write(data)
+        tmp_path = tmp_file.name
+    try:
+        num_pages = count_pdf_pages(tmp_path)
+        start = time.perf_counter_ns()
+
+        all_doctags: list[str] = []
+        all_markdown: list[str] = []
+        all_parsed: list[bool] = []
+        thumbnails: list[bytes] = []
+
+        with using_model(create_doctags_model) as (processor, model):
+            # Pages are rendered lazily, once per PDF across runs; only JPEG
+            # thumbnails are kept for display
+            pages = iter_pdf_pages(tmp_path, cache=cache)
+            for batch in batched(pages, BATCH_SIZE):
+                raws = generate_doctags_batch(
+                    batch, processor, model, batch_size=BATCH_SIZE
+                )
+                for raw, page_image in zip(raws, batch, strict=True):
+                    doc = parse_doctags(raw, page_image) if raw else None
+                    all_doctags.append(raw)
+                    all_parsed.append(doc is not None)
+                    all_markdown.append(export_markdown(doc) if doc else "")
+                    page_image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+                    buf = io.BytesIO()
+                    page_image.save(buf, format="JPEG", quality=THUMBNAIL_QUALITY)
+                    thumbnails.append(buf.getvalue())
+                done = len(all_doctags)
+                job.update(
+                    progress=done / num_pages,
+                    message=f"Processed {done} of {num_pages} pages...",
+                )
+
+        return {
+            "num_pages": num_pages,
+            "duration_s": (time.perf_counter_ns() - start) / 1e9,
+            "doctags": all_doctags,
+            "markdown": all_markdown,
+            "parsed": all_parsed,
+            "thumbnails": thumbnails,
+        }
+    finally:
+        Path(tmp_path).unlink(missing_ok=True)
+
+
+def image_doctags_job(job: Job, image: Image.Image) -> dict[str, Any]:
+    """Generate doctags for one image."""
+    start = time.perf_counter_ns()
+    with using_model(create_doctags_model) as (processor, model):
+        raw_doctags = generate_doctags(image, processor, model)
+    return {
+        "duration_s": (time.perf_counter_ns() - start) / 1e9,
+        "doctags": raw_doctags,
+        "image": image,
+    }
 
-doctags_model = st.cache_resource(create_doctags_model)
 
 st.title("DocTags Generation (Experimental)")
 st.write(
@@ -28,45 +106,50 @@ is_pdf = uploaded_file is not None and uploaded_file.name.lower().endswith(".pdf
 
 if st.button("Generate", type="primary", disabled=not uploaded_file):
     assert uploaded_file is not None
-    processor, model = doctags_model()
-
+    data = uploaded_file.getvalue()
+    # Identical uploads, from any session, share one job and its result
+    key = f"doctags:{hashlib.sha256(data).hexdigest()}"
     if is_pdf:
-        tmp_path: str | None = None
-        try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                tmp_file.write(uploaded_file.read())
-                tmp_path = tmp_file.name
-
-            with st.spinner("Rendering PDF pages..."):
-                page_images = render_pdf_pages(tmp_path)
-
-            num_pages = len(page_images)
-            progress = st.progress(0, text="Generating doctags...")
-            start = time.perf_counter_ns()
-
-            all_doctags: list[str] = []
-            all_markdown: list[str] = []
-            all_docs: list[DoclingDocument | None] = []
-
-            for i, page_image in enumerate(page_images):
-                progress.progress(
-                    (i + 1) / num_pages,
-                    text=f"Processing page {i + 1} of {num_pages}...",
-                )
-                raw = generate_doctags(page_image, processor, model)
-                all_doctags.append(raw)
-
-                doc = parse_doctags(raw, page_image) if raw else None
-                all_docs.append(doc)
-                all_markdown.append(export_markdown(doc) if doc else "")
-
-            duration_s = (time.perf_counter_ns() - start) / 1e9
-            progress.empty()
-
+        job = submit_job(
+            pdf_doctags_job,
+            data,
+            render_cache(),
+            lane=GRANITE_DOCLING_REPO,
+            key=key,
+        )
+    else:
+        image = Image.open(io.BytesIO(data)).convert("RGB")
+        job = submit_job(image_doctags_job, image, lane=GRANITE_DOCLING_REPO, key=key)
+    st.session_state["doctags_job"] = (job.id, uploaded_file.name, is_pdf)
+
+# The job outlives reruns, so its result is shown until another is submitted
+submitted = st.session_state.get("doctags_job")
+job = get_job(submitted[0]) if submitted is not None else None
+if submitted is not None and job is None:
+    # Finished results are dropped after PIPELINE_JOB_RESULT_TTL_S; say so
+    st.info("This result has expired. Submit it again to see it.")
+    del st.session_state["doctags_job"]
+if submitted is not None and job is not None:
+    _, file_name, job_is_pdf = submitted
+    progress = st.progress(0.0, text="Waiting for the model...")
+    # Poll rather than block, so the page can still rerun while a job runs
+    while not job.wait(0.25):
+        if job.status == "running":
+            progress.progress(job.progress, text=job.message or "Generating doctags...")
+        else:
+            progress.progress(0.0, text="Waiting for the model...")
+    progress.empty()
+    if job.status == "failed":
+        st.error(f"DocTags generation failed: {job.error}")
+    elif job.status == "done":
+        result = job.result
+        if job_is_pdf:
             col1, col2 = st.columns(2)
-            col1.metric("Pages", num_pages)
-            col2.metric("Duration (s)", f"{duration_s:.2f}")
+            col1.metric("Pages", result["num_pages"])
+            col2.metric("Duration (s)", f"{result['duration_s']:.2f}")
 
+            all_doctags = result["doctags"]
+            all_markdown = result["markdown"]
             combined_doctags = "\n\n".join(all_doctags)
             combined_markdown = "\n\n---\n\n".join(md for md in all_markdown if md)
 
@@ -74,25 +157,25 @@ if st.button("Generate", type="primary", disabled=not uploaded_file):
             dl_col1.download_button(
                 label="Download all doctags",
                 data=combined_doctags,
-                file_name=f"{uploaded_file.name}_doctags.txt",
+                file_name=f"{file_name}_doctags.txt",
                 mime="text/plain",
             )
             dl_col2.download_button(
                 label="Download all Markdown",
                 data=combined_markdown,
-                file_name=f"{uploaded_file.name}_doctags.md",
+                file_name=f"{file_name}_doctags.md",
                 mime="text/markdown",
             )
 
-            for i, page_image in enumerate(page_images):
+            for i, thumbnail in enumerate(result["thumbnails"]):
                 with st.expander(f"Page {i + 1}", expanded=i == 0):
                     col_img, col_output = st.columns(2)
-                    col_img.image(page_image, caption=f"Page {i + 1}")
+                    col_img.image(thumbnail, caption=f"Page {i + 1}")
 
                     if all_doctags[i]:
                         col_output.code(all_doctags[i], language="xml")
 
-                        if all_docs[i] is not None:
+                        if result["parsed"][i]:
                             col_output.markdown("**Markdown output:**")
                             col_output.markdown(all_markdown[i])
                         else:
@@ -102,45 +185,38 @@ if st.button("Generate", type="primary", disabled=not uploaded_file):
                     else:
                         col_output.warning("Model produced no output for this page.")
 
-        finally:
-            if tmp_path is not None:
-                Path(tmp_path).unlink(missing_ok=True)
-
-    else:
-        image = Image.open(uploaded_file).convert("RGB")
-
-        with st.spinner("Generating doctags... This may take a few minutes."):
-            start = time.perf_counter_ns()
-            raw_doctags = generate_doctags(image, processor, model)
-            duration_s = (time.perf_counter_ns() - start) / 1e9
-
-        st.metric("Duration (s)", f"{duration_s:.2f}")
-
-        col_img, col_output = st.columns(2)
-        col_img.image(image, caption="Original")
-
-        if raw_doctags:
-            col_output.code(raw_doctags, language="xml")
+        else:
+            image = result["image"]
+            raw_doctags = result["doctags"]
+            st.metric("Duration (s)", f"{result['duration_s']:.2f}")
+
+            col_img, col_output = st.columns(2)
+            col_img.image(image, caption="Original")
+
+            if raw_doctags:
+                col_output.code(raw_doctags, language="xml")
+
+                doc = parse_doctags(raw_doctags, image)
+                if doc is not None:
+                    md = export_markdown(doc)
+                    col_output.markdown("**Markdown output:**")
+                    col_output.markdown(md)
+                    col_output.download_button(
+                        label="Download Markdown",
+                        data=md,
+                        file_name="doctags_output.md",
+                        mime="text/markdown",
+                    )
+                else:
+                    col_output.warning(
+                        "Could not parse doctags into structured document."
+                    )
 
-            doc = parse_doctags(raw_doctags, image)
-            if doc is not None:
-                md = export_markdown(doc)
-                col_output.markdown("**Markdown output:**")
-                col_output.markdown(md)
                 col_output.download_button(
-                    label="Download Markdown",
-                    data=md,
-                    file_name="doctags_output.md",
-                    mime="text/markdown",
+                    label="Download raw doctags",
+                    data=raw_doctags,
+                    file_name="doctags_output.txt",
+                    mime="text/plain",
                 )
             else:
-                col_output.warning("Could not parse doctags into structured document.")
-
-            col_output.download_button(
-                label="Download raw doctags",
-                data=raw_doctags,
-                file_name="doctags_output.txt",
-                mime="text/plain",
-            )
-        else:
-            col_output.warning("Model produced no output.")
+                col_output.warning("Model produced no output.")
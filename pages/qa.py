@@ -1,14 +1,82 @@
+import hashlib
+import json
 import tempfile
 import time
+from collections.abc import Iterator
 from pathlib import Path
+from typing import Any
 
-import pypdfium2
 import streamlit as st
 from PIL import Image
 
-from pipeline import create_qa_model, generate_qa_response, render_pdf_pages
+from pipeline import (
+    QA_MAX_DIM,
+    Job,
+    QASession,
+    count_pdf_pages,
+    create_index_cache,
+    create_qa_model,
+    create_render_cache,
+    get_job,
+    iter_pdf_pages,
+    load_page_index,
+    submit_job,
+    using_model,
+)
+from pipeline.models import GRANITE_VISION_REPO
+
+render_cache = st.cache_resource(create_render_cache)
+
+
+def answer_job(job: Job, session: QASession, question: str) -> dict[str, Any]:
+    """Answer question about the session's pages, publishing the text so far."""
+    feature_counts: list[tuple[int, int]] = []
+    answer = ""
+    first_token_s: float | None = None
+    start = time.perf_counter_ns()
+    with using_model(create_qa_model) as (processor, model):
+        # Time to first token excludes loading the model
+        generate_start = time.perf_counter_ns()
+        chunks = session.stream(
+            question,
+            processor,
+            model,
+            on_features=lambda hits, misses: feature_counts.append((hits, misses)),
+        )
+        for chunk in chunks:
+            if first_token_s is None:
+                first_token_s = (time.perf_counter_ns() - generate_start) / 1e9
+            answer += chunk
+            job.update(partial=answer)
+    return {
+        "answer": answer,
+        "first_token_s": first_token_s,
+        "duration_s": (time.perf_counter_ns() - start) / 1e9,
+        "features": feature_counts[0] if feature_counts else None,
+    }
+
+
+def follow_answer(job: Job, status: Any) -> Iterator[str]:
+    """Yield the text the answer job publishes as it grows, until it finishes.
+
+    status shows whether the job is still queued for the model.
+    """
+    sent = 0
+    while True:
+        finished = job.wait(0.1)
+        if not finished:
+            status.caption(
+                "Waiting for the model..."
+                if job.status == "queued"
+                else "Generating answer..."
+            )
+        text = job.result["answer"] if job.status == "done" else job.partial or ""
+        if len(text) > sent:
+            yield text[sent:]
+            sent = len(text)
+        if finished:
+            return
 
-qa_model = st.cache_resource(create_qa_model)
 
 st.title("Multipage QA (Experimental)")
 st.write(
@@ -25,6 +93,7 @@ uploaded_files = st.file_uploader(
 page_images: list[Image.Image] = []
 tmp_path: str | None = None
 is_pdf = False
+retrieve = False
 selected: list[int] = []
 valid_upload = True
 
@@ -43,17 +112,21 @@ if uploaded_files:
             tmp_file.write(pdf_files[0].read())
             tmp_path = tmp_file.name
 
-        pdf = pypdfium2.PdfDocument(tmp_path)
-        total_pages = len(pdf)
-        pdf.close()
+        total_pages = count_pdf_pages(tmp_path)
 
-        default_pages = list(range(1, min(9, total_pages + 1)))
-        selected = st.multiselect(
-            "Select pages (up to 8)",
-            options=list(range(1, total_pages + 1)),
-            default=default_pages,
-            max_selections=8,
+        retrieve = st.toggle(
+            "Pick pages automatically",
+            value=total_pages > 8,
+            help="Answer from the 8 pages whose text best matches the question.",
         )
+        if not retrieve:
+            default_pages = list(range(1, min(9, total_pages + 1)))
+            selected = st.multiselect(
+                "Select pages (up to 8)",
+                options=list(range(1, total_pages + 1)),
+                default=default_pages,
+                max_selections=8,
+            )
     else:
         if len(uploaded_files) > 8:
             st.warning("More than 8 images uploaded. Using the first 8.")
@@ -62,42 +135,99 @@ if uploaded_files:
 question = st.text_input("Question", placeholder="e.g., What is shown on these pages?")
 
 has_input = valid_upload and bool(uploaded_files) and bool(question)
-if is_pdf:
+if is_pdf and not retrieve:
     has_input = has_input and bool(selected)
 
 if st.button("Answer", type="primary", disabled=not has_input):
     assert uploaded_files is not None
-    processor, model = qa_model()
+
+    if is_pdf and retrieve:
+        assert tmp_path is not None
+        with st.spinner("Finding relevant pages..."):
+            # The index is stored per PDF hash, so only the first question builds it
+            index = load_page_index(tmp_path, create_index_cache())
+            selected = [i + 1 for i in index.search(question, k=8)]
+        if not any(index.lengths):
+            st.info("This PDF has no text layer, so the first pages are used.")
+        st.caption(f"Answering from pages {', '.join(map(str, selected))}")
+
+    # Follow-up questions on the same pages reuse the session, so the pages
+    # are not re-rendered and the model only prefills the new question
+    session_key = (tuple(f.file_id for f in uploaded_files), tuple(selected))
+    cached = st.session_state.get("qa_session")
+    if cached is not None and cached[0] != session_key:
+        del st.session_state["qa_session"]
+        cached = None
 
     try:
-        if is_pdf:
-            assert tmp_path is not None
-            with st.spinner("Rendering selected pages..."):
-                page_images = render_pdf_pages(
-                    tmp_path, page_indices=[i - 1 for i in selected]
-                )
+        if cached is not None:
+            session = cached[1]
         else:
-            page_images = [Image.open(f).convert("RGB") for f in uploaded_files]
-
-        with st.spinner("Generating answer..."):
-            start = time.perf_counter_ns()
-            answer = generate_qa_response(page_images, question, processor, model)
-            duration_s = (time.perf_counter_ns() - start) / 1e9
+            if is_pdf:
+                assert tmp_path is not None
+                with st.spinner("Rendering selected pages..."):
+                    # pdfium rasterizes each page straight to the QA size
+                    page_images = list(
+                        iter_pdf_pages(
+                            tmp_path,
+                            page_indices=[i - 1 for i in selected],
+                            cache=render_cache(),
+                            max_dim=QA_MAX_DIM,
+                        )
+                    )
+            else:
+                page_images = [Image.open(f).convert("RGB") for f in uploaded_files]
+            session = QASession(page_images)
+            st.session_state["qa_session"] = (session_key, session)
+    finally:
+        if tmp_path is not None:
+            Path(tmp_path).unlink(missing_ok=True)
 
-        if not answer:
+    # Sessions asking the same question about the same content share one job
+    content = [hashlib.sha256(f.getvalue()).hexdigest() for f in uploaded_files]
+    key = f"qa:{json.dumps([content, selected, question])}"
+    job = submit_job(answer_job, session, question, lane=GRANITE_VISION_REPO, key=key)
+    page_numbers = selected if is_pdf else list(range(1, len(session.images) + 1))
+    st.session_state["qa_job"] = (job.id, page_numbers, session.images)
+
+# The job outlives reruns, so its answer is shown until another is submitted
+submitted = st.session_state.get("qa_job")
+job = get_job(submitted[0]) if submitted is not None else None
+if submitted is not None and job is None:
+    # Finished results are dropped after PIPELINE_JOB_RESULT_TTL_S; say so
+    st.info("This result has expired. Submit it again to see it.")
+    del st.session_state["qa_job"]
+if submitted is not None and job is not None:
+    _, page_numbers, page_images = submitted
+    col_thumbs, col_answer = st.columns([1, 2])
+    with col_thumbs:
+        for number, img in zip(page_numbers, page_images, strict=True):
+            st.image(img, caption=f"Page {number}", use_container_width=True)
+
+    with col_answer:
+        status = st.empty()
+        st.write_stream(follow_answer(job, status))
+    status.empty()
+
+    if job.status == "failed":
+        st.error(f"Answering failed: {job.error}")
+    elif job.status == "done":
+        result = job.result
+        if not result["answer"]:
             st.warning("Model produced no output.")
         else:
-            col_thumbs, col_answer = st.columns([1, 2])
-            with col_thumbs:
-                for i, img in enumerate(page_images, 1):
-                    st.image(img, caption=f"Page {i}", use_container_width=True)
-            with col_answer:
-                st.markdown(answer)
-
-            st.metric("Duration (s)", f"{duration_s:.2f}")
+            col_first, col_total = st.columns(2)
+            col_first.metric(
+                "Time to first token (s)", f"{result['first_token_s']:.2f}"
+            )
+            col_total.metric("Duration (s)", f"{result['duration_s']:.2f}")
+            if result["features"] is not None:
+                hits, misses = result["features"]
+                st.caption(
+                    f"Page features: {hits} from cache, {misses} encoded "
+                    "by the vision tower"
+                )
+            else:
+                st.caption("Page features: reused from the previous question")
 
         st.caption("Answers are limited to ~1024 tokens and may be truncated.")
-
-    finally:
-        if tmp_path is not None:
-            Path(tmp_path).unlink(missing_ok=True)
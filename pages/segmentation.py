@@ -1,12 +1,45 @@
+import hashlib
 import io
+import json
 
 import streamlit as st
+import torch
 from PIL import Image
 
-from pipeline import create_granite_model, create_sam_model, draw_mask, segment
+from pipeline import (
+    Job,
+    SegmentationResult,
+    create_granite_model,
+    create_sam_model,
+    draw_mask,
+    get_job,
+    prepare_mask,
+    segment_many,
+    stream_segmentation,
+    submit_job,
+    using_model,
+)
+from pipeline.models import GRANITE_VISION_REPO
+
+
+def segmentation_job(
+    job: Job, image: Image.Image, prompts: list[str]
+) -> list[SegmentationResult]:
+    """Segment every prompt, publishing the coarse mask of a single prompt."""
+    with (
+        using_model(create_granite_model) as granite,
+        using_model(create_sam_model) as sam,
+    ):
+        if len(prompts) > 1:
+            return segment_many(image, prompts, granite=granite, sam=sam)
+        for update in stream_segmentation(
+            image.convert("RGB"), prompts[0], granite, sam
+        ):
+            if update.result is not None:
+                return [update.result]
+            job.update(partial=update.coarse)
+    raise RuntimeError("Segmentation stream ended without a result")
 
-granite_model = st.cache_resource(create_granite_model)
-sam_model = st.cache_resource(create_sam_model)
 
 st.title("Image Segmentation (Experimental)")
 st.write(
@@ -15,33 +48,85 @@ st.write(
 )
 
 uploaded_file = st.file_uploader("Upload image", type=["png", "jpg", "jpeg"])
-prompt = st.text_input("Segmentation prompt", placeholder="e.g., the dog on the left")
+prompt_text = st.text_area(
+    "Segmentation prompts (one per line)",
+    placeholder="e.g., the dog on the left\nthe sofa",
+)
+prompts = [line.strip() for line in prompt_text.splitlines() if line.strip()]
 
-if st.button("Segment", type="primary", disabled=not uploaded_file or not prompt):
+if st.button("Segment", type="primary", disabled=not uploaded_file or not prompts):
     assert uploaded_file is not None
-    image = Image.open(uploaded_file)
-
-    with st.spinner("Running segmentation... This may take a few minutes."):
-        mask = segment(
-            image,
-            prompt,
-            granite=granite_model(),
-            sam=sam_model(),
-        )
+    data = uploaded_file.getvalue()
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    key = f"segmentation:{hashlib.sha256(data).hexdigest()}:{json.dumps(prompts)}"
+    # SAM is only used here, so the Granite Vision lane serialises both models
+    job = submit_job(
+        segmentation_job, image, prompts, lane=GRANITE_VISION_REPO, key=key
+    )
+    st.session_state["segmentation_job"] = (job.id, image, prompts)
 
-    if mask is None:
-        st.error("Segmentation failed — no mask found in model output.")
-    else:
-        col_orig, col_overlay = st.columns(2)
-        col_orig.image(image, caption="Original")
-        overlay = draw_mask(mask, image)
-        col_overlay.image(overlay, caption="Segmentation overlay")
-
-        buf = io.BytesIO()
-        mask.save(buf, format="PNG")
-        st.download_button(
-            label="Download mask",
-            data=buf.getvalue(),
-            file_name="segmentation_mask.png",
-            mime="image/png",
+# The job outlives reruns, so its masks are shown until another is submitted
+submitted = st.session_state.get("segmentation_job")
+job = get_job(submitted[0]) if submitted is not None else None
+if submitted is not None and job is None:
+    # Finished results are dropped after PIPELINE_JOB_RESULT_TTL_S; say so
+    st.info("This result has expired. Submit it again to see it.")
+    del st.session_state["segmentation_job"]
+if submitted is not None and job is not None:
+    _, image, job_prompts = submitted
+    # Show the coarse mask of a single prompt growing while it generates
+    status = st.empty()
+    preview = st.empty()
+    rgb = image.convert("RGB")
+    shown = None
+    while not job.wait(0.25):
+        status.caption(
+            "Waiting for the model..."
+            if job.status == "queued"
+            else "Running segmentation... This may take a few minutes."
+        )
+        if job.partial is None or job.partial is shown:
+            continue
+        shown = job.partial
+        coarse = prepare_mask(shown, 24, 24, size=rgb.size)
+        coarse_mask = Image.fromarray((coarse * 255).to(torch.uint8).numpy())
+        preview.image(
+            draw_mask(coarse_mask, rgb), caption="Coarse mask (generating...)"
         )
+    status.empty()
+    preview.empty()
+
+    if job.status == "failed":
+        st.error(f"Segmentation failed: {job.error}")
+    elif job.status == "done":
+        results = job.result
+        for i, (prompt, result) in enumerate(zip(job_prompts, results, strict=True)):
+            st.subheader(prompt)
+            st.caption(
+                f"Generated {result.new_tokens} tokens"
+                + (
+                    f", stopped at the end of the mask ({result.tokens_saved} "
+                    "tokens of budget unused)"
+                    if result.tokens_saved
+                    else ""
+                )
+            )
+            mask = result.mask
+            if mask is None:
+                st.error("Segmentation failed — no mask found in model output.")
+                continue
+            col_orig, col_overlay = st.columns(2)
+            col_orig.image(image, caption="Original")
+            overlay = draw_mask(mask, image)
+            col_overlay.image(overlay, caption="Segmentation overlay")
+
+            buf = io.BytesIO()
+            mask.save(buf, format="PNG")
+            st.download_button(
+                label="Download mask",
+                data=buf.getvalue(),
+                file_name=f"segmentation_mask_{i + 1}.png",
+                mime="image/png",
+                key=f"download_mask_{i}",
+            )
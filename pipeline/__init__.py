@@ -1,36 +1,135 @@
-from pipeline.config import convert, create_converter
+from pipeline.cache import (
+    DiskCache,
+    MemoryBlobCache,
+    MemoryDescriptionCache,
+    SqliteDescriptionCache,
+    TensorCache,
+)
+from pipeline.config import (
+    CONVERTER_PROFILES,
+    DEFAULT_PROFILE,
+    CachedConversion,
+    ConverterProfile,
+    convert,
+    convert_cached,
+    converter_profile,
+    create_converter,
+    create_description_cache,
+    create_index_cache,
+    create_render_cache,
+    create_result_cache,
+    default_profile,
+)
 from pipeline.doctags import (
+    PageRenderCache,
+    count_pdf_pages,
     create_doctags_model,
     export_markdown,
     generate_doctags,
+    generate_doctags_batch,
+    iter_pdf_pages,
     parse_doctags,
     render_pdf_pages,
 )
-from pipeline.output import build_output, get_description, get_table_content
-from pipeline.qa import create_qa_model, generate_qa_response, resize_for_qa
+from pipeline.jobs import Job, JobQueue, get_job, submit_job
+from pipeline.models import acquire_model, release_model, using_model
+from pipeline.output import (
+    DocumentView,
+    Element,
+    TableContent,
+    build_output,
+    extract_table,
+    get_description,
+    get_table_content,
+    iter_elements,
+    write_output,
+)
+from pipeline.parquet import open_parquet_dataset, write_parquet
+from pipeline.qa import (
+    QA_MAX_DIM,
+    QASession,
+    create_qa_model,
+    generate_qa_response,
+    resize_for_qa,
+    stream_qa_response,
+)
+from pipeline.retrieval import PageIndex, load_page_index, pdf_page_texts
 from pipeline.segmentation import (
+    SegmentationResult,
+    SegmentationUpdate,
     create_granite_model,
     create_sam_model,
     draw_mask,
+    prepare_mask,
     segment,
+    segment_batch,
+    segment_many,
+    stream_segmentation,
 )
 
 __all__ = [
+    "CONVERTER_PROFILES",
+    "DEFAULT_PROFILE",
+    "QA_MAX_DIM",
+    "CachedConversion",
+    "ConverterProfile",
+    "DiskCache",
+    "DocumentView",
+    "Element",
+    "Job",
+    "JobQueue",
+    "MemoryBlobCache",
+    "MemoryDescriptionCache",
+    "PageIndex",
+    "PageRenderCache",
+    "QASession",
+    "SegmentationResult",
+    "SegmentationUpdate",
+    "SqliteDescriptionCache",
+    "TableContent",
+    "TensorCache",
+    "acquire_model",
     "build_output",
     "convert",
+    "convert_cached",
+    "converter_profile",
+    "count_pdf_pages",
     "create_converter",
+    "create_description_cache",
     "create_doctags_model",
     "create_granite_model",
+    "create_index_cache",
     "create_qa_model",
+    "create_render_cache",
+    "create_result_cache",
     "create_sam_model",
+    "default_profile",
     "draw_mask",
     "export_markdown",
+    "extract_table",
     "generate_doctags",
+    "generate_doctags_batch",
     "generate_qa_response",
     "get_description",
+    "get_job",
     "get_table_content",
+    "iter_elements",
+    "iter_pdf_pages",
+    "load_page_index",
+    "open_parquet_dataset",
     "parse_doctags",
+    "pdf_page_texts",
+    "prepare_mask",
+    "release_model",
     "render_pdf_pages",
     "resize_for_qa",
     "segment",
+    "segment_batch",
+    "segment_many",
+    "stream_qa_response",
+    "stream_segmentation",
+    "submit_job",
+    "using_model",
+    "write_output",
+    "write_parquet",
 ]
@@ -0,0 +1,411 @@
+"""Content-addressed caches: byte blobs, picture description text and tensors."""
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Generic, Protocol, TypeVar
+
+import torch
+from PIL import Image
+
+V = TypeVar("V")
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """Return the hex SHA-256 digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def image_sha256(image: Image.Image) -> str:
+    """Return the hex SHA-256 digest of an image's mode, size and pixels."""
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.width}x{image.height}:".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def default_cache_dir(name: str) -> Path:
+    """Return the cache directory for name under PIPELINE_CACHE_DIR.
+
+    PIPELINE_CACHE_DIR defaults to ~/.cache/granite-vision-pipeline.
+    """
+    root = os.environ.get("PIPELINE_CACHE_DIR")
+    base = Path(root) if root else Path.home() / ".cache" / "granite-vision-pipeline"
+    return base / name
+
+
+class DiskCache:
+    """Store byte blobs on disk under string keys.
+
+    Each entry is one file named after its key. Reads refresh the file's
+    modification time, and writes evict the least recently used files once
+    the directory exceeds max_bytes. Writes update a running total of the
+    directory's size, so the directory is only scanned when that total is
+    over budget; the scan also picks up files other processes wrote or
+    removed. Writes are atomic, so concurrent readers
+    never see a partial entry. Hit and miss counts cover the lifetime of the
+    instance.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        max_bytes: int | None = None,
+        suffix: str = "",
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        # Running size of the directory, measured on the first write
+        self._bytes: int | None = None
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        """Return the file path for key."""
+        return self.directory / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> bytes | None:
+        """Return the stored bytes for key, or None on a miss."""
+        path = self.path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store data under key, then evict old entries if over budget."""
+        path = self.path(key)
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self._evict(len(data) - replaced)
+
+    def __contains__(self, key: str) -> bool:
+        return self.path(key).exists()
+
+    def keys(self) -> list[str]:
+        """Return the keys of all entries."""
+        return [p.name.removesuffix(self.suffix) for p in self._entries()]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def clear(self) -> None:
+        """Delete every entry and reset the counters."""
+        for path in self._entries():
+            path.unlink(missing_ok=True)
+        with self._lock:
+            self._bytes = None
+            self.hits = 0
+            self.misses = 0
+
+    def total_bytes(self) -> int:
+        """Return the combined size of all entries."""
+        return sum(size for _, _, size in self._stat_entries())
+
+    def stats(self) -> dict[str, int | float]:
+        """Return hit/miss counters, hit rate, entry count and total size."""
+        entries = self._stat_entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(entries),
+                "bytes": sum(size for _, _, size in entries),
+            }
+
+    def _entries(self) -> list[Path]:
+        # In-flight writes are dot-prefixed temp files and never count as entries
+        return [
+            p
+            for p in self.directory.glob(f"*{self.suffix}")
+            if p.is_file() and not p.name.startswith(".")
+        ]
+
+    def _stat_entries(self) -> list[tuple[float, Path, int]]:
+        entries = []
+        for path in self._entries():
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, path, st.st_size))
+        return entries
+
+    def _evict(self, added: int) -> None:
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += added
+                if self._bytes <= self.max_bytes:
+                    return
+        entries = sorted(self._stat_entries())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        with self._lock:
+            self._bytes = total
+
+
+class MemoryLRUCache(Generic[V]):
+    """Keep values in memory under string keys, within max_bytes.
+
+    sizeof(value) gives an entry's size. The least recently used entries are
+    evicted once the total size exceeds max_bytes, and a value larger than
+    max_bytes on its own is not stored. Hit and miss counts cover the
+    lifetime of the instance.
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[V], int]) -> None:
+        if max_bytes < 1:
+            raise ValueError(f"max_bytes must be at least 1, got {max_bytes}")
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        # Each value with its size, so eviction never measures it again
+        self._entries: OrderedDict[str, tuple[V, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> V | None:
+        """Return the value stored under key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: V) -> None:
+        """Store value under key, evicting the oldest entries to fit."""
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def keys(self) -> list[str]:
+        """Return the keys of all entries."""
+        with self._lock:
+            return list(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def clear(self) -> None:
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def total_bytes(self) -> int:
+        """Return the combined size of all entries."""
+        with self._lock:
+            return self._bytes
+
+    def stats(self) -> dict[str, int | float]:
+        """Return hit/miss counters, hit rate, entry count and total size."""
+        with self._lock:
+            stats = _counter_stats(self.hits, self.misses, len(self._entries))
+            stats["bytes"] = self._bytes
+            return stats
+
+
+class MemoryBlobCache(MemoryLRUCache[bytes]):
+    """Keep byte blobs in memory under string keys, within max_bytes.
+
+    The in-memory counterpart of DiskCache, sized by blob length.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__(max_bytes, len)
+
+
+class BlobCache(Protocol):
+    """Map string keys to byte blobs: DiskCache or MemoryBlobCache."""
+
+    def get(self, key: str) -> bytes | None: ...
+
+    def put(self, key: str, data: bytes, /) -> None: ...
+
+    def keys(self) -> list[str]: ...
+
+    def __iter__(self) -> Iterator[str]: ...
+
+    def stats(self) -> dict[str, int | float]: ...
+
+
+class DescriptionCache(Protocol):
+    """Map picture description keys to generated text."""
+
+    def get(self, key: str) -> str | None: ...
+
+    def put(self, key: str, text: str) -> None: ...
+
+    def stats(self) -> dict[str, int | float]: ...
+
+
+def _counter_stats(hits: int, misses: int, entries: int) -> dict[str, int | float]:
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / lookups if lookups else 0.0,
+        "entries": entries,
+    }
+
+
+class MemoryDescriptionCache:
+    """Keep up to max_entries descriptions in memory, evicting the least recently used."""
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be at least 1, got {max_entries}")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        """Return the description for key, or None on a miss."""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key: str, text: str) -> None:
+        """Store text under key, evicting the oldest entry if full."""
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int | float]:
+        """Return hit/miss counters, hit rate and entry count."""
+        with self._lock:
+            return _counter_stats(self.hits, self.misses, len(self._entries))
+
+
+class SqliteDescriptionCache:
+    """Persist descriptions in a SQLite file shared across processes.
+
+    Hit and miss counts cover the lifetime of the instance.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS descriptions "
+                "(key TEXT PRIMARY KEY, text TEXT NOT NULL)"
+            )
+
+    def get(self, key: str) -> str | None:
+        """Return the description for key, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM descriptions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, text: str) -> None:
+        """Store text under key, replacing any existing entry."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO descriptions (key, text) VALUES (?, ?)",
+                (key, text),
+            )
+
+    def stats(self) -> dict[str, int | float]:
+        """Return hit/miss counters, hit rate and entry count."""
+        with self._lock:
+            (entries,) = self._conn.execute(
+                "SELECT COUNT(*) FROM descriptions"
+            ).fetchone()
+            return _counter_stats(self.hits, self.misses, entries)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class TensorCache(MemoryLRUCache[tuple[torch.Tensor, ...]]):
+    """Keep tuples of tensors in memory under string keys, within max_bytes.
+
+    Entries are sized by the bytes their tensors hold.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__(max_bytes, _nbytes)
+
+
+def _nbytes(value: tuple[torch.Tensor, ...]) -> int:
+    return sum(t.nelement() * t.element_size() for t in value)
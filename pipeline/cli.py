@@ -0,0 +1,282 @@
+"""Headless batch extraction: python -m pipeline extract <dir-or-glob> --out <dir>."""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+
+from docling.document_converter import DocumentConverter
+from docling.exceptions import ConversionError
+from docling_core.types.doc.document import DoclingDocument
+
+from pipeline.config import (
+    CONVERTER_PROFILES,
+    convert,
+    create_converter,
+    create_description_cache,
+)
+from pipeline.output import write_output
+from pipeline.parquet import TableLayout, write_parquet
+
+_converter: DocumentConverter | None = None
+
+
+@dataclass
+class ExtractResult:
+    """Outcome of extracting one PDF."""
+
+    source: str
+    pages: int = 0
+    pictures: int = 0
+    tables: int = 0
+    duration_s: float = 0.0
+    error: str | None = None
+
+
+def _is_pdf(path: Path) -> bool:
+    return path.is_file() and path.suffix.lower() == ".pdf"
+
+
+def find_pdfs(target: str) -> tuple[list[Path], Path]:
+    """Return the PDFs matched by target and the root their outputs mirror.
+
+    target is a directory (searched recursively) or a glob pattern. The
+    .pdf suffix matches in any case.
+    """
+    path = Path(target)
+    if path.is_dir():
+        return sorted(p for p in path.rglob("*") if _is_pdf(p)), path
+    matches = sorted(Path(p) for p in glob.glob(target, recursive=True))
+    pdfs = [p for p in matches if _is_pdf(p)]
+    if not pdfs:
+        return [], Path()
+    root = Path(os.path.commonpath([p.parent for p in pdfs]))
+    return pdfs, root
+
+
+def output_path(pdf: Path, root: Path, out_dir: Path, suffix: str = ".json") -> Path:
+    """Return where the output for pdf is written, mirroring its path under root."""
+    return (out_dir / pdf.relative_to(root)).with_suffix(suffix)
+
+
+def _write_output(path: Path, doc: DoclingDocument, duration_s: float) -> None:
+    # Write atomically so an interrupted run never leaves a file resume would skip
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            # Elements are streamed, so large documents are never held as a string
+            format = "ndjson" if path.suffix == ".ndjson" else "json"
+            write_output(doc, duration_s, f, format=format)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def init_worker(description_cache: bool = False, profile: str | None = None) -> None:
+    """Create the converter this process reuses for every document."""
+    global _converter
+    cache = create_description_cache() if description_cache else None
+    _converter = create_converter(description_cache=cache, profile=profile)
+
+
+def extract_one(
+    source: str,
+    destination: str,
+    dataset: str | None = None,
+    tables: TableLayout = "cells",
+) -> ExtractResult:
+    """Convert one PDF with this process's converter and write its output.
+
+    A destination ending in .ndjson gets NDJSON, anything else JSON. With
+    dataset, the output is appended to that Parquet dataset instead, as
+    the part whose documents file is destination.
+
+    Any error converting or writing the document is returned as a failed
+    result rather than raised, so one bad document never stops a batch.
+    """
+    if _converter is None:
+        init_worker()
+    start = time.perf_counter_ns()
+    try:
+        doc = convert(source, converter=_converter)
+        duration_s = (time.perf_counter_ns() - start) / 1e9
+        if dataset is None:
+            _write_output(Path(destination), doc, duration_s)
+        else:
+            documents = Path(dataset) / "documents"
+            part = Path(destination).relative_to(documents).with_suffix("")
+            write_parquet(doc, duration_s, dataset, part.as_posix(), tables=tables)
+    except ConversionError as e:
+        return ExtractResult(source=source, error=str(e))
+    except Exception as e:
+        # docling raises RuntimeError with raises_on_error; pdfium and IO errors
+        return ExtractResult(source=source, error=f"{type(e).__name__}: {e}")
+    return ExtractResult(
+        source=source,
+        pages=len(doc.pages),
+        pictures=len(doc.pictures),
+        tables=len(doc.tables),
+        duration_s=duration_s,
+    )
+
+
+def run_extract(
+    jobs: Sequence[tuple[str, str]],
+    workers: int = 1,
+    description_cache: bool = False,
+    dataset: str | None = None,
+    tables: TableLayout = "cells",
+    profile: str | None = None,
+) -> Iterator[ExtractResult]:
+    """Extract (source, destination) jobs, yielding results as they finish.
+
+    With more than one worker, a spawn-based process pool runs the jobs and
+    each worker builds its converter once, with the converter profile
+    profile. dataset and tables are passed to extract_one. If a worker
+    process dies, its jobs and those still queued are yielded as failed.
+    """
+    if workers <= 1:
+        init_worker(description_cache, profile)
+        for source, destination in jobs:
+            yield extract_one(source, destination, dataset, tables)
+        return
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=init_worker,
+        initargs=(description_cache, profile),
+    ) as pool:
+        futures = {
+            pool.submit(extract_one, src, dst, dataset, tables): src
+            for src, dst in jobs
+        }
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except BrokenProcessPool as e:
+                yield ExtractResult(source=futures[future], error=f"worker died: {e}")
+
+
+def extract_command(args: argparse.Namespace) -> int:
+    """Run the extract subcommand. Returns the process exit code."""
+    pdfs, root = find_pdfs(args.target)
+    if not pdfs:
+        print(f"No PDFs found for {args.target}", file=sys.stderr)
+        return 1
+
+    out_dir = Path(args.out)
+    # A Parquet dataset is complete for a document once its documents part exists
+    dataset = str(out_dir) if args.format == "parquet" else None
+    jobs = []
+    for pdf in pdfs:
+        if dataset is not None:
+            destination = output_path(pdf, root, out_dir / "documents", ".parquet")
+        else:
+            destination = output_path(pdf, root, out_dir, f".{args.format}")
+        if not args.overwrite and destination.exists():
+            continue
+        jobs.append((str(pdf), str(destination)))
+    skipped = len(pdfs) - len(jobs)
+    print(f"{len(jobs)} to extract, {skipped} already done", file=sys.stderr)
+
+    totals = ExtractResult(source="")
+    failed = 0
+    start = time.perf_counter_ns()
+    for done, result in enumerate(
+        run_extract(
+            jobs,
+            args.workers,
+            args.description_cache,
+            dataset,
+            args.table_layout,
+            args.profile,
+        ),
+        1,
+    ):
+        if result.error is not None:
+            failed += 1
+            print(f"[{done}/{len(jobs)}] FAILED {result.source}: {result.error}")
+            continue
+        totals.pages += result.pages
+        totals.pictures += result.pictures
+        totals.tables += result.tables
+        print(
+            f"[{done}/{len(jobs)}] {result.source}: {result.pages} pages, "
+            f"{result.pictures} pictures, {result.tables} tables "
+            f"in {result.duration_s:.2f}s"
+        )
+    elapsed_s = (time.perf_counter_ns() - start) / 1e9
+
+    if elapsed_s > 0:
+        print(
+            f"Extracted {len(jobs) - failed} documents in {elapsed_s:.2f}s: "
+            f"{totals.pages / elapsed_s:.2f} pages/s, "
+            f"{totals.pictures / elapsed_s:.2f} pictures/s"
+        )
+    return 1 if failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser."""
+    parser = argparse.ArgumentParser(prog="python -m pipeline")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    extract = commands.add_parser(
+        "extract", help="extract pictures and tables from many PDFs"
+    )
+    extract.add_argument("target", help="directory (searched recursively) or glob")
+    extract.add_argument(
+        "--out", required=True, help="directory for outputs or the Parquet dataset"
+    )
+    extract.add_argument(
+        "--workers", type=int, default=1, help="worker processes (default 1)"
+    )
+    extract.add_argument(
+        "--format",
+        choices=["json", "ndjson", "parquet"],
+        default="json",
+        help="json (default), ndjson with one element per line, or parquet to "
+        "append every document to one Parquet dataset under --out",
+    )
+    extract.add_argument(
+        "--table-layout",
+        choices=["cells", "files"],
+        default="cells",
+        help="parquet tables as one row per cell (default) or one file per table",
+    )
+    extract.add_argument(
+        "--profile",
+        choices=list(CONVERTER_PROFILES),
+        help="converter speed/quality profile (default: "
+        "PIPELINE_CONVERTER_PROFILE, else balanced)",
+    )
+    extract.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="re-extract documents whose output already exists",
+    )
+    extract.add_argument(
+        "--description-cache",
+        action="store_true",
+        help="reuse picture descriptions from the shared SQLite cache",
+    )
+    extract.set_defaults(handler=extract_command)
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Entry point for python -m pipeline."""
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
@@ -1,5 +1,11 @@
+import hashlib
+import json
 import os
+import time
 import warnings
+from dataclasses import dataclass
+from importlib.metadata import version
+from typing import Any
 
 os.environ.setdefault("TRANSFORMERS_USE_FAST_IMAGE_PROCESSOR", "1")
 warnings.filterwarnings(
@@ -21,33 +27,244 @@ from docling.datamodel.pipeline_options import (
 from docling.document_converter import DocumentConverter, PdfFormatOption
 from docling_core.types.doc.document import DoclingDocument
 
+from pipeline.cache import (
+    DescriptionCache,
+    DiskCache,
+    SqliteDescriptionCache,
+    default_cache_dir,
+    file_sha256,
+)
+from pipeline.descriptions import pipeline_with_description_cache
+from pipeline.doctags import PageRenderCache
+from pipeline.models import GRANITE_VISION_REPO
+
+
+@dataclass(frozen=True)
+class ConverterProfile:
+    """Speed/quality settings of create_converter.
+
+    max_new_tokens, do_sample and temperature configure picture description
+    generation; greedy decoding (do_sample=False) gives the same text for
+    the same picture every run. images_scale is the resolution, relative to
+    72 dpi, of the page, picture and table images kept in the document;
+    generate_table_images=False keeps no table images at all.
+    """
+
+    max_new_tokens: int
+    do_sample: bool = False
+    temperature: float | None = None
+    images_scale: float = 2.0
+    generate_table_images: bool = True
+
+    @property
+    def generation_config(self) -> dict[str, Any]:
+        """The generation_config passed to the picture description model."""
+        config: dict[str, Any] = {
+            "max_new_tokens": self.max_new_tokens,
+            "do_sample": self.do_sample,
+        }
+        if self.do_sample and self.temperature is not None:
+            config["temperature"] = self.temperature
+        return config
+
+
+CONVERTER_PROFILES: dict[str, ConverterProfile] = {
+    "fast": ConverterProfile(
+        max_new_tokens=60, images_scale=1.0, generate_table_images=False
+    ),
+    "balanced": ConverterProfile(max_new_tokens=100, do_sample=True, temperature=0.2),
+    "quality": ConverterProfile(max_new_tokens=200, images_scale=3.0),
+}
+
+DEFAULT_PROFILE = "balanced"
+
+
+def default_profile() -> str:
+    """Return PIPELINE_CONVERTER_PROFILE, or DEFAULT_PROFILE when it is unset."""
+    return os.environ.get("PIPELINE_CONVERTER_PROFILE") or DEFAULT_PROFILE
+
 
-def create_converter() -> DocumentConverter:
-    """Create a DocumentConverter with picture description enabled."""
+def converter_profile(name: str | None = None) -> ConverterProfile:
+    """Return the named profile of CONVERTER_PROFILES, default_profile() if None.
+
+    Raises ValueError for an unknown name.
+    """
+    if name is None:
+        name = default_profile()
+    try:
+        return CONVERTER_PROFILES[name]
+    except KeyError:
+        choices = ", ".join(CONVERTER_PROFILES)
+        raise ValueError(
+            f"Unknown converter profile {name!r}, expected one of {choices}"
+        ) from None
+
+
+def create_converter(
+    description_cache: DescriptionCache | None = None,
+    profile: str | ConverterProfile | None = None,
+) -> DocumentConverter:
+    """Create a DocumentConverter with picture description enabled.
+
+    profile is a ConverterProfile or the name of one (see
+    converter_profile). When description_cache is given, pictures already
+    described with the same settings reuse the cached text instead of
+    running the VLM.
+    """
+    if not isinstance(profile, ConverterProfile):
+        profile = converter_profile(profile)
     pipeline_options = PdfPipelineOptions()
     pipeline_options.do_picture_description = True
     pipeline_options.picture_description_options = PictureDescriptionVlmOptions(
-        repo_id="ibm-granite/granite-vision-3.3-2b",
+        repo_id=GRANITE_VISION_REPO,
         prompt="Describe the image in three sentences. Be concise and accurate.",
-        generation_config={
-            "max_new_tokens": 100,
-            "do_sample": True,
-            "temperature": 0.2,
-        },
+        generation_config=profile.generation_config,
     )
-    pipeline_options.images_scale = 2.0
+    pipeline_options.images_scale = profile.images_scale
     pipeline_options.generate_picture_images = True
-    pipeline_options.generate_table_images = True
+    pipeline_options.generate_table_images = profile.generate_table_images
 
-    return DocumentConverter(
-        format_options={
-            InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
-        }
+    format_option = PdfFormatOption(pipeline_options=pipeline_options)
+    if description_cache is not None:
+        format_option.pipeline_cls = pipeline_with_description_cache(description_cache)
+    return DocumentConverter(format_options={InputFormat.PDF: format_option})
+
+
+def create_description_cache() -> SqliteDescriptionCache:
+    """Create the persistent picture description cache.
+
+    Entries live in PIPELINE_CACHE_DIR/descriptions/descriptions.sqlite.
+    """
+    return SqliteDescriptionCache(
+        default_cache_dir("descriptions") / "descriptions.sqlite"
     )
 
 
-def convert(source: str, converter: DocumentConverter | None = None) -> DoclingDocument:
-    """Convert a PDF file to a DoclingDocument."""
+def create_result_cache(max_bytes: int | None = 2 * 1024**3) -> DiskCache:
+    """Create the on-disk conversion result cache.
+
+    Entries live under PIPELINE_CACHE_DIR/convert. Default budget is 2 GiB.
+    """
+    return DiskCache(default_cache_dir("convert"), max_bytes=max_bytes, suffix=".json")
+
+
+def create_index_cache(max_bytes: int | None = 256 * 1024**2) -> DiskCache:
+    """Create the on-disk cache of QA page retrieval indexes.
+
+    Entries live under PIPELINE_CACHE_DIR/retrieval. Default budget is 256 MiB.
+    """
+    return DiskCache(
+        default_cache_dir("retrieval"), max_bytes=max_bytes, suffix=".json"
+    )
+
+
+def create_render_cache(max_bytes: int | None = 1024**3) -> PageRenderCache:
+    """Create the on-disk cache of rendered PDF pages.
+
+    Entries live under PIPELINE_CACHE_DIR/renders. Default budget is 1 GiB.
+    """
+    store = DiskCache(default_cache_dir("renders"), max_bytes=max_bytes, suffix=".png")
+    return PageRenderCache(store)
+
+
+# Fields that only affect how conversion runs, not the document it produces
+_RUNTIME_OPTION_FIELDS: dict[str, object] = {
+    "accelerator_options": True,
+    "allow_external_plugins": True,
+    "artifacts_path": True,
+    "batch_polling_interval_seconds": True,
+    "document_timeout": True,
+    "enable_remote_services": True,
+    "layout_batch_size": True,
+    "ocr_batch_size": True,
+    "picture_description_options": {"batch_size": True},
+    "queue_max_size": True,
+    "table_batch_size": True,
+}
+
+# Bump when the layout of cached entries changes
+_RESULT_CACHE_FORMAT = 2
+
+
+@dataclass
+class CachedConversion:
+    """A converted document plus how it was obtained.
+
+    duration_s is the time the original conversion took, even on a cache hit.
+    """
+
+    document: DoclingDocument
+    duration_s: float
+    cache_hit: bool
+
+
+def options_fingerprint(options: PdfPipelineOptions) -> str:
+    """Return a short hash of the pipeline options that affect conversion output.
+
+    Every option is included except runtime-only settings such as the
+    accelerator and batch sizes, along with the installed docling version.
+    """
+    payload = {
+        "docling": version("docling"),
+        "format": _RESULT_CACHE_FORMAT,
+        "options": options.model_dump(
+            mode="json", exclude=_RUNTIME_OPTION_FIELDS, serialize_as_any=True
+        ),
+    }
+    encoded = json.dumps(payload, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def cache_key(source: str, converter: DocumentConverter) -> str:
+    """Return the result cache key for converting source with converter."""
+    options = converter.format_to_options[InputFormat.PDF].pipeline_options
+    assert isinstance(options, PdfPipelineOptions)
+    return f"{file_sha256(source)}-{options_fingerprint(options)}"
+
+
+def convert_cached(
+    source: str,
+    cache: DiskCache,
+    converter: DocumentConverter | None = None,
+) -> CachedConversion:
+    """Convert a PDF file, reusing a cached result when one exists.
+
+    Results are looked up by the SHA-256 of the file contents plus a
+    fingerprint of the converter's pipeline options. After a miss the
+    DoclingDocument JSON is stored together with the conversion duration.
+    """
+    if converter is None:
+        converter = create_converter()
+
+    key = cache_key(source, converter)
+    cached = cache.get(key)
+    if cached is not None:
+        entry = json.loads(cached)
+        return CachedConversion(
+            document=DoclingDocument.model_validate(entry["document"]),
+            duration_s=entry["duration_s"],
+            cache_hit=True,
+        )
+
+    start = time.perf_counter_ns()
+    doc = converter.convert(source=source).document
+    duration_s = (time.perf_counter_ns() - start) / 1e9
+    entry = {"duration_s": duration_s, "document": doc.export_to_dict()}
+    cache.put(key, json.dumps(entry).encode())
+    return CachedConversion(document=doc, duration_s=duration_s, cache_hit=False)
+
+
+def convert(
+    source: str,
+    converter: DocumentConverter | None = None,
+    cache: DiskCache | None = None,
+) -> DoclingDocument:
+    """Convert a PDF file to a DoclingDocument.
+
+    When cache is given, the result comes from convert_cached.
+    """
+    if cache is not None:
+        return convert_cached(source, cache, converter).document
     if converter is None:
         converter = create_converter()
     return converter.convert(source=source).document
@@ -0,0 +1,87 @@
+"""Picture description caching for the docling conversion pipeline."""
+
+import hashlib
+import json
+from collections.abc import Iterable
+
+from docling.datamodel.pipeline_options import (
+    PictureDescriptionBaseOptions,
+    ThreadedPdfPipelineOptions,
+)
+from docling.models.picture_description_base_model import PictureDescriptionBaseModel
+from docling.pipeline.standard_pdf_pipeline import StandardPdfPipeline
+from PIL import Image
+
+from pipeline.cache import DescriptionCache, image_sha256
+
+
+def description_key(image: Image.Image, options: PictureDescriptionBaseOptions) -> str:
+    """Return the cache key for describing image with options.
+
+    The key is an exact SHA-256 over the image's image_sha256 digest, the
+    one the tensor caches key on, plus the description settings (model,
+    prompt, generation config). batch_size does not change the output and
+    is left out.
+    """
+    digest = hashlib.sha256(image_sha256(image).encode())
+    settings = options.model_dump(mode="json", exclude={"batch_size"})
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class CachedPictureDescriptionModel(PictureDescriptionBaseModel):
+    """Wrap a docling picture description model with a description cache.
+
+    Pictures whose key is cached get the stored text; only the remaining
+    pictures are passed to the wrapped model, and its output is stored.
+    Area filtering and annotation are inherited from the base model, so
+    cached and generated descriptions land in the document the same way.
+    """
+
+    def __init__(self, model: PictureDescriptionBaseModel, cache: DescriptionCache):
+        self.model = model
+        self.cache = cache
+        self.enabled = model.enabled
+        self.options = model.options
+        self.provenance = model.provenance
+        self.images_scale = model.images_scale
+        self.expansion_factor = model.expansion_factor
+        self.elements_batch_size = model.elements_batch_size
+
+    @classmethod
+    def get_options_type(cls) -> type[PictureDescriptionBaseOptions]:
+        return PictureDescriptionBaseOptions
+
+    def _annotate_images(self, images: Iterable[Image.Image]) -> Iterable[str]:
+        images = list(images)
+        keys = [description_key(image, self.options) for image in images]
+        texts = [self.cache.get(key) for key in keys]
+        missing = [i for i, text in enumerate(texts) if text is None]
+        if missing:
+            generated = self.model._annotate_images([images[i] for i in missing])
+            for i, text in zip(missing, generated, strict=True):
+                self.cache.put(keys[i], text)
+                texts[i] = text
+        return [text for text in texts if text is not None]
+
+
+def pipeline_with_description_cache(
+    cache: DescriptionCache,
+) -> type[StandardPdfPipeline]:
+    """Return a StandardPdfPipeline subclass whose picture descriptions use cache.
+
+    docling builds pipelines from a class and its options, so the cache is
+    bound to a class created per converter.
+    """
+
+    class CachedDescriptionPdfPipeline(StandardPdfPipeline):
+        def __init__(self, pipeline_options: ThreadedPdfPipelineOptions) -> None:
+            super().__init__(pipeline_options)
+            self.enrichment_pipe = [
+                CachedPictureDescriptionModel(model, cache)
+                if isinstance(model, PictureDescriptionBaseModel)
+                else model
+                for model in self.enrichment_pipe
+            ]
+
+    return CachedDescriptionPdfPipeline
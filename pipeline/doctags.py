@@ -1,16 +1,268 @@
 """DocTags generation using Granite Docling."""
 
+import io
+import math
+import multiprocessing
+import queue
+import threading
+from collections.abc import Callable, Generator, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import batched
+
 import pypdfium2
 import torch
+from docling_core.types.doc.document import DoclingDocument, DocTagsDocument
 from PIL import Image
-from docling_core.types.doc.document import DocTagsDocument, DoclingDocument
 from transformers import AutoModelForVision2Seq, AutoProcessor
 
+from pipeline.cache import BlobCache, file_sha256
+from pipeline.models import GRANITE_DOCLING_REPO, acquire_model
+
+
+def _render_page(pdf: pypdfium2.PdfDocument, index: int, dpi: float) -> Image.Image:
+    """Render one page of an open PDF to a PIL RGB Image."""
+    page = pdf[index]
+    bitmap = page.render(scale=dpi / 72)
+    return bitmap.to_pil().convert("RGB")
+
+
+def _page_dpi(
+    pdf: pypdfium2.PdfDocument, index: int, dpi: int, max_dim: int | None
+) -> float:
+    """Return the dpi to render a page at so its longer side fits max_dim.
+
+    Pages that fit at dpi keep it; larger pages get the dpi at which
+    pdfium's rendered size has a longer side of exactly max_dim.
+    """
+    if max_dim is None:
+        return dpi
+    longer = max(pdf[index].get_size())
+    if math.ceil(longer * (dpi / 72)) <= max_dim:
+        return dpi
+    fitted = max_dim / longer * 72
+    # pdfium rounds the rendered size up, so step below any float overshoot
+    while math.ceil(longer * (fitted / 72)) > max_dim:
+        fitted = math.nextafter(fitted, 0)
+    return fitted
+
+
+class PageRenderCache:
+    """Cache rendered PDF pages, keyed by (PDF content hash, page index, dpi).
+
+    Pages are stored in store (a DiskCache or MemoryBlobCache) as PNG at the
+    fastest compression level, so a cached page has exactly the rendered
+    pixels and decodes in about a third of the time pdfium takes to render
+    it. A dpi that is not cached is served by downsampling the nearest
+    higher-resolution cached copy of the page, so only pages with no copy
+    at or above the requested dpi are rasterized.
+    """
+
+    def __init__(self, store: BlobCache) -> None:
+        self.store = store
+        self._dpis: dict[tuple[str, int], set[float]] | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(pdf_hash: str, index: int, dpi: float) -> str:
+        """Return the store key of one rendered page.
+
+        Whole dpis are written as integers; the fractional dpis of renders
+        fitted to a max_dim use repr, which reads back to the same float.
+        """
+        label = str(int(dpi)) if dpi == int(dpi) else repr(float(dpi))
+        return f"{pdf_hash}-{index}-{label}"
+
+    def get(
+        self,
+        pdf_hash: str,
+        index: int,
+        dpi: float,
+        size: tuple[int, int],
+    ) -> Image.Image | None:
+        """Return the page rendered at dpi, or None if no copy can serve it.
+
+        size is the (width, height) pdfium renders the page at this dpi;
+        copies of a higher dpi are resized to it.
+        """
+        for cached_dpi in self._cached_dpis(pdf_hash, index, dpi):
+            data = self.store.get(self.key(pdf_hash, index, cached_dpi))
+            if data is None:
+                # Evicted since it was indexed
+                with self._lock:
+                    self._known_dpis(pdf_hash, index).discard(cached_dpi)
+                continue
+            image = Image.open(io.BytesIO(data)).convert("RGB")
+            if image.size != size:
+                image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=1.0)
+            return image
+        return None
+
+    def put(self, pdf_hash: str, index: int, dpi: float, image: Image.Image) -> None:
+        """Store a page rendered at dpi."""
+        buf = io.BytesIO()
+        image.save(buf, format="PNG", compress_level=1)
+        self.store.put(self.key(pdf_hash, index, dpi), buf.getvalue())
+        with self._lock:
+            self._known_dpis(pdf_hash, index).add(dpi)
+
+    def _cached_dpis(self, pdf_hash: str, index: int, dpi: float) -> list[float]:
+        """Return dpi if cached, then the cached dpis above it, nearest first."""
+        with self._lock:
+            known = self._known_dpis(pdf_hash, index)
+            return sorted(d for d in known if d >= dpi)
+
+    def _known_dpis(self, pdf_hash: str, index: int) -> set[float]:
+        # Index the store once, so a persistent store serves earlier renders
+        if self._dpis is None:
+            self._dpis = {}
+            for key in self.store:
+                stored_hash, stored_index, stored_dpi = key.rsplit("-", 2)
+                entry = (stored_hash, int(stored_index))
+                self._dpis.setdefault(entry, set()).add(float(stored_dpi))
+        return self._dpis.setdefault((pdf_hash, index), set())
+
+
+def _rendered_size(
+    pdf: pypdfium2.PdfDocument, index: int, dpi: float
+) -> tuple[int, int]:
+    """Return the (width, height) pdfium renders a page at dpi."""
+    width, height = pdf[index].get_size()
+    return math.ceil(width * (dpi / 72)), math.ceil(height * (dpi / 72))
+
+
+def _render_cached(
+    pdf: pypdfium2.PdfDocument,
+    index: int,
+    dpi: int,
+    cache: PageRenderCache | None,
+    pdf_hash: str,
+    max_dim: int | None = None,
+) -> Image.Image:
+    """Render one page, going through cache when one is given."""
+    page_dpi = _page_dpi(pdf, index, dpi, max_dim)
+    if cache is None:
+        return _render_page(pdf, index, page_dpi)
+    size = _rendered_size(pdf, index, page_dpi)
+    image = cache.get(pdf_hash, index, page_dpi, size)
+    if image is None:
+        image = _render_page(pdf, index, page_dpi)
+        cache.put(pdf_hash, index, page_dpi, image)
+    return image
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """Return the number of pages in a PDF without rendering any of them."""
+    pdf = pypdfium2.PdfDocument(pdf_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _render_range(
+    pdf_path: str, indices: list[int], dpi: int, max_dim: int | None = None
+) -> list[tuple[int, int, bytes]]:
+    """Render pages in a worker process as (width, height, RGB bytes).
+
+    Raw pixel buffers cross the process boundary as single bytes objects,
+    which is cheaper than pickling PIL Images or encoding them.
+    """
+    pdf = pypdfium2.PdfDocument(pdf_path)
+    try:
+        pages = []
+        for index in indices:
+            image = _render_page(pdf, index, _page_dpi(pdf, index, dpi, max_dim))
+            pages.append((image.width, image.height, image.tobytes()))
+        return pages
+    finally:
+        pdf.close()
+
+
+_render_pools: dict[int, ProcessPoolExecutor] = {}
+_render_pools_lock = threading.Lock()
+
+
+def _render_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the process pool with workers processes, starting it on first use.
+
+    Pools are spawn-based like the extract CLI's and kept for the life of
+    the process, so each worker imports the package once rather than on
+    every call.
+    """
+    with _render_pools_lock:
+        pool = _render_pools.get(workers)
+        if pool is None:
+            context = multiprocessing.get_context("spawn")
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _render_pools[workers] = pool
+        return pool
+
+
+def _discard_render_pool(workers: int, pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool, so the next _render_pool call starts a new one."""
+    with _render_pools_lock:
+        if _render_pools.get(workers) is pool:
+            del _render_pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _render_ranges(
+    pdf_path: str,
+    ranges: list[list[int]],
+    dpi: int,
+    workers: int,
+    max_dim: int | None,
+) -> list[list[tuple[int, int, bytes]]]:
+    """Run _render_range for each range on the pool with workers processes.
+
+    A pool broken by a dying worker is discarded before the error is raised.
+    """
+    pool = _render_pool(workers)
+    try:
+        futures = [
+            pool.submit(_render_range, pdf_path, part, dpi, max_dim) for part in ranges
+        ]
+        return [future.result() for future in futures]
+    except BrokenProcessPool:
+        _discard_render_pool(workers, pool)
+        raise
+
+
+def _render_parallel(
+    pdf_path: str,
+    indices: list[int],
+    dpi: int,
+    workers: int,
+    max_dim: int | None = None,
+) -> list[Image.Image]:
+    """Render pages across workers processes, returning them in indices order.
+
+    Each worker opens its own PdfDocument, since pdfium serialises all
+    rendering in a process behind one lock. If a worker dies (e.g. out of
+    memory), the broken pool is replaced and the pages are rendered once
+    more on the new one; a second failure is raised.
+    """
+    size = math.ceil(len(indices) / workers)
+    ranges = [indices[start : start + size] for start in range(0, len(indices), size)]
+    try:
+        results = _render_ranges(pdf_path, ranges, dpi, workers, max_dim)
+    except BrokenProcessPool:
+        results = _render_ranges(pdf_path, ranges, dpi, workers, max_dim)
+    return [
+        Image.frombytes("RGB", (width, height), data)
+        for pages in results
+        for width, height, data in pages
+    ]
+
 
 def render_pdf_pages(
     pdf_path: str,
     dpi: int = 144,
     page_indices: list[int] | None = None,
+    cache: PageRenderCache | None = None,
+    workers: int = 1,
+    max_dim: int | None = None,
 ) -> list[Image.Image]:
     """Render pages of a PDF to PIL RGB Images.
 
@@ -18,20 +270,122 @@ def render_pdf_pages(
         pdf_path: Path to the PDF file.
         dpi: Resolution for rendering. Default 144.
         page_indices: Zero-based page indices to render. Default None renders all.
+        cache: Render cache to read pages from and store new renders in.
+        workers: Processes to rasterize pages in. With more than one, pages
+            missing from cache are split into contiguous ranges, one per
+            worker. The first call with a given count pays worker startup.
+        max_dim: Largest width or height in pixels. Pages that would render
+            larger at dpi are rasterized at the lower dpi that fits, rather
+            than rendered at dpi and resized.
     """
+    pdf_hash = file_sha256(pdf_path) if cache is not None else ""
     pdf = pypdfium2.PdfDocument(pdf_path)
     try:
         indices = page_indices if page_indices is not None else list(range(len(pdf)))
-        pages: list[Image.Image] = []
-        for i in indices:
-            page = pdf[i]
-            bitmap = page.render(scale=dpi / 72)
-            pil_image = bitmap.to_pil().convert("RGB")
-            pages.append(pil_image)
-        return pages
+        if workers <= 1 or len(indices) <= 1:
+            return [
+                _render_cached(pdf, i, dpi, cache, pdf_hash, max_dim) for i in indices
+            ]
+        page_dpis = [_page_dpi(pdf, i, dpi, max_dim) for i in indices]
+        pages: list[Image.Image | None] = [
+            cache.get(pdf_hash, i, d, _rendered_size(pdf, i, d))
+            if cache is not None
+            else None
+            for i, d in zip(indices, page_dpis, strict=True)
+        ]
     finally:
         pdf.close()
 
+    missing = [j for j, page in enumerate(pages) if page is None]
+    if missing:
+        rendered = _render_parallel(
+            pdf_path, [indices[j] for j in missing], dpi, workers, max_dim
+        )
+        for j, image in zip(missing, rendered, strict=True):
+            pages[j] = image
+            if cache is not None:
+                cache.put(pdf_hash, indices[j], page_dpis[j], image)
+    return [page for page in pages if page is not None]
+
+
+_DONE = object()
+
+
+def iter_pdf_pages(
+    pdf_path: str,
+    dpi: int = 144,
+    page_indices: list[int] | None = None,
+    prefetch: int = 2,
+    cache: PageRenderCache | None = None,
+    max_dim: int | None = None,
+) -> Generator[Image.Image]:
+    """Lazily render pages of a PDF to PIL RGB Images, in page order.
+
+    A background thread renders ahead of the consumer into a queue holding at
+    most prefetch pages, so page N+1 is rasterized while page N is being
+    processed and memory stays bounded regardless of page count. Closing the
+    iterator early stops the renderer. Rendering errors are re-raised in the
+    consuming thread.
+
+    Args:
+        pdf_path: Path to the PDF file.
+        dpi: Resolution for rendering. Default 144.
+        page_indices: Zero-based page indices to render. Default None renders all.
+        prefetch: Maximum number of rendered pages waiting to be consumed.
+        cache: Render cache to read pages from and store new renders in.
+        max_dim: Largest width or height in pixels, as in render_pdf_pages.
+
+    Raises ValueError if prefetch is less than 1.
+    """
+    if prefetch < 1:
+        raise ValueError(f"prefetch must be at least 1, got {prefetch}")
+
+    pages: queue.Queue[object] = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+
+    def put(item: object) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def render() -> None:
+        outcome: object = _DONE
+        try:
+            pdf_hash = file_sha256(pdf_path) if cache is not None else ""
+            pdf = pypdfium2.PdfDocument(pdf_path)
+            try:
+                indices = page_indices if page_indices is not None else range(len(pdf))
+                for i in indices:
+                    page = _render_cached(pdf, i, dpi, cache, pdf_hash, max_dim)
+                    if not put(page):
+                        return
+            finally:
+                pdf.close()
+        except BaseException as exc:
+            outcome = exc
+        finally:
+            # Always wake the consumer, whatever stopped the renderer
+            put(outcome)
+
+    thread = threading.Thread(target=render, name="pdf-page-renderer", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = pages.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            assert isinstance(item, Image.Image)
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
 
 def parse_doctags(doctags: str, image: Image.Image) -> DoclingDocument | None:
     """Parse raw doctags string into a DoclingDocument.
@@ -52,6 +406,17 @@ def export_markdown(doc: DoclingDocument) -> str:
     return doc.export_to_markdown()
 
 
+DOCTAGS_MESSAGES = [
+    {
+        "role": "user",
+        "content": [
+            {"type": "image"},
+            {"type": "text", "text": "Convert this page to docling."},
+        ],
+    },
+]
+
+
 def generate_doctags(
     image: Image.Image,
     processor: AutoProcessor,
@@ -64,38 +429,113 @@ def generate_doctags(
     """
     device = next(model.parameters()).device
 
-    messages = [
-        {
-            "role": "user",
-            "content": [
-                {"type": "image"},
-                {"type": "text", "text": "Convert this page to docling."},
-            ],
-        },
-    ]
-
-    prompt = processor.apply_chat_template(messages, add_generation_prompt=True)
-    inputs = processor(text=prompt, images=[image], return_tensors="pt").to(device)
+    prompt = processor.apply_chat_template(  # type: ignore[operator]
+        DOCTAGS_MESSAGES, add_generation_prompt=True
+    )
+    inputs = processor(  # type: ignore[operator]
+        text=prompt, images=[image], return_tensors="pt"
+    ).to(device)
 
     with torch.inference_mode():
         output = model.generate(**inputs, max_new_tokens=8192)
 
     trimmed = output[:, inputs["input_ids"].shape[1] :]
-    decoded = processor.batch_decode(trimmed, skip_special_tokens=False)[0].lstrip()
-    return decoded
+    decoded = processor.batch_decode(  # type: ignore[operator]
+        trimmed, skip_special_tokens=False
+    )
+    return decoded[0].lstrip()
+
+
+def _eos_ids(model: AutoModelForVision2Seq) -> set[int]:
+    """Return the end-of-sequence token ids from the model's generation config."""
+    eos = model.generation_config.eos_token_id
+    if eos is None:
+        return set()
+    return {eos} if isinstance(eos, int) else set(eos)
+
+
+def _strip_trailing_padding(
+    row: torch.Tensor, eos_ids: set[int], pad_token_id: int | None
+) -> torch.Tensor:
+    """Drop pad tokens appended after a sequence finished early in a batch.
+
+    generate pads a finished row only after its first end-of-sequence token,
+    so the row is cut just past that token and real output is never touched.
+    Without an EOS id, trailing pad_token_id tokens are stripped instead.
+    """
+    if eos_ids:
+        for i, token in enumerate(row.tolist()):
+            if token in eos_ids:
+                return row[: i + 1]
+        return row
+    if pad_token_id is None:
+        return row
+    keep = (row != pad_token_id).nonzero()
+    if len(keep) == 0:
+        return row[:0]
+    return row[: int(keep[-1]) + 1]
+
+
+def generate_doctags_batch(
+    images: Iterable[Image.Image],
+    processor: AutoProcessor,
+    model: AutoModelForVision2Seq,
+    batch_size: int = 4,
+    on_batch: Callable[[int], None] | None = None,
+) -> list[str]:
+    """Generate doctags for several document images, batch_size per generate call.
+
+    Prompts are left-padded so every sequence ends at the same position;
+    each output is trimmed at that position and cut after its end-of-sequence
+    token, so each result matches what generate_doctags returns for that page.
+    Results are returned in input order, one raw doctags string per image.
+    on_batch, if given, is called with the number of images completed so far
+    after each batch.
+
+    Raises ValueError if batch_size is less than 1.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+
+    device = next(model.parameters()).device
+    prompt = processor.apply_chat_template(  # type: ignore[operator]
+        DOCTAGS_MESSAGES, add_generation_prompt=True
+    )
+    eos_ids = _eos_ids(model)
+    pad_token_id = model.generation_config.pad_token_id
+
+    results: list[str] = []
+    for batch in batched(images, batch_size):
+        # padding_side is passed per call; the processor is shared across sessions
+        inputs = processor(  # type: ignore[operator]
+            text=[prompt] * len(batch),
+            images=[[img] for img in batch],
+            padding=True,
+            padding_side="left",
+            return_tensors="pt",
+        ).to(device)
+
+        with torch.inference_mode():
+            output = model.generate(**inputs, max_new_tokens=8192)
+
+        trimmed = output[:, inputs["input_ids"].shape[1] :]
+        rows = [_strip_trailing_padding(row, eos_ids, pad_token_id) for row in trimmed]
+        decoded = processor.batch_decode(  # type: ignore[operator]
+            rows, skip_special_tokens=False
+        )
+        results.extend(text.lstrip() for text in decoded)
+        if on_batch is not None:
+            on_batch(len(results))
+    return results
 
 
 def create_doctags_model(
     device: str | None = None,
+    dtype: torch.dtype | None = None,
 ) -> tuple[AutoProcessor, AutoModelForVision2Seq]:
     """Load Granite Docling 258M for doctags generation.
 
-    When device is None, auto-detects: CUDA if available, else CPU.
-    MPS is excluded for consistency with other pipeline models.
+    The pair comes from the shared model registry; see resolve_device for
+    how device=None is resolved.
     """
-    if device is None:
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-    model_path = "ibm-granite/granite-docling-258M"
-    processor = AutoProcessor.from_pretrained(model_path)
-    model = AutoModelForVision2Seq.from_pretrained(model_path).to(device)
-    return processor, model
+    return acquire_model(GRANITE_DOCLING_REPO, device, dtype)
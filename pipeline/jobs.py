@@ -0,0 +1,300 @@
+"""Background job queue that runs model work outside the Streamlit script.
+
+Pages submit inference as jobs and poll them, so a rerun or a closed tab
+no longer cancels the work, and sessions share the loaded models instead
+of racing on them: each job names a lane (normally the model repo it
+uses), and a lane runs one job at a time.
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any, Literal
+
+JobStatus = Literal["queued", "running", "done", "failed", "cancelled"]
+
+
+@dataclass
+class Job:
+    """One unit of work submitted to a JobQueue.
+
+    The job's function runs as fn(job, *args, **kwargs) and reports through
+    update(). Readers poll status, progress, message and partial while it
+    runs, then result or error once finished.
+    """
+
+    id: str
+    lane: str
+    key: str | None = None
+    status: JobStatus = "queued"
+    progress: float = 0.0
+    message: str = ""
+    partial: Any = None
+    result: Any = None
+    error: BaseException | None = None
+    submitted_at: float = field(default_factory=time.monotonic)
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    def __post_init__(self) -> None:
+        self._finished = threading.Event()
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        """True once the job is done, failed or cancelled."""
+        return self._finished.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        """True once cancellation was requested; running jobs should stop."""
+        return self._cancel.is_set()
+
+    def update(
+        self,
+        progress: float | None = None,
+        message: str | None = None,
+        partial: Any = None,
+    ) -> None:
+        """Publish progress (0 to 1), a status message or a partial result."""
+        if progress is not None:
+            self.progress = progress
+        if message is not None:
+            self.message = message
+        if partial is not None:
+            self.partial = partial
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait until the job is finished. Returns False on timeout."""
+        return self._finished.wait(timeout)
+
+
+# Queue entry: the job and the call that runs it
+_Pending = tuple[Job, Callable[..., Any], tuple[Any, ...], dict[str, Any]]
+
+
+class JobQueue:
+    """Run jobs on a bounded pool of worker threads, one job per lane at once.
+
+    workers bounds how many jobs run concurrently across lanes. Jobs are
+    picked in submission order, skipping those whose lane is busy. A job
+    submitted with the key of a queued, running or finished job gets that
+    job back instead of running again; failed and cancelled jobs are not
+    reused. Finished jobs, with their results, are kept for get() until
+    more than max_finished have finished or, with result_ttl_s, until they
+    finished that many seconds ago; get() then returns None, and callers
+    holding the id should report the result as expired. Worker threads
+    start on the first submit.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_finished: int = 64,
+        result_ttl_s: float | None = None,
+    ) -> None:
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}")
+        self.workers = workers
+        self.max_finished = max_finished
+        self.result_ttl_s = result_ttl_s
+        self._pending: deque[_Pending] = deque()
+        self._jobs: dict[str, Job] = {}
+        self._keys: dict[str, Job] = {}
+        self._finished: OrderedDict[str, None] = OrderedDict()
+        self._busy_lanes: set[str] = set()
+        self._threads: list[threading.Thread] = []
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        lane: str,
+        key: str | None = None,
+        **kwargs: Any,
+    ) -> Job:
+        """Queue fn(job, *args, **kwargs) on lane and return its Job.
+
+        Raises RuntimeError after shutdown.
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("JobQueue is shut down")
+            self._expire()
+            if key is not None:
+                existing = self._keys.get(key)
+                if existing is not None and existing.status not in (
+                    "failed",
+                    "cancelled",
+                ):
+                    return existing
+            job = Job(id=uuid.uuid4().hex, lane=lane, key=key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._keys[key] = job
+            self._pending.append((job, fn, args, kwargs))
+            self._start_workers()
+            self._cond.notify_all()
+            return job
+
+    def get(self, job_id: str) -> Job | None:
+        """Return a queued, running or retained finished job by id."""
+        with self._cond:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> None:
+        """Cancel a job: queued jobs never run, running jobs see cancelled."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return
+            job._cancel.set()
+            for entry in self._pending:
+                if entry[0] is job:
+                    self._pending.remove(entry)
+                    self._finish(job, "cancelled")
+                    break
+
+    def ahead(self, job: Job) -> int:
+        """Return how many jobs on job's lane run or wait before it."""
+        with self._cond:
+            count = int(job.lane in self._busy_lanes)
+            for entry in self._pending:
+                if entry[0] is job:
+                    return count
+                if entry[0].lane == job.lane:
+                    count += 1
+            return 0
+
+    def stats(self) -> dict[str, int]:
+        """Return counts of queued, running and retained finished jobs."""
+        with self._cond:
+            self._expire()
+            return {
+                "queued": len(self._pending),
+                "running": len(self._busy_lanes),
+                "finished": len(self._finished),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Cancel queued jobs and stop the workers once running jobs end."""
+        with self._cond:
+            self._closed = True
+            while self._pending:
+                job = self._pending.popleft()[0]
+                job._cancel.set()
+                self._finish(job, "cancelled")
+            self._cond.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _start_workers(self) -> None:
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(
+                target=self._work,
+                name=f"job-worker-{len(self._threads)}",
+                daemon=True,
+            )
+            self._threads.append(thread)
+            thread.start()
+
+    def _next(self) -> _Pending | None:
+        for entry in self._pending:
+            if entry[0].lane not in self._busy_lanes:
+                self._pending.remove(entry)
+                return entry
+        return None
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                entry = self._next()
+                while entry is None:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+                    entry = self._next()
+                job, fn, args, kwargs = entry
+                job.status = "running"
+                job.started_at = time.monotonic()
+                self._busy_lanes.add(job.lane)
+
+            status: JobStatus = "done"
+            try:
+                job.result = fn(job, *args, **kwargs)
+            except BaseException as exc:
+                job.error = exc
+                status = "failed"
+
+            with self._cond:
+                self._busy_lanes.discard(job.lane)
+                self._finish(job, status)
+                self._cond.notify_all()
+
+    def _finish(self, job: Job, status: JobStatus) -> None:
+        job.status = status
+        job.finished_at = time.monotonic()
+        if status == "done":
+            job.progress = 1.0
+        self._finished[job.id] = None
+        while len(self._finished) > self.max_finished:
+            self._drop_oldest()
+        job._finished.set()
+
+    def _expire(self) -> None:
+        if self.result_ttl_s is None:
+            return
+        cutoff = time.monotonic() - self.result_ttl_s
+        # _finished is in finishing order, so expired jobs are at its front
+        while self._finished:
+            oldest = self._jobs[next(iter(self._finished))]
+            if oldest.finished_at is None or oldest.finished_at > cutoff:
+                return
+            self._drop_oldest()
+
+    def _drop_oldest(self) -> None:
+        old_id, _ = self._finished.popitem(last=False)
+        old = self._jobs.pop(old_id)
+        if old.key is not None and self._keys.get(old.key) is old:
+            del self._keys[old.key]
+
+
+def _workers_from_env() -> int:
+    value = os.environ.get("PIPELINE_JOB_WORKERS")
+    return int(value) if value else 2
+
+
+def _result_ttl_from_env() -> float:
+    value = os.environ.get("PIPELINE_JOB_RESULT_TTL_S")
+    return float(value) if value else 600.0
+
+
+# Results hold whole documents and QA sessions, so few are kept, briefly
+job_queue = JobQueue(
+    workers=_workers_from_env(), max_finished=16, result_ttl_s=_result_ttl_from_env()
+)
+
+
+def submit_job(
+    fn: Callable[..., Any],
+    *args: Any,
+    lane: str,
+    key: str | None = None,
+    **kwargs: Any,
+) -> Job:
+    """Submit fn(job, *args, **kwargs) to the process-wide job queue."""
+    return job_queue.submit(fn, *args, lane=lane, key=key, **kwargs)
+
+
+def get_job(job_id: str) -> Job | None:
+    """Return a job of the process-wide queue by id."""
+    return job_queue.get(job_id)
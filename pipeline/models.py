@@ -0,0 +1,264 @@
+"""Process-wide registry that shares loaded models across features."""
+
+import gc
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+import torch
+from transformers import AutoModelForVision2Seq, AutoProcessor
+
+ModelKey = tuple[str, str, str]
+
+GRANITE_VISION_REPO = "ibm-granite/granite-vision-3.3-2b"
+GRANITE_DOCLING_REPO = "ibm-granite/granite-docling-258M"
+SAM_REPO = "facebook/sam-vit-huge"
+
+
+def resolve_device(device: str | None = None) -> str:
+    """Return device, or auto-detect one when None.
+
+    Auto-detects CUDA if available, else CPU. MPS is never auto-selected;
+    pass it explicitly to opt in.
+    """
+    if device is not None:
+        return device
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def model_nbytes(model: Any) -> int:
+    """Return the memory held by a model's parameters and buffers, in bytes."""
+    total = 0
+    for tensor in [*model.parameters(), *model.buffers()]:
+        if isinstance(tensor, torch.Tensor):
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+@dataclass
+class _Entry:
+    processor: Any
+    model: Any
+    nbytes: int
+    refcount: int = 0
+
+
+class ModelRegistry:
+    """Share one processor/model pair per (repo_id, device, dtype).
+
+    Each acquire increments a reference count and each release decrements it.
+    When max_bytes is set, least recently used entries with no references are
+    evicted once the total loaded size exceeds the budget. Entries that are
+    still referenced are never evicted, so the budget is a soft limit. Callers
+    that hold a model only for the duration of one inference should use
+    using_model so the reference is dropped afterwards.
+    """
+
+    def __init__(self, max_bytes: int | None = None) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[ModelKey, _Entry] = OrderedDict()
+        self._loading: dict[ModelKey, Future[_Entry]] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def key(repo_id: str, device: str, dtype: torch.dtype | None) -> ModelKey:
+        """Build the registry key for a model."""
+        return (repo_id, device, str(dtype) if dtype is not None else "default")
+
+    def acquire(
+        self,
+        repo_id: str,
+        device: str | None = None,
+        dtype: torch.dtype | None = None,
+        processor_cls: Any = None,
+        model_cls: Any = None,
+    ) -> tuple[Any, Any]:
+        """Return the shared (processor, model) pair, loading it on first use.
+
+        processor_cls and model_cls default to AutoProcessor and
+        AutoModelForVision2Seq. When dtype is None the checkpoint's default
+        dtype is used.
+        """
+        device = resolve_device(device)
+        key = self.key(repo_id, device, dtype)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return self._reference(key, entry)
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = Future()
+                    break
+            # Another caller is loading this model; raises if its load failed.
+            # Look it up again, since it may be evicted before we reference it.
+            loading.result()
+
+        try:
+            entry = self._load(repo_id, device, dtype, processor_cls, model_cls)
+        except BaseException as exc:
+            with self._lock:
+                del self._loading[key]
+            loading.set_exception(exc)
+            raise
+        with self._lock:
+            del self._loading[key]
+            self._entries[key] = entry
+            pair = self._reference(key, entry)
+        loading.set_result(entry)
+        return pair
+
+    def _reference(self, key: ModelKey, entry: _Entry) -> tuple[Any, Any]:
+        entry.refcount += 1
+        self._entries.move_to_end(key)
+        self._evict()
+        return entry.processor, entry.model
+
+    def release(
+        self,
+        repo_id: str,
+        device: str | None = None,
+        dtype: torch.dtype | None = None,
+    ) -> None:
+        """Drop one reference to a model, allowing it to be evicted."""
+        key = self.key(repo_id, resolve_device(device), dtype)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.refcount == 0:
+                return
+            entry.refcount -= 1
+            self._evict()
+
+    def release_instance(self, model: Any) -> None:
+        """Drop one reference to the entry holding model, if any."""
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.model is model:
+                    if entry.refcount > 0:
+                        entry.refcount -= 1
+                        self._evict()
+                    return
+
+    def total_bytes(self) -> int:
+        """Return the combined size of all loaded models."""
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values())
+
+    def stats(self) -> list[dict[str, object]]:
+        """Return one summary dict per loaded model, least recently used first."""
+        with self._lock:
+            return [
+                {
+                    "repo_id": key[0],
+                    "device": key[1],
+                    "dtype": key[2],
+                    "nbytes": entry.nbytes,
+                    "refcount": entry.refcount,
+                }
+                for key, entry in self._entries.items()
+            ]
+
+    def clear(self) -> None:
+        """Drop every loaded model regardless of reference counts."""
+        with self._lock:
+            had_entries = bool(self._entries)
+            self._entries.clear()
+        if had_entries:
+            _free_memory()
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _load(
+        self,
+        repo_id: str,
+        device: str,
+        dtype: torch.dtype | None,
+        processor_cls: Any,
+        model_cls: Any,
+    ) -> _Entry:
+        processor_cls = processor_cls or AutoProcessor
+        model_cls = model_cls or AutoModelForVision2Seq
+        processor = processor_cls.from_pretrained(repo_id)
+        if dtype is None:
+            model = model_cls.from_pretrained(repo_id)
+        else:
+            model = model_cls.from_pretrained(repo_id, torch_dtype=dtype)
+        model = model.to(device)
+        return _Entry(processor=processor, model=model, nbytes=model_nbytes(model))
+
+    def _evict(self) -> None:
+        if self.max_bytes is None:
+            return
+        evicted = False
+        for key in list(self._entries):
+            if self.total_bytes() <= self.max_bytes:
+                break
+            if self._entries[key].refcount == 0:
+                del self._entries[key]
+                evicted = True
+        if evicted:
+            _free_memory()
+
+
+def _free_memory() -> None:
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def _budget_from_env() -> int | None:
+    value = os.environ.get("PIPELINE_MODEL_BUDGET_MB")
+    if not value:
+        return None
+    return int(value) * 1024 * 1024
+
+
+registry = ModelRegistry(max_bytes=_budget_from_env())
+
+
+def acquire_model(
+    repo_id: str,
+    device: str | None = None,
+    dtype: torch.dtype | None = None,
+    processor_cls: Any = None,
+    model_cls: Any = None,
+) -> tuple[Any, Any]:
+    """Acquire a shared (processor, model) pair from the process-wide registry."""
+    return registry.acquire(repo_id, device, dtype, processor_cls, model_cls)
+
+
+def release_model(
+    repo_id: str,
+    device: str | None = None,
+    dtype: torch.dtype | None = None,
+) -> None:
+    """Release a model previously returned by acquire_model."""
+    registry.release(repo_id, device, dtype)
+
+
+@contextmanager
+def using_model(
+    loader: Callable[..., tuple[Any, Any]], *args: Any, **kwargs: Any
+) -> Iterator[tuple[Any, Any]]:
+    """Acquire a (processor, model) pair from loader and release it on exit.
+
+    loader is any registry-backed factory such as create_qa_model; extra
+    arguments are passed through. While no caller holds the pair it may be
+    evicted under PIPELINE_MODEL_BUDGET_MB, and the next use reloads it.
+    """
+    processor, model = loader(*args, **kwargs)
+    try:
+        yield processor, model
+    finally:
+        registry.release_instance(model)
@@ -1,15 +1,33 @@
+import json
+import os
+import threading
 import warnings
-from typing import Literal
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Literal, TextIO
 
+from docling_core.transforms.serializer.markdown import MarkdownDocSerializer
 from docling_core.types.doc.document import (
+    DOCUMENT_TOKENS_EXPORT_LABELS,
     DescriptionAnnotation,
     DoclingDocument,
     PictureItem,
+    RichTableCell,
+    TableCell,
     TableItem,
 )
+from PIL import Image
+from tabulate import tabulate
 
+if TYPE_CHECKING:
+    import pandas as pd
 
-def get_description(pic: PictureItem) -> dict[str, str] | None:
+ElementType = Literal["picture", "table"]
+
+
+def get_description(pic: PictureItem) -> dict[str, str | None] | None:
     """Extract description from meta or annotations fallback."""
     if pic.meta and pic.meta.description:
         return {
@@ -24,55 +42,378 @@ def get_description(pic: PictureItem) -> dict[str, str] | None:
     return None
 
 
-def get_table_content(table: TableItem, doc: DoclingDocument) -> dict[str, object]:
-    """Extract table content as markdown and structured data."""
+@dataclass
+class TableContent:
+    """Columns, rows and markdown of one table.
+
+    columns and rows follow TableItem.export_to_dataframe: the leading rows
+    holding a column header cell (header_rows of them) are joined with "."
+    into column names, or columns are "0", "1", ... without header rows.
+    markdown is TableItem.export_to_markdown(doc=doc).
+    """
+
+    columns: list[str]
+    rows: list[list[str]]
+    markdown: str
+    header_rows: int = 0
+
+    @cached_property
+    def dataframe(self) -> "pd.DataFrame":
+        """The table as a DataFrame, built on first access."""
+        import pandas as pd
+
+        columns = pd.Index(self.columns) if self.header_rows else None
+        return pd.DataFrame(self.rows, columns=columns)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the table content of a build_output element."""
+        return {
+            "markdown": self.markdown,
+            "data": {"columns": self.columns, "rows": self.rows},
+        }
+
+
+def _uses_docling_export(table: TableItem) -> bool:
+    """True if the table needs docling's own serialisers.
+
+    Meta, legacy annotations and rich cells change the markdown in ways
+    extract_table does not reproduce, and tables with a label outside the
+    default export labels get no table body.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=DeprecationWarning)
+        annotated = bool(table.annotations)
+    return (
+        bool(table.meta)
+        or annotated
+        or table.label not in DOCUMENT_TOKENS_EXPORT_LABELS
+        or any(isinstance(cell, RichTableCell) for cell in table.data.table_cells)
+    )
+
+
+def _docling_table_content(table: TableItem, doc: DoclingDocument) -> TableContent:
     df = table.export_to_dataframe(doc=doc)
-    return {
-        "markdown": table.export_to_markdown(doc=doc),
-        "data": {
-            "columns": [str(c) for c in df.columns],
-            "rows": df.values.tolist(),
-        },
-    }
+    # Rows export_to_dataframe turned into column names
+    header_rows = table.data.num_rows - len(df) if len(df.columns) else 0
+    content = TableContent(
+        columns=[str(c) for c in df.columns],
+        rows=df.values.tolist(),
+        markdown=table.export_to_markdown(doc=doc),
+        header_rows=header_rows,
+    )
+    content.__dict__["dataframe"] = df
+    return content
 
 
-def build_element(
+def extract_table(table: TableItem, doc: DoclingDocument) -> TableContent:
+    """Read a table's columns, rows and markdown in one pass over its cells.
+
+    Gives the same result as export_to_dataframe plus export_to_markdown
+    without building TableData.grid's cell objects or a DataFrame. Tables
+    with meta, annotations or rich cells go through docling's exporters.
+    """
+    if _uses_docling_export(table):
+        return _docling_table_content(table, doc)
+
+    data = table.data
+    num_rows, num_cols = data.num_rows, data.num_cols
+    # Later cells overwrite earlier ones, as in TableData.grid
+    grid: list[list[TableCell | None]] = [[None] * num_cols for _ in range(num_rows)]
+    for cell in data.table_cells:
+        for i in range(
+            min(cell.start_row_offset_idx, num_rows),
+            min(cell.end_row_offset_idx, num_rows),
+        ):
+            line = grid[i]
+            for j in range(
+                min(cell.start_col_offset_idx, num_cols),
+                min(cell.end_col_offset_idx, num_cols),
+            ):
+                line[j] = cell
+    texts = [["" if cell is None else cell.text for cell in line] for line in grid]
+
+    parts = []
+    if table.captions:
+        caption = MarkdownDocSerializer(doc=doc).serialize_captions(item=table).text
+        if caption:
+            parts.append(caption)
+    if texts:
+        cells = [
+            [text.replace("\n", " ").replace("|", "&#124;") for text in line]
+            for line in texts
+        ]
+        try:
+            markdown = tabulate(cells[1:], headers=cells[0], tablefmt="github")
+        except ValueError:
+            markdown = tabulate(
+                cells[1:], headers=cells[0], tablefmt="github", disable_numparse=True
+            )
+        if markdown:
+            parts.append(markdown)
+
+    if num_rows == 0 or num_cols == 0:
+        return TableContent(columns=[], rows=[], markdown="\n\n".join(parts))
+
+    header_rows = 0
+    for line in grid:
+        if not any(cell is not None and cell.column_header for cell in line):
+            break
+        header_rows += 1
+    if header_rows:
+        columns = [""] * num_cols
+        for line in texts[:header_rows]:
+            for j, text in enumerate(line):
+                columns[j] += f".{text}" if columns[j] else text
+    else:
+        columns = [str(j) for j in range(num_cols)]
+    return TableContent(
+        columns=columns,
+        rows=texts[header_rows:],
+        markdown="\n\n".join(parts),
+        header_rows=header_rows,
+    )
+
+
+def get_table_content(table: TableItem, doc: DoclingDocument) -> dict[str, Any]:
+    """Extract table content as markdown and structured data."""
+    return extract_table(table, doc).to_dict()
+
+
+@dataclass
+class Element:
+    """A picture or table with the exports build_output and the app use.
+
+    description is set for pictures and table for tables. image is the
+    element's crop, set only when it was requested.
+    """
+
+    item: PictureItem | TableItem
+    number: int
+    type: ElementType
+    caption: str
+    description: dict[str, str | None] | None = None
+    table: TableContent | None = None
+    image: Image.Image | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the element dict of build_output."""
+        if self.table is not None:
+            content = self.table.to_dict()
+        else:
+            content = {"description": self.description}
+        return {
+            "element_number": self.number,
+            "type": self.type,
+            "reference": self.item.self_ref,
+            "caption": self.caption,
+            "content": content,
+        }
+
+
+def make_element(
     item: PictureItem | TableItem,
     doc: DoclingDocument,
     element_number: int,
-    element_type: Literal["picture", "table"],
-) -> dict[str, object]:
-    """Build a unified element dict for a picture or table."""
+    element_type: ElementType,
+) -> Element:
+    """Compute the caption and description or table content of an element."""
+    element = Element(
+        item=item,
+        number=element_number,
+        type=element_type,
+        caption=item.caption_text(doc=doc) or "",
+    )
     if element_type == "picture":
         assert isinstance(item, PictureItem)
-        content: dict[str, object] = {"description": get_description(item)}
+        element.description = get_description(item)
     else:
         assert isinstance(item, TableItem)
-        content = get_table_content(item, doc)
-    return {
-        "element_number": element_number,
-        "type": element_type,
-        "reference": item.self_ref,
-        "caption": item.caption_text(doc=doc) or "",
-        "content": content,
-    }
+        element.table = extract_table(item, doc)
+    return element
+
+
+def build_element(
+    item: PictureItem | TableItem,
+    doc: DoclingDocument,
+    element_number: int,
+    element_type: ElementType,
+) -> dict[str, Any]:
+    """Build a unified element dict for a picture or table."""
+    return make_element(item, doc, element_number, element_type).to_dict()
+
+
+def _default_view_workers() -> int:
+    return min(4, os.cpu_count() or 1)
+
+
+class DocumentView:
+    """The elements of one document, each computed once and kept.
+
+    Elements are numbered like build_output: pictures first, then tables,
+    from 1. element() computes an element on first request; elements()
+    computes all missing ones on a pool of workers threads. With
+    images=True each element also holds its decoded image crop, so a page
+    that shows the crops next to the JSON download reads both from here.
+    """
+
+    def __init__(
+        self,
+        doc: DoclingDocument,
+        images: bool = False,
+        workers: int | None = None,
+    ) -> None:
+        self.doc = doc
+        self.images = images
+        self.workers = workers if workers is not None else _default_view_workers()
+        self._items: list[tuple[PictureItem | TableItem, ElementType]] = [
+            *((pic, "picture") for pic in doc.pictures),
+            *((table, "table") for table in doc.tables),
+        ]
+        self._elements: dict[int, Future[Element]] = {}
+        self._lock = threading.Lock()
+        # Crops without an image of their own share and lazily load the
+        # page image, which PIL must not do from two threads at once
+        self._page_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def element(self, number: int) -> Element:
+        """Return element number (1-based), computing it on first request."""
+        with self._lock:
+            future = self._elements.get(number)
+            owner = future is None
+            if future is None:
+                future = self._elements[number] = Future()
+        if owner:
+            try:
+                future.set_result(self._build(number))
+            except BaseException as exc:
+                future.set_exception(exc)
+        return future.result()
 
+    def elements(self) -> list[Element]:
+        """Return every element, computing missing ones in parallel."""
+        numbers = range(1, len(self._items) + 1)
+        if self.workers <= 1 or len(numbers) <= 1:
+            return [self.element(number) for number in numbers]
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="document-view"
+        ) as pool:
+            return list(pool.map(self.element, numbers))
 
-def build_output(doc: DoclingDocument, duration_s: float) -> dict[str, object]:
-    """Build the output dictionary from a converted document."""
-    elements: list[dict[str, object]] = []
+    @property
+    def pictures(self) -> list[Element]:
+        """The picture elements, in document order."""
+        return self.elements()[: len(self.doc.pictures)]
+
+    @property
+    def tables(self) -> list[Element]:
+        """The table elements, in document order."""
+        return self.elements()[len(self.doc.pictures) :]
+
+    def _build(self, number: int) -> Element:
+        if not 1 <= number <= len(self._items):
+            raise IndexError(f"element {number} out of range 1..{len(self._items)}")
+        item, element_type = self._items[number - 1]
+        element = make_element(item, self.doc, number, element_type)
+        if self.images:
+            if item.image is not None:
+                element.image = item.get_image(self.doc)
+            else:
+                with self._page_lock:
+                    element.image = item.get_image(self.doc)
+            if element.image is not None:
+                # Decode here rather than in whichever thread shows it
+                element.image.load()
+        return element
+
+
+def iter_elements(
+    doc: DoclingDocument, view: DocumentView | None = None
+) -> Iterator[dict[str, Any]]:
+    """Yield the element dicts of build_output one at a time.
+
+    Pictures come first, then tables, numbered from 1. Each element is built
+    only when requested, so a caller that writes it out before asking for
+    the next never holds more than one table's rows. With view, elements
+    are read from (and kept in) the view instead.
+    """
+    if view is not None:
+        for number in range(1, len(view) + 1):
+            yield view.element(number).to_dict()
+        return
     counter = 1
     for pic in doc.pictures:
-        elements.append(build_element(pic, doc, counter, "picture"))
+        yield build_element(pic, doc, counter, "picture")
         counter += 1
     for table in doc.tables:
-        elements.append(build_element(table, doc, counter, "table"))
+        yield build_element(table, doc, counter, "table")
         counter += 1
+
+
+def document_info(doc: DoclingDocument, duration_s: float) -> dict[str, Any]:
+    """Build the document_info summary of build_output."""
+    return {
+        "num_pictures": len(doc.pictures),
+        "num_tables": len(doc.tables),
+        "total_duration_s": duration_s,
+    }
+
+
+def build_output(
+    doc: DoclingDocument, duration_s: float, view: DocumentView | None = None
+) -> dict[str, Any]:
+    """Build the output dictionary from a converted document.
+
+    Elements are built in parallel through a DocumentView of doc; pass view
+    to reuse the elements it already holds.
+    """
+    if view is None:
+        view = DocumentView(doc)
     return {
-        "document_info": {
-            "num_pictures": len(doc.pictures),
-            "num_tables": len(doc.tables),
-            "total_duration_s": duration_s,
-        },
-        "elements": elements,
+        "document_info": document_info(doc, duration_s),
+        "elements": [element.to_dict() for element in view.elements()],
     }
+
+
+def write_output(
+    doc: DoclingDocument,
+    duration_s: float,
+    fp: TextIO,
+    format: Literal["json", "ndjson"] = "json",
+    indent: int | None = 2,
+    view: DocumentView | None = None,
+) -> None:
+    """Serialise build_output(doc, duration_s) to fp one element at a time.
+
+    "json" writes the same text as json.dump(build_output(...), fp,
+    indent=indent). "ndjson" writes one line holding {"document_info": ...}
+    followed by one line per element, and ignores indent. Either way only
+    the element being written is held in memory, so fp can be a file or a
+    socket's makefile("w"), unless view is given: its elements are reused
+    and kept.
+    """
+    info = document_info(doc, duration_s)
+    if format == "ndjson":
+        fp.write(json.dumps({"document_info": info}) + "\n")
+        for element in iter_elements(doc, view):
+            fp.write(json.dumps(element) + "\n")
+        return
+
+    # Reproduce json.dump's layout around separately dumped elements
+    newline = "\n" if indent is not None else ""
+    pad = " " * (indent or 0)
+    key_separator = "," + (newline + pad if indent is not None else " ")
+    item_separator = "," + (newline + pad * 2 if indent is not None else " ")
+
+    info_json = json.dumps(info, indent=indent).replace("\n", "\n" + pad)
+    fp.write(f'{{{newline}{pad}"document_info": {info_json}')
+    fp.write(f'{key_separator}"elements": [')
+    first = True
+    for element in iter_elements(doc, view):
+        element_json = json.dumps(element, indent=indent)
+        fp.write(newline + pad * 2 if first else item_separator)
+        fp.write(element_json.replace("\n", "\n" + pad * 2))
+        first = False
+    fp.write(f"]{newline}}}" if first else f"{newline}{pad}]{newline}}}")
@@ -0,0 +1,249 @@
+"""Columnar export: append extraction results to a Parquet dataset.
+
+A dataset is a directory with one subdirectory per record kind, each
+holding one Parquet file per document (a "part"):
+
+    documents/<part>.parquet     one row per document (its document_info)
+    pictures/<part>.parquet      one row per picture
+    table_cells/<part>.parquet   one row per table body cell
+    tables/<part>/<n>.parquet    or one file per table, element number n
+
+Every kind has a fixed schema, so parts of many documents read as one
+table, e.g. pyarrow.dataset.dataset(root / "pictures"), and readers can
+load only the columns they need. The documents part is written last, so
+its presence marks a complete document.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+from typing import Literal
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from docling_core.types.doc.document import DoclingDocument, ProvenanceItem
+
+from pipeline.output import DocumentView, Element, TableContent
+
+TableLayout = Literal["cells", "files"]
+DatasetKind = Literal["documents", "pictures", "table_cells"]
+
+DOCUMENT_SCHEMA = pa.schema(
+    [
+        pa.field("document", pa.string(), nullable=False),
+        pa.field("num_pages", pa.int32(), nullable=False),
+        pa.field("num_pictures", pa.int32(), nullable=False),
+        pa.field("num_tables", pa.int32(), nullable=False),
+        pa.field("total_duration_s", pa.float64(), nullable=False),
+    ]
+)
+
+BBOX_TYPE = pa.struct(
+    [
+        pa.field("l", pa.float64()),
+        pa.field("t", pa.float64()),
+        pa.field("r", pa.float64()),
+        pa.field("b", pa.float64()),
+        pa.field("coord_origin", pa.string()),
+    ]
+)
+
+PICTURE_SCHEMA = pa.schema(
+    [
+        pa.field("document", pa.string(), nullable=False),
+        pa.field("element_number", pa.int32(), nullable=False),
+        pa.field("reference", pa.string(), nullable=False),
+        pa.field("caption", pa.string(), nullable=False),
+        pa.field("description", pa.string()),
+        pa.field("description_provenance", pa.string()),
+        pa.field("page", pa.int32()),
+        pa.field("bbox", BBOX_TYPE),
+    ]
+)
+
+TABLE_CELL_SCHEMA = pa.schema(
+    [
+        pa.field("document", pa.string(), nullable=False),
+        pa.field("element_number", pa.int32(), nullable=False),
+        pa.field("reference", pa.string(), nullable=False),
+        pa.field("caption", pa.string(), nullable=False),
+        pa.field("page", pa.int32()),
+        pa.field("row", pa.int32(), nullable=False),
+        pa.field("column", pa.int32(), nullable=False),
+        pa.field("column_name", pa.string(), nullable=False),
+        pa.field("value", pa.string(), nullable=False),
+    ]
+)
+
+SCHEMAS: dict[DatasetKind, pa.Schema] = {
+    "documents": DOCUMENT_SCHEMA,
+    "pictures": PICTURE_SCHEMA,
+    "table_cells": TABLE_CELL_SCHEMA,
+}
+
+
+def _provenance(element: Element) -> ProvenanceItem | None:
+    prov = element.item.prov
+    return prov[0] if prov and isinstance(prov[0], ProvenanceItem) else None
+
+
+def pictures_table(view: DocumentView, document: str) -> pa.Table:
+    """Return the pictures of view as a table with PICTURE_SCHEMA."""
+    rows = []
+    for element in view.pictures:
+        prov = _provenance(element)
+        description = element.description or {}
+        rows.append(
+            {
+                "document": document,
+                "element_number": element.number,
+                "reference": element.item.self_ref,
+                "caption": element.caption,
+                "description": description.get("text"),
+                "description_provenance": description.get("created_by"),
+                "page": prov.page_no if prov else None,
+                "bbox": {
+                    "l": prov.bbox.l,
+                    "t": prov.bbox.t,
+                    "r": prov.bbox.r,
+                    "b": prov.bbox.b,
+                    "coord_origin": prov.bbox.coord_origin.value,
+                }
+                if prov
+                else None,
+            }
+        )
+    return pa.Table.from_pylist(rows, schema=PICTURE_SCHEMA)
+
+
+def table_cells_table(view: DocumentView, document: str) -> pa.Table:
+    """Return one row per body cell of every table of view (TABLE_CELL_SCHEMA).
+
+    Header rows are not repeated as cells; their text is in column_name,
+    as in the columns of build_output. Merged cells appear once per grid
+    position they span.
+    """
+    columns: dict[str, list] = {name: [] for name in TABLE_CELL_SCHEMA.names}
+    for element in view.tables:
+        content = element.table
+        assert content is not None
+        prov = _provenance(element)
+        count = len(content.rows) * len(content.columns)
+        columns["document"] += [document] * count
+        columns["element_number"] += [element.number] * count
+        columns["reference"] += [element.item.self_ref] * count
+        columns["caption"] += [element.caption] * count
+        columns["page"] += [prov.page_no if prov else None] * count
+        for i, line in enumerate(content.rows):
+            columns["row"] += [i] * len(line)
+            columns["column"] += range(len(line))
+            columns["column_name"] += content.columns
+            columns["value"] += line
+    return pa.Table.from_pydict(columns, schema=TABLE_CELL_SCHEMA)
+
+
+def table_to_arrow(content: TableContent) -> pa.Table:
+    """Return a table's body as an Arrow table with one string column each.
+
+    Empty column names become column_<index> and repeated ones get a ".1",
+    ".2", ... suffix, like pandas.read_csv, so every column can be selected
+    by name.
+    """
+    names: list[str] = []
+    for j, column in enumerate(content.columns):
+        name = unique = column or f"column_{j}"
+        count = 1
+        while unique in names:
+            unique = f"{name}.{count}"
+            count += 1
+        names.append(unique)
+    arrays = [
+        pa.array([line[j] for line in content.rows], pa.string())
+        for j in range(len(names))
+    ]
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def _write_table(table: pa.Table, path: Path) -> None:
+    # Temporary files start with ".", which dataset readers skip
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def write_parquet(
+    doc: DoclingDocument,
+    duration_s: float,
+    root: str | Path,
+    part: str,
+    document: str | None = None,
+    tables: TableLayout = "cells",
+    view: DocumentView | None = None,
+) -> list[Path]:
+    """Append doc to the Parquet dataset at root as part; return the files.
+
+    part names the document's files (it may contain "/" to mirror an input
+    tree); writing the same part again replaces them. document fills the
+    document column and defaults to part. tables="cells" writes the
+    table_cells part, "files" one file per table under tables/<part>/,
+    with the document, reference and caption in its schema metadata.
+    """
+    root = Path(root)
+    document = document if document is not None else part
+    view = view if view is not None else DocumentView(doc)
+    written = []
+
+    def write(table: pa.Table, path: Path) -> None:
+        _write_table(table, path)
+        written.append(path)
+
+    write(pictures_table(view, document), root / "pictures" / f"{part}.parquet")
+    if tables == "cells":
+        write(
+            table_cells_table(view, document),
+            root / "table_cells" / f"{part}.parquet",
+        )
+    else:
+        table_dir = root / "tables" / part
+        for stale in table_dir.glob("*.parquet"):
+            stale.unlink()
+        for element in view.tables:
+            assert element.table is not None
+            table = table_to_arrow(element.table).replace_schema_metadata(
+                {
+                    "document": document,
+                    "reference": element.item.self_ref,
+                    "caption": element.caption,
+                }
+            )
+            write(table, table_dir / f"{element.number}.parquet")
+
+    info = pa.Table.from_pylist(
+        [
+            {
+                "document": document,
+                "num_pages": len(doc.pages),
+                "num_pictures": len(doc.pictures),
+                "num_tables": len(doc.tables),
+                "total_duration_s": duration_s,
+            }
+        ],
+        schema=DOCUMENT_SCHEMA,
+    )
+    write(info, root / "documents" / f"{part}.parquet")
+    return written
+
+
+def open_parquet_dataset(root: str | Path, kind: DatasetKind) -> ds.Dataset:
+    """Open every part of one kind of the dataset at root as a single dataset.
+
+    Use .to_table(columns=[...], filter=...) to read only what is needed.
+    """
+    return ds.dataset(Path(root) / kind, schema=SCHEMAS[kind], format="parquet")
@@ -1,11 +1,28 @@
 """Multipage QA using Granite Vision."""
 
+import os
+import threading
+import weakref
+from collections.abc import Callable, Generator, Mapping
+from typing import Any
+
+import numpy as np
 import torch
 from PIL import Image
-from transformers import AutoModelForVision2Seq, AutoProcessor
+from transformers import AutoModelForVision2Seq, AutoProcessor, Cache
+
+from pipeline.cache import TensorCache, image_sha256
+from pipeline.models import GRANITE_VISION_REPO, acquire_model
+from pipeline.streaming import GenerationStream
+
+# Answer budget per question
+QA_MAX_NEW_TOKENS = 1024
+
+# Longer side, in pixels, that pages are resized to for the model
+QA_MAX_DIM = 768
 
 
-def resize_for_qa(image: Image.Image, max_dim: int = 768) -> Image.Image:
+def resize_for_qa(image: Image.Image, max_dim: int = QA_MAX_DIM) -> Image.Image:
     """Resize image so its longer dimension is at most max_dim pixels.
 
     Preserves aspect ratio using LANCZOS resampling.
@@ -23,18 +40,121 @@ def resize_for_qa(image: Image.Image, max_dim: int = 768) -> Image.Image:
 
 def create_qa_model(
     device: str | None = None,
+    dtype: torch.dtype | None = None,
 ) -> tuple[AutoProcessor, AutoModelForVision2Seq]:
     """Load Granite Vision 3.3 2B for multipage QA.
 
-    When device is None, auto-detects: CUDA if available, else CPU.
-    MPS is excluded for consistency with other pipeline models.
+    The pair comes from the shared model registry, so segmentation reuses
+    the same weights for the same device and dtype.
+    """
+    return acquire_model(GRANITE_VISION_REPO, device, dtype)
+
+
+def _qa_conversation(images: list[Image.Image], question: str) -> list[dict]:
+    content: list[dict] = [{"type": "image", "image": img} for img in images]
+    content.append({"type": "text", "text": question})
+    return [{"role": "user", "content": content}]
+
+
+def _feature_cache_bytes_from_env() -> int:
+    value = os.environ.get("PIPELINE_QA_FEATURE_CACHE_MB")
+    return int(value) * 1024 * 1024 if value else 512 * 1024**2
+
+
+# Budget of each model's page feature cache; a 768px page is a few MiB
+QA_FEATURE_CACHE_BYTES = _feature_cache_bytes_from_env()
+
+_qa_features: weakref.WeakKeyDictionary[Any, TensorCache] = weakref.WeakKeyDictionary()
+_qa_features_lock = threading.Lock()
+
+
+def qa_feature_cache(model: AutoModelForVision2Seq) -> TensorCache:
+    """Return the page feature cache of model.
+
+    Entries map "<image sha256>:<max_dim>" to the resized page pixels and
+    the packed vision-tower features of that page. Each model has its own
+    cache, bounded by QA_FEATURE_CACHE_BYTES (PIPELINE_QA_FEATURE_CACHE_MB)
+    and dropped along with the model.
     """
-    if device is None:
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-    model_path = "ibm-granite/granite-vision-3.3-2b"
-    processor = AutoProcessor.from_pretrained(model_path)
-    model = AutoModelForVision2Seq.from_pretrained(model_path).to(device)
-    return processor, model
+    with _qa_features_lock:
+        cache = _qa_features.get(model)
+        if cache is None:
+            cache = TensorCache(QA_FEATURE_CACHE_BYTES)
+            _qa_features[model] = cache
+        return cache
+
+
+def _qa_inputs(
+    images: list[Image.Image],
+    question: str,
+    processor: AutoProcessor,
+    model: AutoModelForVision2Seq,
+    on_features: Callable[[int, int], None] | None = None,
+    max_dim: int = QA_MAX_DIM,
+) -> dict[str, Any]:
+    """Build the model inputs for one question about images.
+
+    Pages found in the feature cache skip resizing and the vision tower;
+    only the missing pages are encoded, in one batch. Their features are
+    scattered into the image token embeddings, so the returned inputs
+    carry inputs_embeds instead of pixel_values. on_features, if given, is
+    called with the number of cache hits and misses.
+    """
+    if not (1 <= len(images) <= 8):
+        raise ValueError(f"Expected 1 to 8 images, got {len(images)}")
+
+    cache = qa_feature_cache(model)
+    keys = [f"{image_sha256(img)}:{max_dim}" for img in images]
+    entries = [cache.get(key) for key in keys]
+    prepared = [
+        resize_for_qa(img.convert("RGB"), max_dim)
+        if entry is None
+        else Image.fromarray(entry[0].numpy())
+        for img, entry in zip(images, entries, strict=True)
+    ]
+
+    device = next(model.parameters()).device
+
+    inputs = dict(
+        processor.apply_chat_template(  # type: ignore[operator]
+            _qa_conversation(prepared, question),
+            add_generation_prompt=True,
+            tokenize=True,
+            return_dict=True,
+            return_tensors="pt",
+        ).to(device)
+    )
+    missing = [i for i, entry in enumerate(entries) if entry is None]
+    if on_features is not None:
+        on_features(len(images) - len(missing), len(missing))
+    if "pixel_values" not in inputs:
+        return inputs
+
+    pixel_values = inputs.pop("pixel_values")
+    image_sizes = inputs.pop("image_sizes")
+    features: list[torch.Tensor | None] = [
+        None if entry is None else entry[1] for entry in entries
+    ]
+    if missing:
+        with torch.inference_mode():
+            computed = model.get_image_features(
+                pixel_values[missing], image_sizes[missing]
+            )
+        for i, page_features in zip(missing, computed, strict=True):
+            pixels = torch.from_numpy(np.array(prepared[i]))
+            cache.put(keys[i], (pixels, page_features))
+            features[i] = page_features
+
+    input_ids = inputs["input_ids"]
+    with torch.inference_mode():
+        embeds = model.get_input_embeddings()(input_ids)
+        image_features = torch.cat([f for f in features if f is not None])
+        image_features = image_features.to(embeds.device, embeds.dtype)
+        image_mask = (input_ids == model.config.image_token_index).unsqueeze(-1)
+        inputs["inputs_embeds"] = embeds.masked_scatter(
+            image_mask.expand_as(embeds), image_features
+        )
+    return inputs
 
 
 def generate_qa_response(
@@ -42,39 +162,170 @@ def generate_qa_response(
     question: str,
     processor: AutoProcessor,
     model: AutoModelForVision2Seq,
+    on_features: Callable[[int, int], None] | None = None,
 ) -> str:
     """Answer a question about one or more page images.
 
     Accepts 1-8 images. Each image is converted to RGB and resized so the
     longer dimension is at most 768px. All images are passed to the model
-    in a single conversation turn.
+    in a single conversation turn. Resized pages and their vision features
+    come from qa_feature_cache where possible; on_features, if given, is
+    called with the number of pages found there and the number encoded.
 
     Raises ValueError if images list has 0 or more than 8 items.
     Returns empty string if the model produces no output.
     """
-    if not (1 <= len(images) <= 8):
-        raise ValueError(f"Expected 1 to 8 images, got {len(images)}")
+    inputs = _qa_inputs(images, question, processor, model, on_features)
 
-    prepared = [resize_for_qa(img.convert("RGB")) for img in images]
+    with torch.inference_mode():
+        output = model.generate(**inputs, max_new_tokens=QA_MAX_NEW_TOKENS)
 
-    device = next(model.parameters()).device
+    trimmed = output[:, inputs["input_ids"].shape[1] :]
+    decoded = processor.decode(trimmed[0], skip_special_tokens=True)  # type: ignore[operator]
+    return decoded
 
-    content: list[dict] = [{"type": "image", "image": img} for img in prepared]
-    content.append({"type": "text", "text": question})
 
-    conversation = [{"role": "user", "content": content}]
+def stream_qa_response(
+    images: list[Image.Image],
+    question: str,
+    processor: AutoProcessor,
+    model: AutoModelForVision2Seq,
+    on_features: Callable[[int, int], None] | None = None,
+) -> Generator[str]:
+    """Answer like generate_qa_response, yielding text chunks as they decode.
 
-    inputs = processor.apply_chat_template(  # type: ignore[operator]
-        conversation,
-        add_generation_prompt=True,
-        tokenize=True,
-        return_dict=True,
-        return_tensors="pt",
-    ).to(device)
+    Inputs are checked and prepared before this returns, so ValueError is
+    raised here rather than on the first chunk. Generation runs on a
+    background thread once iteration starts; closing the iterator early
+    stops it.
+    """
+    inputs = _qa_inputs(images, question, processor, model, on_features)
+    return _stream_answer(inputs, processor, model)
 
-    with torch.inference_mode():
-        output = model.generate(**inputs, max_new_tokens=1024)
 
-    trimmed = output[:, inputs["input_ids"].shape[1] :]
-    decoded = processor.decode(trimmed[0], skip_special_tokens=True)  # type: ignore[operator]
-    return decoded
+def _stream_answer(
+    inputs: Mapping[str, Any],
+    processor: AutoProcessor,
+    model: AutoModelForVision2Seq,
+) -> Generator[str]:
+    with GenerationStream(
+        model,
+        processor.tokenizer,  # type: ignore[attr-defined]
+        inputs,
+        max_new_tokens=QA_MAX_NEW_TOKENS,
+    ) as stream:
+        yield from stream
+
+
+class QASession:
+    """Answer several questions about one fixed set of page images.
+
+    The first question runs the images through the vision tower and
+    prefills the prompt up to the last image token. That prefix KV cache is
+    kept, so later questions prefill only their own tokens; after each
+    answer the cache is cropped back to the prefix. The session holds no
+    reference to the model, so the model registry can still evict it, and
+    a question asked with a different model rebuilds the prefix. Start a
+    new session when the page set changes. on_features is called as in
+    generate_qa_response, only for questions that build the prefix.
+
+    Raises ValueError if images has 0 or more than 8 items.
+    """
+
+    def __init__(self, images: list[Image.Image]) -> None:
+        if not (1 <= len(images) <= 8):
+            raise ValueError(f"Expected 1 to 8 images, got {len(images)}")
+        self.images = [resize_for_qa(img.convert("RGB")) for img in images]
+        self.prefix_length = 0
+        self._prefix_ids: torch.Tensor | None = None
+        self._cache: Cache | None = None
+        self._model: weakref.ref | None = None
+        self._lock = threading.Lock()
+
+    def ask(
+        self,
+        question: str,
+        processor: AutoProcessor,
+        model: AutoModelForVision2Seq,
+        on_features: Callable[[int, int], None] | None = None,
+    ) -> str:
+        """Answer question like generate_qa_response, reusing the page prefix."""
+        with self._lock:
+            inputs = self._inputs(question, processor, model, on_features)
+            try:
+                with torch.inference_mode():
+                    output = model.generate(**inputs, max_new_tokens=QA_MAX_NEW_TOKENS)
+            finally:
+                self._crop()
+        trimmed = output[:, inputs["input_ids"].shape[1] :]
+        return processor.decode(trimmed[0], skip_special_tokens=True)  # type: ignore[operator]
+
+    def stream(
+        self,
+        question: str,
+        processor: AutoProcessor,
+        model: AutoModelForVision2Seq,
+        on_features: Callable[[int, int], None] | None = None,
+    ) -> Generator[str]:
+        """Answer question like stream_qa_response, reusing the page prefix."""
+        with self._lock:
+            inputs = self._inputs(question, processor, model, on_features)
+            try:
+                yield from _stream_answer(inputs, processor, model)
+            finally:
+                self._crop()
+
+    def _inputs(
+        self,
+        question: str,
+        processor: AutoProcessor,
+        model: AutoModelForVision2Seq,
+        on_features: Callable[[int, int], None] | None,
+    ) -> dict[str, Any]:
+        if self._model is None or self._model() is not model:
+            self._prefill(question, processor, model, on_features)
+        assert self._prefix_ids is not None
+        conversation = _qa_conversation(self.images, question)
+        text = processor.apply_chat_template(  # type: ignore[operator]
+            conversation, add_generation_prompt=True, tokenize=False
+        )
+        image_token = processor.image_token  # type: ignore[attr-defined]
+        suffix = text[text.rindex(image_token) + len(image_token) :]
+        suffix_ids = processor.tokenizer(  # type: ignore[attr-defined]
+            suffix, add_special_tokens=False, return_tensors="pt"
+        )["input_ids"].to(self._prefix_ids.device)
+        input_ids = torch.cat([self._prefix_ids, suffix_ids], dim=1)
+        return {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids),
+            "past_key_values": self._cache,
+        }
+
+    def _prefill(
+        self,
+        question: str,
+        processor: AutoProcessor,
+        model: AutoModelForVision2Seq,
+        on_features: Callable[[int, int], None] | None,
+    ) -> None:
+        """Encode the images and cache the prompt up to the last image token."""
+        inputs = _qa_inputs(self.images, question, processor, model, on_features)
+        input_ids = inputs["input_ids"]
+        image_token_id = model.config.image_token_index
+        positions = (input_ids[0] == image_token_id).nonzero()
+        self.prefix_length = int(positions[-1]) + 1
+        prefix = {
+            "inputs_embeds": inputs["inputs_embeds"][:, : self.prefix_length],
+            "attention_mask": inputs["attention_mask"][:, : self.prefix_length],
+        }
+        with torch.inference_mode():
+            output = model(**prefix, use_cache=True, logits_to_keep=1)
+        self._prefix_ids = input_ids[:, : self.prefix_length]
+        self._cache = output.past_key_values
+        self._model = weakref.ref(model)
+
+    def _crop(self) -> None:
+        # Drop the question and answer, keeping only the page prefix
+        if self._cache is not None:
+            with torch.inference_mode():
+                self._cache.crop(self.prefix_length)
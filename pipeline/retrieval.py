@@ -0,0 +1,152 @@
+"""Page retrieval so Multipage QA can answer over long PDFs."""
+
+import hashlib
+import json
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+import pypdfium2
+
+from pipeline.cache import DiskCache, file_sha256
+
+# Bump when the layout of stored indexes changes
+_INDEX_FORMAT = 1
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase word tokens."""
+    return _WORD.findall(text.lower())
+
+
+def pdf_page_texts(pdf_path: str) -> list[str]:
+    """Return the text layer of every page, "" for pages without one.
+
+    Reads the text pdfium already holds, so no page is rendered or run
+    through a model.
+    """
+    pdf = pypdfium2.PdfDocument(pdf_path)
+    try:
+        texts = []
+        for page in pdf:
+            textpage = page.get_textpage()
+            texts.append(textpage.get_text_bounded())
+            textpage.close()
+            page.close()
+        return texts
+    finally:
+        pdf.close()
+
+
+@dataclass
+class PageIndex:
+    """BM25 index over the pages of one PDF.
+
+    term_counts[i] holds the token counts of page i. Pages whose text is
+    empty (scanned pages without a text layer) never score above zero.
+    """
+
+    term_counts: list[dict[str, int]]
+    k1: float = 1.5
+    b: float = 0.75
+
+    def __post_init__(self) -> None:
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = sum(self.lengths) / max(len(self.lengths), 1)
+        self.doc_freqs: Counter[str] = Counter()
+        for counts in self.term_counts:
+            self.doc_freqs.update(counts.keys())
+
+    @classmethod
+    def from_texts(cls, texts: list[str]) -> "PageIndex":
+        """Index one text per page."""
+        return cls([dict(Counter(tokenize(text))) for text in texts])
+
+    def __len__(self) -> int:
+        return len(self.term_counts)
+
+    def scores(self, question: str) -> list[float]:
+        """Return the BM25 score of every page for question."""
+        n = len(self.term_counts)
+        average = self.average_length or 1
+        norms = [
+            self.k1 * (1 - self.b + self.b * length / average)
+            for length in self.lengths
+        ]
+        scores = [0.0] * n
+        for term in set(tokenize(question)):
+            df = self.doc_freqs.get(term, 0)
+            if df == 0:
+                continue
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for i, counts in enumerate(self.term_counts):
+                tf = counts.get(term, 0)
+                if tf:
+                    scores[i] += idf * tf * (self.k1 + 1) / (tf + norms[i])
+        return scores
+
+    def search(self, question: str, k: int = 8) -> list[int]:
+        """Return the zero-based indices of the k best pages, in page order.
+
+        Ties, including questions that match no page, go to earlier pages.
+        """
+        scores = self.scores(question)
+        ranked = sorted(range(len(scores)), key=lambda i: -scores[i])
+        return sorted(ranked[:k])
+
+    def to_json(self) -> str:
+        """Serialise the index for storage."""
+        return json.dumps(
+            {
+                "format": _INDEX_FORMAT,
+                "k1": self.k1,
+                "b": self.b,
+                "term_counts": self.term_counts,
+            }
+        )
+
+    @classmethod
+    def from_json(cls, data: str) -> "PageIndex":
+        """Load an index written by to_json.
+
+        Raises ValueError for an index stored in another format.
+        """
+        entry = json.loads(data)
+        if entry.get("format") != _INDEX_FORMAT:
+            raise ValueError(f"Unsupported page index format {entry.get('format')}")
+        return cls(entry["term_counts"], k1=entry["k1"], b=entry["b"])
+
+
+def load_page_index(
+    pdf_path: str,
+    cache: DiskCache | None = None,
+    texts: list[str] | None = None,
+) -> PageIndex:
+    """Return the page index of a PDF, building and storing it on a miss.
+
+    Indexes are stored in cache under the SHA-256 of the file contents and
+    of the page texts, so later questions about the same PDF only pay for
+    retrieval. texts replaces the PDF text layer, e.g. Markdown exported
+    from doctags for scanned PDFs, and is indexed under its own key.
+    """
+    if texts is None:
+        key = f"{file_sha256(pdf_path)}-text"
+    else:
+        digest = hashlib.sha256(json.dumps(texts).encode()).hexdigest()
+        key = f"{file_sha256(pdf_path)}-{digest[:16]}"
+    if cache is not None:
+        stored = cache.get(key)
+        if stored is not None:
+            try:
+                return PageIndex.from_json(stored.decode())
+            except ValueError:
+                pass
+    index = PageIndex.from_texts(
+        texts if texts is not None else pdf_page_texts(pdf_path)
+    )
+    if cache is not None:
+        cache.put(key, index.to_json().encode())
+    return index
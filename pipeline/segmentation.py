@@ -1,11 +1,80 @@
 """Image segmentation using Granite Vision and SAM refinement."""
 
 import re
+import threading
+import weakref
+from collections.abc import Generator, Iterable
+from dataclasses import dataclass
+from itertools import batched
 
+import numpy as np
 import torch
 import torch.nn.functional as F
 from PIL import Image
-from transformers import AutoModelForVision2Seq, AutoProcessor, SamModel, SamProcessor
+from transformers import (
+    AutoModelForVision2Seq,
+    AutoProcessor,
+    BatchFeature,
+    PreTrainedTokenizerBase,
+    SamModel,
+    SamProcessor,
+    StoppingCriteria,
+    StoppingCriteriaList,
+)
+
+from pipeline.cache import TensorCache, image_sha256
+from pipeline.models import GRANITE_VISION_REPO, SAM_REPO, acquire_model
+from pipeline.streaming import GenerationStream
+
+# Generation budget per mask; generation normally stops at </seg> long before
+SEGMENTATION_MAX_NEW_TOKENS = 8192
+
+_SEG_PATTERN = re.compile(r"<seg>(.*?)</seg>", re.DOTALL)
+
+
+def decode_segmentation(
+    text: str,
+    patch_h: int = 24,
+    patch_w: int = 24,
+) -> tuple[torch.Tensor, list[str]] | None:
+    """Parse <seg>...</seg> RLE output into a grid of label ids.
+
+    Returns (grid, labels): grid is a (patch_h, patch_w) int64 tensor and
+    labels[i] names id i. "others" is always id 0; other labels are numbered
+    in order of first appearance. Runs are expanded with one np.repeat, so
+    Python work scales with the number of runs rather than the number of
+    patches. A short mask is padded with its last label and a long one
+    truncated. Returns None if no <seg> tags are found or the runs are
+    malformed.
+    """
+    match = _SEG_PATTERN.search(text)
+    if match is None:
+        return None
+    labels = ["others"]
+    ids: dict[str, int] = {"others": 0}
+    run_ids: list[int] = []
+    run_counts: list[int] = []
+    try:
+        for row in match.group(1).strip().split("\n"):
+            for token in row.split("| "):
+                parts = token.split(" *")
+                name = parts[0].strip()
+                run_counts.append(max(int(parts[1]), 0))
+                if name not in ids:
+                    ids[name] = len(labels)
+                    labels.append(name)
+                run_ids.append(ids[name])
+    except (IndexError, ValueError):
+        return None
+
+    flat = np.repeat(np.array(run_ids, dtype=np.int64), run_counts)
+    if len(flat) == 0:
+        return None
+    total_size = patch_h * patch_w
+    if len(flat) < total_size:
+        flat = np.pad(flat, (0, total_size - len(flat)), mode="edge")
+    grid = torch.from_numpy(flat[:total_size].reshape(patch_h, patch_w))
+    return grid, labels
 
 
 def extract_segmentation(
@@ -18,28 +87,84 @@ def extract_segmentation(
     Labels are mapped to 0 for "others" and 1 for any other label.
     Returns None if no <seg> tags found.
     """
-    match = re.search(r"<seg>(.*?)</seg>", text, re.DOTALL)
-    if match is None:
-        return None
-    try:
-        rows = match.group(1).strip().split("\n")
-        tokens = [token.split(" *") for row in rows for token in row.split("| ")]
-        tokens = [x[0].strip() for x in tokens for _ in range(int(x[1]))]
-    except (IndexError, ValueError):
+    decoded = decode_segmentation(text, patch_h, patch_w)
+    if decoded is None:
         return None
+    grid, _ = decoded
+    return (grid.numpy().ravel() > 0).astype(np.int64).tolist()
 
-    mask = [0 if item == "others" else 1 for item in tokens]
 
-    total_size = patch_h * patch_w
-    if len(mask) < total_size:
-        mask = mask + [mask[-1]] * (total_size - len(mask))
-    elif len(mask) > total_size:
-        mask = mask[:total_size]
-    return mask
+class RunLengthParser:
+    """Incrementally parse <seg> run-length text as it is generated.
+
+    feed() takes decoded text in chunks of any size. A run is recorded once
+    the separator after it (or </seg>) arrives, since its count may still be
+    growing. Malformed runs are skipped. total is the number of patches
+    covered by the recorded runs, and finished is set by </seg>.
+    """
+
+    def __init__(self) -> None:
+        self.labels = ["others"]
+        self.run_ids: list[int] = []
+        self.run_counts: list[int] = []
+        self.total = 0
+        self.started = False
+        self.finished = False
+        self._ids: dict[str, int] = {"others": 0}
+        self._pending = ""
+
+    def feed(self, text: str) -> None:
+        """Parse the next chunk of generated text."""
+        if self.finished:
+            return
+        self._pending += text
+        if not self.started:
+            start = self._pending.find("<seg>")
+            if start < 0:
+                # Keep enough text to match a tag split across chunks
+                self._pending = self._pending[-len("<seg>") + 1 :]
+                return
+            self.started = True
+            self._pending = self._pending[start + len("<seg>") :]
+        end = self._pending.find("</seg>")
+        if end >= 0:
+            self._add_runs(self._pending[:end])
+            self._pending = ""
+            self.finished = True
+            return
+        cut = max(self._pending.rfind("\n"), self._pending.rfind("|"))
+        if cut >= 0:
+            self._add_runs(self._pending[:cut])
+            self._pending = self._pending[cut + 1 :]
+
+    def grid(self, patch_h: int = 24, patch_w: int = 24) -> torch.Tensor:
+        """Return the label grid of the runs so far; patches not reached are 0."""
+        total_size = patch_h * patch_w
+        flat = np.repeat(np.array(self.run_ids, dtype=np.int64), self.run_counts)
+        grid = np.zeros(total_size, dtype=np.int64)
+        grid[: min(len(flat), total_size)] = flat[:total_size]
+        return torch.from_numpy(grid.reshape(patch_h, patch_w))
+
+    def _add_runs(self, text: str) -> None:
+        for token in re.split(r"[|\n]", text):
+            parts = token.split(" *")
+            if len(parts) < 2:
+                continue
+            try:
+                count = max(int(parts[1]), 0)
+            except ValueError:
+                continue
+            name = parts[0].strip()
+            if name not in self._ids:
+                self._ids[name] = len(self.labels)
+                self.labels.append(name)
+            self.run_ids.append(self._ids[name])
+            self.run_counts.append(count)
+            self.total += count
 
 
 def prepare_mask(
-    mask: list[int],
+    mask: list[int] | torch.Tensor,
     patch_h: int,
     patch_w: int,
     size: tuple[int, int],
@@ -47,7 +172,8 @@ def prepare_mask(
     """Reshape flat mask to 2D, threshold to binary, interpolate to image size.
 
     Args:
-        mask: Flat integer mask from extract_segmentation.
+        mask: Flat mask from extract_segmentation or label grid from
+            decode_segmentation; any nonzero label is foreground.
         patch_h: Patch grid height.
         patch_w: Patch grid width.
         size: Target (width, height) of the original image.
@@ -175,101 +301,162 @@ def draw_mask(mask: Image.Image, image: Image.Image) -> Image.Image:
 
 def create_granite_model(
     device: str | None = None,
+    dtype: torch.dtype | None = None,
 ) -> tuple[AutoProcessor, AutoModelForVision2Seq]:
     """Load Granite Vision 3.3 2B for segmentation.
 
-    When device is None, auto-detects: CUDA if available, else CPU.
-    MPS is excluded due to limited operator support in SAM/transformers.
+    The pair comes from the shared model registry, so QA reuses the same
+    weights for the same device and dtype.
     """
-    if device is None:
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-    model_path = "ibm-granite/granite-vision-3.3-2b"
-    processor = AutoProcessor.from_pretrained(model_path)
-    model = AutoModelForVision2Seq.from_pretrained(model_path).to(device)
-    return processor, model
+    return acquire_model(GRANITE_VISION_REPO, device, dtype)
 
 
 def create_sam_model(
     device: str | None = None,
+    dtype: torch.dtype | None = None,
 ) -> tuple[SamProcessor, SamModel]:
     """Load SAM ViT-Huge for mask refinement.
 
-    When device is None, auto-detects: CUDA if available, else CPU.
-    MPS is excluded due to limited operator support in SAM/transformers.
+    The pair comes from the shared model registry. Avoid passing MPS
+    explicitly; SAM has limited operator support there.
     """
-    if device is None:
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-    model_path = "facebook/sam-vit-huge"
-    processor = SamProcessor.from_pretrained(model_path)
-    model = SamModel.from_pretrained(model_path).to(device)
-    return processor, model
+    return acquire_model(
+        SAM_REPO, device, dtype, processor_cls=SamProcessor, model_cls=SamModel
+    )
 
 
-def refine_with_sam(
-    mask: torch.Tensor,
+# Label SamProcessor gives padding points; the prompt encoder zeroes them
+_SAM_POINT_PAD_LABEL = -10
+
+# A ViT-Huge embedding is 4 MiB at float32
+SAM_EMBEDDING_CACHE_BYTES = 256 * 1024**2
+
+_sam_embeddings: weakref.WeakKeyDictionary[SamModel, TensorCache] = (
+    weakref.WeakKeyDictionary()
+)
+_sam_embeddings_lock = threading.Lock()
+
+
+def sam_embedding_cache(sam_model: SamModel) -> TensorCache:
+    """Return the image embedding cache of sam_model.
+
+    Each model has its own cache, dropped along with the model, so an
+    embedding computed on one device or dtype is never reused by another.
+    """
+    with _sam_embeddings_lock:
+        cache = _sam_embeddings.get(sam_model)
+        if cache is None:
+            cache = TensorCache(SAM_EMBEDDING_CACHE_BYTES)
+            _sam_embeddings[sam_model] = cache
+        return cache
+
+
+def sam_image_embedding(
     image: Image.Image,
     sam: tuple[SamProcessor, SamModel],
-) -> torch.Tensor:
-    """Run SAM inference to refine a coarse mask.
+) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Return SAM's image embedding with the original and resized input sizes.
 
-    Returns refined binary mask tensor at original image resolution.
+    The image encoder only runs on a cache miss; embeddings are cached per
+    model by image content hash.
     """
     sam_processor, sam_model = sam
+    cache = sam_embedding_cache(sam_model)
+    key = image_sha256(image)
+    cached = cache.get(key)
+    if cached is not None:
+        embeddings, original_sizes, reshaped_sizes = cached
+        return embeddings, original_sizes, reshaped_sizes
+
     device = next(sam_model.parameters()).device
+    inputs = sam_processor.image_processor(image, return_tensors="pt")  # type: ignore[operator]
+    with torch.inference_mode():
+        embeddings = sam_model.get_image_embeddings(inputs["pixel_values"].to(device))
+    original_sizes = inputs["original_sizes"]
+    reshaped_sizes = inputs["reshaped_input_sizes"]
+    cache.put(key, (embeddings, original_sizes, reshaped_sizes))
+    return embeddings, original_sizes, reshaped_sizes
 
-    input_points, input_labels = sample_points(mask)
-    logits = compute_logits_from_mask(mask)
 
-    sam_inputs = sam_processor(
-        image,
-        input_points=input_points.unsqueeze(0).float().numpy(),
-        input_labels=input_labels.unsqueeze(0).numpy(),
-        return_tensors="pt",
-    ).to(device)
+def refine_many_with_sam(
+    masks: list[torch.Tensor],
+    images: list[Image.Image],
+    sam: tuple[SamProcessor, SamModel],
+) -> list[torch.Tensor]:
+    """Refine coarse masks in one batched SAM prompt encoder and decoder pass.
+
+    masks[i] belongs to images[i]. Each distinct image object is embedded
+    once through sam_image_embedding. Point sets are padded to the same
+    length with SAM's padding label, as SamProcessor does for batches.
+    Returns refined binary mask tensors at each image's resolution.
+    """
+    if len(masks) != len(images):
+        raise ValueError(f"Got {len(masks)} masks for {len(images)} images")
+    if not masks:
+        return []
+    sam_processor, sam_model = sam
+    device = next(sam_model.parameters()).device
+
+    embedded: dict[int, tuple[torch.Tensor, torch.Tensor, torch.Tensor]] = {}
+    for image in images:
+        if id(image) not in embedded:
+            embedded[id(image)] = sam_image_embedding(image, sam)
+    embeddings, original_sizes, reshaped_sizes = (
+        torch.cat(parts) for parts in zip(*(embedded[id(img)] for img in images))
+    )
+
+    sampled = [sample_points(mask) for mask in masks]
+    num_points = max(len(points) for points, _ in sampled)
+    input_points = torch.zeros(len(masks), 1, num_points, 2)
+    input_labels = torch.full((len(masks), 1, num_points), _SAM_POINT_PAD_LABEL)
+    for i, (points, labels) in enumerate(sampled):
+        # Scale (x, y) points from the original image to SAM's resized input
+        scale = (reshaped_sizes[i] / original_sizes[i]).flip(0)
+        input_points[i, 0, : len(points)] = points * scale
+        input_labels[i, 0, : len(labels)] = labels
+    logits = torch.stack([compute_logits_from_mask(mask) for mask in masks])
 
     image_positional_embeddings = sam_model.get_image_wide_positional_embeddings()
 
     with torch.inference_mode():
-        embeddings = sam_model.get_image_embeddings(sam_inputs["pixel_values"])
         sparse_embeddings, dense_embeddings = sam_model.prompt_encoder(
-            input_points=sam_inputs["input_points"],
-            input_labels=sam_inputs["input_labels"],
-            input_masks=logits.unsqueeze(0).to(device),
+            input_points=input_points.to(device),
+            input_labels=input_labels.to(device),
+            input_masks=logits.to(device),
             input_boxes=None,
         )
-        segmentation_maps, _, _ = sam_model.mask_decoder(
+        # Older transformers also return attentions; the masks always come first
+        segmentation_maps = sam_model.mask_decoder(
             image_embeddings=embeddings,
             image_positional_embeddings=image_positional_embeddings,
             sparse_prompt_embeddings=sparse_embeddings,
             dense_prompt_embeddings=dense_embeddings,
             multimask_output=False,
-        )
+        )[0]
 
     post_processed = sam_processor.post_process_masks(
-        segmentation_maps.cpu(),
-        sam_inputs["original_sizes"].cpu(),
-        sam_inputs["reshaped_input_sizes"].cpu(),
+        segmentation_maps.cpu(), original_sizes, reshaped_sizes
     )
-    # post_process_masks returns logits; threshold at 0.0 for binary mask
-    return (post_processed[0].squeeze() > 0.0).to(torch.uint8)
+    # post_process_masks returns logits; threshold at 0.0 for binary masks
+    return [(m.squeeze() > 0.0).to(torch.uint8) for m in post_processed]
 
 
-def segment(
+def refine_with_sam(
+    mask: torch.Tensor,
     image: Image.Image,
-    prompt: str,
-    granite: tuple[AutoProcessor, AutoModelForVision2Seq],
     sam: tuple[SamProcessor, SamModel],
-) -> Image.Image | None:
-    """Run full segmentation pipeline.
+) -> torch.Tensor:
+    """Run SAM inference to refine a coarse mask.
 
-    Converts input to RGB. Returns mask as PIL Image (mode "L",
-    0=background, 255=foreground) or None if no <seg> tags found.
+    Only the prompt encoder and mask decoder run per call; the image
+    embedding comes from sam_image_embedding.
+    Returns refined binary mask tensor at original image resolution.
     """
-    image = image.convert("RGB")
-    granite_processor, granite_model = granite
-    device = next(granite_model.parameters()).device
+    return refine_many_with_sam([mask], [image], sam)[0]
+
 
-    conversation = [
+def _segmentation_conversation(image: Image.Image, prompt: str) -> list[dict]:
+    return [
         {
             "role": "user",
             "content": [
@@ -283,25 +470,319 @@ def segment(
         },
     ]
 
+
+class SegmentationStoppingCriteria(StoppingCriteria):
+    """Stop each sequence of a generate call once its <seg> mask is complete.
+
+    A mask is complete when </seg> is generated or its runs cover
+    patch_h * patch_w patches. Each row's text is decoded incrementally, one
+    line at a time, and fed to a RunLengthParser. new_tokens[i] records how
+    many tokens row i generated before it stopped, by this criteria or by an
+    end-of-sequence token, and stopped_early[i] whether this criteria
+    stopped it.
+    """
+
+    def __init__(
+        self,
+        tokenizer: PreTrainedTokenizerBase,
+        prompt_length: int,
+        eos_ids: set[int],
+        patch_h: int = 24,
+        patch_w: int = 24,
+    ) -> None:
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.eos_ids = eos_ids
+        self.patch_count = patch_h * patch_w
+        self.parsers: list[RunLengthParser] = []
+        self.new_tokens: list[int | None] = []
+        self.stopped_early: list[bool] = []
+        self._line_start: list[int] = []
+        self._emitted: list[int] = []
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs
+    ) -> torch.BoolTensor:
+        if not self.parsers:
+            rows = input_ids.shape[0]
+            self.parsers = [RunLengthParser() for _ in range(rows)]
+            self.new_tokens = [None] * rows
+            self.stopped_early = [False] * rows
+            self._line_start = [self.prompt_length] * rows
+            self._emitted = [0] * rows
+
+        generated = input_ids.shape[1] - self.prompt_length
+        done = []
+        for i, row in enumerate(input_ids):
+            if self.new_tokens[i] is None:
+                if int(row[-1]) in self.eos_ids:
+                    self.new_tokens[i] = generated
+                else:
+                    parser = self.parsers[i]
+                    parser.feed(self._decode_new_text(i, row))
+                    if parser.finished or parser.total >= self.patch_count:
+                        self.new_tokens[i] = generated
+                        self.stopped_early[i] = True
+            done.append(self.new_tokens[i] is not None)
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)  # type: ignore[return-value]
+
+    def _decode_new_text(self, i: int, row: torch.Tensor) -> str:
+        # Decode from the start of the current line, as TextStreamer does, so
+        # multi-token characters and word boundaries come out right
+        text = self.tokenizer.decode(
+            row[self._line_start[i] :], skip_special_tokens=True
+        )
+        if text.endswith("\ufffd"):
+            return ""
+        new_text = text[self._emitted[i] :]
+        if text.endswith("\n"):
+            self._line_start[i] = len(row)
+            self._emitted[i] = 0
+        else:
+            self._emitted[i] = len(text)
+        return new_text
+
+
+@dataclass
+class SegmentationResult:
+    """Outcome of one segmentation prompt.
+
+    tokens_saved is the generation budget left unused because generation
+    stopped at </seg> or a full mask; it is 0 when generation ended on its
+    own.
+    """
+
+    mask: Image.Image | None
+    text: str
+    new_tokens: int
+    tokens_saved: int = 0
+
+
+def _segmentation_inputs(
+    pairs: Iterable[tuple[Image.Image, str]],
+    granite: tuple[AutoProcessor, AutoModelForVision2Seq],
+) -> tuple[BatchFeature, SegmentationStoppingCriteria]:
+    """Tokenize left-padded conversations and build their stopping criteria."""
+    granite_processor, granite_model = granite
+    device = next(granite_model.parameters()).device
+    conversations = [_segmentation_conversation(img, p) for img, p in pairs]
+    # padding_side is passed per call; the processor is shared across sessions
     inputs = granite_processor.apply_chat_template(  # type: ignore[operator]
-        conversation,
+        conversations,
         add_generation_prompt=True,
         tokenize=True,
         return_dict=True,
         return_tensors="pt",
+        padding=True,
+        padding_side="left",
     ).to(device)
+    eos = granite_model.generation_config.eos_token_id
+    eos_ids = set() if eos is None else {eos} if isinstance(eos, int) else set(eos)
+    criteria = SegmentationStoppingCriteria(
+        granite_processor.tokenizer,  # type: ignore[attr-defined]
+        inputs["input_ids"].shape[1],
+        eos_ids,
+    )
+    return inputs, criteria
 
-    with torch.inference_mode():
-        output = granite_model.generate(**inputs, max_new_tokens=8192)
 
-    decoded = granite_processor.decode(output[0], skip_special_tokens=True)  # type: ignore[operator]
+def _segmentation_result(
+    text: str,
+    criteria: SegmentationStoppingCriteria,
+    row: int,
+    generated: int,
+) -> SegmentationResult:
+    """Build the result for one row once its generation has stopped."""
+    stopped_early = criteria.stopped_early[row]
+    if stopped_early and not criteria.parsers[row].finished:
+        # The runs already fill the grid; close the tag so the mask decodes
+        text += "</seg>"
+    new_tokens = criteria.new_tokens[row]
+    if new_tokens is None:
+        new_tokens = generated
+    saved = SEGMENTATION_MAX_NEW_TOKENS - new_tokens
+    return SegmentationResult(
+        mask=None,
+        text=text,
+        new_tokens=new_tokens,
+        tokens_saved=saved if stopped_early else 0,
+    )
+
 
-    flat_mask = extract_segmentation(decoded)
-    if flat_mask is None:
-        return None
+def _generate_segmentations(
+    images: list[Image.Image],
+    prompts: list[str],
+    granite: tuple[AutoProcessor, AutoModelForVision2Seq],
+    batch_size: int,
+) -> list[SegmentationResult]:
+    """Ask Granite Vision for a <seg> mask of each prompt in its image.
+
+    Conversations are left-padded into one generate call per batch_size
+    pairs, and each sequence stops as soon as its mask is complete.
+    Returns each pair's generated text and token counts, in input order,
+    with mask left as None.
+    """
+    granite_processor, granite_model = granite
+
+    results: list[SegmentationResult] = []
+    for batch in batched(zip(images, prompts, strict=True), batch_size):
+        inputs, criteria = _segmentation_inputs(batch, granite)
+        prompt_length = criteria.prompt_length
+
+        with torch.inference_mode():
+            output = granite_model.generate(
+                **inputs,
+                max_new_tokens=SEGMENTATION_MAX_NEW_TOKENS,
+                stopping_criteria=StoppingCriteriaList([criteria]),
+            )
+
+        texts = granite_processor.batch_decode(  # type: ignore[operator]
+            output[:, prompt_length:], skip_special_tokens=True
+        )
+        generated = output.shape[1] - prompt_length
+        results.extend(
+            _segmentation_result(text, criteria, i, generated)
+            for i, text in enumerate(texts)
+        )
+    return results
 
-    coarse_mask = prepare_mask(flat_mask, patch_h=24, patch_w=24, size=image.size)
-    refined_mask = refine_with_sam(coarse_mask, image, sam)
 
-    pil_mask = Image.fromarray((refined_mask * 255).numpy(), mode="L")
-    return pil_mask
+@dataclass
+class SegmentationUpdate:
+    """Progress of a streaming segmentation.
+
+    coarse is the (24, 24) label grid parsed so far, with patches not yet
+    reached set to 0 ("others"). result is set only on the final update.
+    """
+
+    coarse: torch.Tensor
+    result: SegmentationResult | None = None
+
+
+def stream_segmentation(
+    image: Image.Image,
+    prompt: str,
+    granite: tuple[AutoProcessor, AutoModelForVision2Seq],
+    sam: tuple[SamProcessor, SamModel],
+) -> Generator[SegmentationUpdate]:
+    """Segment prompt in image, yielding the coarse mask while it is generated.
+
+    Granite Vision generates through a GenerationStream, and the
+    run-length text is parsed as it arrives. An update is yielded after
+    every new run. As soon as the mask is complete, SAM refines it, without
+    waiting for generation to wind down, and a final update carries the
+    SegmentationResult. Closing the generator early stops generation.
+    Generation errors are re-raised in the consuming thread.
+    """
+    image = image.convert("RGB")
+    granite_processor, granite_model = granite
+    inputs, criteria = _segmentation_inputs([(image, prompt)], granite)
+    parser = RunLengthParser()
+    chunks: list[str] = []
+    with GenerationStream(
+        granite_model,
+        granite_processor.tokenizer,  # type: ignore[attr-defined]
+        inputs,
+        stopping_criteria=[criteria],
+        max_new_tokens=SEGMENTATION_MAX_NEW_TOKENS,
+    ) as stream:
+        for chunk in stream:
+            chunks.append(chunk)
+            runs = len(parser.run_counts)
+            parser.feed(chunk)
+            if len(parser.run_counts) > runs:
+                yield SegmentationUpdate(coarse=parser.grid())
+            if parser.finished or parser.total >= criteria.patch_count:
+                break
+
+        text = "".join(chunks)
+        if not parser.finished and parser.total >= criteria.patch_count:
+            text += "</seg>"
+        segmentation = decode_segmentation(text)
+        refined = None
+        if segmentation is not None:
+            grid, _ = segmentation
+            coarse_mask = prepare_mask(grid, patch_h=24, patch_w=24, size=image.size)
+            refined = refine_with_sam(coarse_mask, image, sam)
+
+        generated = stream.join().shape[1] - criteria.prompt_length
+    result = _segmentation_result("".join(chunks), criteria, 0, generated)
+    if refined is not None:
+        result.mask = Image.fromarray((refined * 255).numpy())
+    yield SegmentationUpdate(coarse=parser.grid(), result=result)
+
+
+def segment_batch(
+    images: list[Image.Image],
+    prompts: list[str],
+    granite: tuple[AutoProcessor, AutoModelForVision2Seq],
+    sam: tuple[SamProcessor, SamModel],
+    batch_size: int = 4,
+) -> list[SegmentationResult]:
+    """Segment prompts[i] in images[i], returning one result per pair.
+
+    Granite Vision generates batch_size masks per generate call, stopping
+    each as soon as its mask is complete. Every coarse mask is then refined
+    in a single batched SAM pass, with each distinct image encoded once.
+    Images are converted to RGB. Each result's mask is a PIL Image (mode
+    "L", 0=background, 255=foreground), or None if no <seg> tags were found.
+
+    Raises ValueError if images and prompts differ in length or batch_size
+    is less than 1.
+    """
+    if len(images) != len(prompts):
+        raise ValueError(f"Got {len(images)} images for {len(prompts)} prompts")
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+
+    rgb: dict[int, Image.Image] = {}
+    for image in images:
+        if id(image) not in rgb:
+            rgb[id(image)] = image.convert("RGB")
+    images = [rgb[id(image)] for image in images]
+
+    results = _generate_segmentations(images, prompts, granite, batch_size)
+
+    found: list[int] = []
+    coarse_masks: list[torch.Tensor] = []
+    for i, (image, result) in enumerate(zip(images, results, strict=True)):
+        segmentation = decode_segmentation(result.text)
+        if segmentation is None:
+            continue
+        grid, _ = segmentation
+        found.append(i)
+        coarse_masks.append(prepare_mask(grid, patch_h=24, patch_w=24, size=image.size))
+
+    refined = refine_many_with_sam(coarse_masks, [images[i] for i in found], sam)
+    for i, refined_mask in zip(found, refined, strict=True):
+        results[i].mask = Image.fromarray((refined_mask * 255).numpy())
+    return results
+
+
+def segment_many(
+    image: Image.Image,
+    prompts: list[str],
+    granite: tuple[AutoProcessor, AutoModelForVision2Seq],
+    sam: tuple[SamProcessor, SamModel],
+    batch_size: int = 4,
+) -> list[SegmentationResult]:
+    """Segment each prompt in one image, returning one result per prompt.
+
+    SAM's image encoder runs at most once for the image; see segment_batch
+    for batching and the masks returned.
+    """
+    return segment_batch([image] * len(prompts), prompts, granite, sam, batch_size)
+
+
+def segment(
+    image: Image.Image,
+    prompt: str,
+    granite: tuple[AutoProcessor, AutoModelForVision2Seq],
+    sam: tuple[SamProcessor, SamModel],
+) -> Image.Image | None:
+    """Run full segmentation pipeline.
+
+    Converts input to RGB. Returns mask as PIL Image (mode "L",
+    0=background, 255=foreground) or None if no <seg> tags found.
+    """
+    return segment_batch([image], [prompt], granite, sam)[0].mask
@@ -0,0 +1,103 @@
+"""Run model.generate on a background thread and stream its decoded text."""
+
+import threading
+from collections.abc import Iterator, Mapping
+from typing import Any
+
+import torch
+from transformers import (
+    PreTrainedTokenizerBase,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TextIteratorStreamer,
+)
+
+
+class StopEvent(StoppingCriteria):
+    """Stop every sequence once event is set."""
+
+    def __init__(self, event: threading.Event) -> None:
+        self.event = event
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs
+    ) -> torch.BoolTensor:
+        return torch.full(  # type: ignore[return-value]
+            (input_ids.shape[0],), self.event.is_set(), device=input_ids.device
+        )
+
+
+class GenerationStream:
+    """Iterate the text of one model.generate call while it runs.
+
+    generate runs on a background thread into a TextIteratorStreamer, so
+    the consumer sees text as soon as it is decoded. Iterating yields text
+    chunks and re-raises a generation error once the text ends. join()
+    waits for generate and returns its output; close() (or leaving the
+    with block) stops generation early and waits for the thread.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        tokenizer: PreTrainedTokenizerBase,
+        inputs: Mapping[str, Any],
+        stopping_criteria: list[StoppingCriteria] | None = None,
+        **generate_kwargs: Any,
+    ) -> None:
+        self.streamer = TextIteratorStreamer(
+            tokenizer,  # type: ignore[arg-type]
+            skip_prompt=True,
+            skip_special_tokens=True,
+        )
+        self._cancel = threading.Event()
+        self._output: torch.Tensor | None = None
+        self._error: BaseException | None = None
+        criteria = StoppingCriteriaList(
+            [*(stopping_criteria or []), StopEvent(self._cancel)]
+        )
+
+        def generate() -> None:
+            try:
+                with torch.inference_mode():
+                    self._output = model.generate(
+                        **inputs,
+                        stopping_criteria=criteria,
+                        streamer=self.streamer,
+                        **generate_kwargs,
+                    )
+            except BaseException as exc:
+                self._error = exc
+                # Wake the consumer, which would otherwise wait for text forever
+                self.streamer.end()
+
+        self._thread = threading.Thread(
+            target=generate, name="generation-stream", daemon=True
+        )
+        self._thread.start()
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.streamer
+        self._raise_error()
+
+    def join(self) -> torch.Tensor:
+        """Wait for generate to finish and return its output ids."""
+        self._thread.join()
+        self._raise_error()
+        assert self._output is not None
+        return self._output
+
+    def close(self) -> None:
+        """Stop generation and wait for the background thread."""
+        self._cancel.set()
+        self._thread.join()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self) -> "GenerationStream":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -1,14 +1,61 @@
-import json
+import hashlib
+import io
 import tempfile
-import time
 from pathlib import Path
 
 import streamlit as st
+from docling.document_converter import DocumentConverter
 from docling.exceptions import ConversionError
 
-from pipeline import build_output, convert, create_converter, get_description
+from pipeline import (
+    CONVERTER_PROFILES,
+    DEFAULT_PROFILE,
+    CachedConversion,
+    DiskCache,
+    DocumentView,
+    Job,
+    convert_cached,
+    converter_profile,
+    create_converter,
+    create_description_cache,
+    create_result_cache,
+    default_profile,
+    get_job,
+    submit_job,
+    write_output,
+)
+
+# docling loads its own models, so conversions have a lane of their own
+CONVERTER_LANE = "docling-converter"
+
+description_cache = st.cache_resource(create_description_cache)
+result_cache = st.cache_resource(create_result_cache)
+
+
+@st.cache_resource
+def converter(profile: str) -> DocumentConverter:
+    return create_converter(description_cache=description_cache(), profile=profile)
+
+
+def convert_job(
+    job: Job, data: bytes, converter: DocumentConverter, cache: DiskCache
+) -> tuple[CachedConversion, DocumentView]:
+    """Convert an uploaded PDF through the result cache and build its elements.
+
+    The view is the job's result, so every rerun and the JSON download read
+    the same captions, tables and image crops.
+    """
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+        tmp_file.write(data)
+        tmp_path = tmp_file.name
+    try:
+        result = convert_cached(tmp_path, cache, converter=converter)
+    finally:
+        Path(tmp_path).unlink(missing_ok=True)
+    view = DocumentView(result.document, images=True)
+    view.elements()
+    return result, view
 
-converter = st.cache_resource(create_converter)
 
 st.set_page_config(page_title="Granite Vision Pipeline")
 st.title("Granite Vision Pipeline")
@@ -17,71 +64,119 @@ st.write(
 )
 
 uploaded_file = st.file_uploader("Upload file", type=["pdf"])
+profiles = list(CONVERTER_PROFILES)
+try:
+    converter_profile()
+    initial_profile = default_profile()
+except ValueError as e:
+    st.error(f"PIPELINE_CONVERTER_PROFILE: {e}; using {DEFAULT_PROFILE}.")
+    initial_profile = DEFAULT_PROFILE
+profile = st.selectbox(
+    "Profile",
+    profiles,
+    index=profiles.index(initial_profile),
+    help="fast: greedy, short descriptions and low-resolution images without "
+    "table images; balanced: the default; quality: greedy, longer descriptions "
+    "and high-resolution images.",
+)
 
 if st.button("Annotate", type="primary", disabled=not uploaded_file):
     assert uploaded_file is not None
-    tmp_path: str | None = None
-    try:
-        with st.spinner(
-            "Extracting content... This may take a few minutes for large documents."
-        ):
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                tmp_file.write(uploaded_file.read())
-                tmp_path = tmp_file.name
+    data = uploaded_file.getvalue()
+    job = submit_job(
+        convert_job,
+        data,
+        converter(profile),
+        result_cache(),
+        lane=CONVERTER_LANE,
+        key=f"convert:{profile}:{hashlib.sha256(data).hexdigest()}",
+    )
+    st.session_state["convert_job"] = (job.id, uploaded_file.name)
 
-            start = time.perf_counter_ns()
-            doc = convert(tmp_path, converter=converter())
-            duration_s = (time.perf_counter_ns() - start) / 1e9
+# The job outlives reruns, so its results are shown until another is submitted
+submitted = st.session_state.get("convert_job")
+job = get_job(submitted[0]) if submitted is not None else None
+if submitted is not None and job is None:
+    # Finished results are dropped after PIPELINE_JOB_RESULT_TTL_S; say so
+    st.info("This result has expired. Submit it again to see it.")
+    del st.session_state["convert_job"]
+if submitted is not None and job is not None:
+    _, file_name = submitted
+    # Poll rather than block, so the page can still rerun while a job runs
+    status = st.empty()
+    while not job.wait(0.25):
+        status.caption(
+            "Waiting for the converter..."
+            if job.status == "queued"
+            else "Extracting content... This may take a few minutes for large "
+            "documents."
+        )
+    status.empty()
 
-        st.success("Done.")
+    if isinstance(job.error, ConversionError):
+        st.error(str(job.error))
+    elif job.error is not None:
+        raise job.error
+    elif job.status == "done":
+        result, view = job.result
+        doc = result.document
+        # On a cache hit this is the original conversion time
+        duration_s = result.duration_s
+
+        if result.cache_hit:
+            st.success("Done (loaded from cache).")
+        else:
+            st.success("Done.")
 
         col1, col2, col3 = st.columns(3)
         col1.metric("Pictures", len(doc.pictures))
         col2.metric("Tables", len(doc.tables))
         col3.metric("Duration (s)", f"{duration_s:.2f}")
 
+        stats = description_cache().stats()
+        st.caption(
+            f"Picture description cache: {stats['hits']} hits, "
+            f"{stats['misses']} misses since startup."
+        )
+
+        def output_json() -> str:
+            buf = io.StringIO()
+            write_output(doc, duration_s, buf, view=view)
+            return buf.getvalue()
+
+        # Built only when clicked, and written element by element
         st.download_button(
             label="Download JSON",
-            data=json.dumps(build_output(doc, duration_s), indent=2),
-            file_name=f"{uploaded_file.name}_annotations.json",
+            data=output_json,
+            file_name=f"{file_name}_annotations.json",
             mime="application/json",
         )
 
-        for idx, pic in enumerate(doc.pictures, 1):
+        for idx, pic in enumerate(view.pictures, 1):
             with st.expander(f"Picture {idx}", expanded=idx == 1):
                 col_img, col_desc = st.columns(2)
-                image = pic.get_image(doc)
-                if image:
-                    col_img.image(image)
-                caption = pic.caption_text(doc=doc)
-                if caption:
-                    col_img.caption(caption)
-                desc = get_description(pic)
-                if desc:
-                    col_desc.markdown(desc["text"])
+                if pic.image:
+                    col_img.image(pic.image)
+                if pic.caption:
+                    col_img.caption(pic.caption)
+                if pic.description:
+                    col_desc.markdown(pic.description["text"])
                 else:
                     col_desc.write("No description available.")
 
-        for idx, table in enumerate(doc.tables, 1):
+        for idx, table in enumerate(view.tables, 1):
             with st.expander(
                 f"Table {idx}",
                 expanded=len(doc.pictures) == 0 and idx == 1,
             ):
                 col_img, col_data = st.columns(2)
-                image = table.get_image(doc)
-                if image:
-                    col_img.image(image)
-                caption = table.caption_text(doc=doc)
-                if caption:
-                    col_img.caption(caption)
-                df = table.export_to_dataframe(doc=doc)
+                if table.image:
+                    col_img.image(table.image)
+                if table.caption:
+                    col_img.caption(table.caption)
+                assert table.table is not None
+                df = table.table.dataframe
                 if not df.empty:
                     col_data.dataframe(df)
                 else:
                     col_data.write("Empty table.")
-
-    except ConversionError as e:
-        st.error(str(e))
-    finally:
-        if tmp_path is not None:
-            Path(tmp_path).unlink(missing_ok=True)
@@ -0,0 +1,15 @@
+"""Shared pytest fixtures."""
+
+from collections.abc import Iterator
+
+import pytest
+
+from pipeline.models import registry
+
+
+@pytest.fixture(autouse=True)
+def _clear_model_registry() -> Iterator[None]:
+    """Keep models loaded by one test from leaking into the next."""
+    registry.clear()
+    yield
+    registry.clear()
@@ -0,0 +1,72 @@
+"""Tests for the benchmark runner and stand-in models."""
+
+import json
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from benchmarks.runner import (
+    Benchmark,
+    compare,
+    peak_memory_growth,
+    time_benchmark,
+    write_results,
+)
+from benchmarks.standins import DECODE_TOKENS, tiny_doctags_model
+from pipeline.doctags import DOCTAGS_MESSAGES, generate_doctags
+
+# --- runner tests ---
+
+
+def test_time_benchmark_excludes_setup_and_meets_min_rounds() -> None:
+    calls: list[str] = []
+
+    def setup():
+        calls.append("setup")
+        return lambda: calls.append("run")
+
+    timing = time_benchmark(Benchmark("g.b", "g", setup, min_rounds=3), 0.0)
+
+    assert calls.count("setup") == 1
+    # One warm-up call plus the timed rounds
+    assert calls.count("run") == timing.rounds + 1
+    assert timing.rounds == 3
+    assert timing.min_s <= timing.median_s
+
+
+def test_write_results_round_trips_through_compare(tmp_path: Path) -> None:
+    timing = time_benchmark(Benchmark("g.b", "g", lambda: lambda: None, 2), 0.0)
+    path = tmp_path / "run.json"
+    write_results(path, {"g.b": timing})
+
+    results = json.loads(path.read_text())
+    assert "torch" in results["environment"]
+    baseline = {"g.b": {"median_s": 1.0}, "g.gone": {"median_s": 1.0}}
+    assert compare(baseline, {"g.b": {"median_s": 1.5}}) == {"g.b": 1.5}
+
+
+def test_peak_memory_growth_sees_held_allocation() -> None:
+    def allocate() -> None:
+        # Filled, so the pages are actually resident
+        block = b"x" * (50 * 1024 * 1024)
+        time.sleep(0.05)
+        del block
+
+    growth = peak_memory_growth(allocate)
+    assert 45 * 1024 * 1024 <= growth < 200 * 1024 * 1024
+
+
+# --- stand-in tests ---
+
+
+def test_tiny_doctags_model_decodes_fixed_token_count() -> None:
+    processor, model = tiny_doctags_model()
+    image = Image.new("RGB", (300, 400), "white")
+    prompt = processor.apply_chat_template(DOCTAGS_MESSAGES, add_generation_prompt=True)
+    inputs = processor(text=prompt, images=[image], return_tensors="pt")
+
+    output = model.generate(**inputs, max_new_tokens=8192)
+
+    assert output.shape[1] - inputs["input_ids"].shape[1] == DECODE_TOKENS
+    assert isinstance(generate_doctags(image, processor, model), str)
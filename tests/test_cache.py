@@ -0,0 +1,254 @@
+"""Tests for the cache module."""
+
+import hashlib
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+import torch
+from PIL import Image
+
+from pipeline.cache import (
+    DiskCache,
+    MemoryBlobCache,
+    MemoryDescriptionCache,
+    SqliteDescriptionCache,
+    TensorCache,
+    default_cache_dir,
+    file_sha256,
+    image_sha256,
+)
+
+
+def test_file_sha256_matches_hashlib(tmp_path: Path) -> None:
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"hello world" * 1000)
+    expected = hashlib.sha256(b"hello world" * 1000).hexdigest()
+    assert file_sha256(str(path), chunk_size=7) == expected
+
+
+def test_image_sha256_depends_on_pixels_and_size() -> None:
+    red = Image.new("RGB", (4, 4), (255, 0, 0))
+    assert image_sha256(red) == image_sha256(Image.new("RGB", (4, 4), (255, 0, 0)))
+    assert image_sha256(red) != image_sha256(Image.new("RGB", (4, 4)))
+    assert image_sha256(red) != image_sha256(Image.new("RGB", (2, 8), (255, 0, 0)))
+
+
+def test_default_cache_dir_uses_env(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("PIPELINE_CACHE_DIR", str(tmp_path))
+    assert default_cache_dir("convert") == tmp_path / "convert"
+
+
+def test_get_returns_none_and_counts_miss(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path)
+    assert cache.get("missing") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_put_then_get_round_trips(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path, suffix=".json")
+    cache.put("key", b"payload")
+    assert "key" in cache
+    assert cache.path("key").name == "key.json"
+    assert cache.get("key") == b"payload"
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["entries"] == 1
+    assert stats["bytes"] == len(b"payload")
+
+
+def test_put_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path, max_bytes=10)
+    cache.put("old", b"aaaa")
+    cache.put("new", b"bbbb")
+    os.utime(cache.path("old"), (1, 1))
+    os.utime(cache.path("new"), (2, 2))
+
+    cache.put("third", b"cccc")
+
+    assert "old" not in cache
+    assert "new" in cache
+    assert "third" in cache
+    assert cache.total_bytes() <= 10
+
+
+def test_put_scans_directory_only_when_over_budget(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path, max_bytes=10)
+    cache.put("a", b"aa")
+    with patch.object(cache, "_stat_entries", wraps=cache._stat_entries) as scan:
+        cache.put("b", b"bb")
+        cache.put("a", b"aaaa")
+        # Written by another process, so only a scan counts it
+        (tmp_path / "other").write_bytes(b"oo")
+        cache.put("c", b"ccc")
+        assert scan.call_count == 0
+
+        for mtime, key in enumerate(["other", "a", "b", "c"]):
+            os.utime(cache.path(key), (mtime, mtime))
+        cache.put("d", b"dd")
+        assert scan.call_count == 1
+
+    assert sorted(cache) == ["b", "c", "d"]
+    assert cache.total_bytes() == 7
+
+
+def test_get_refreshes_recency(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path, max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    os.utime(cache.path("a"), (1, 1))
+    os.utime(cache.path("b"), (2, 2))
+
+    cache.get("a")
+    cache.put("c", b"cccc")
+
+    assert "a" in cache
+    assert "b" not in cache
+
+
+def test_clear_removes_entries_and_counters(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path)
+    cache.put("a", b"x")
+    cache.get("a")
+    cache.clear()
+    assert "a" not in cache
+    assert cache.stats() == {
+        "hits": 0,
+        "misses": 0,
+        "hit_rate": 0.0,
+        "entries": 0,
+        "bytes": 0,
+    }
+
+
+def test_disk_cache_keys_skip_temp_files(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path, suffix=".png")
+    cache.put("a-0-144", b"x")
+    cache.put("b-1-72", b"y")
+    (tmp_path / ".partial.tmp").write_bytes(b"z")
+    assert sorted(cache.keys()) == ["a-0-144", "b-1-72"]
+    assert sorted(cache) == ["a-0-144", "b-1-72"]
+
+
+# --- memory blob cache tests ---
+
+
+def test_memory_blob_cache_evicts_least_recently_used() -> None:
+    cache = MemoryBlobCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"
+    cache.put("c", b"1234")
+
+    assert cache.keys() == ["a", "c"]
+    assert list(cache) == ["a", "c"]
+    assert "b" not in cache
+    assert cache.total_bytes() == 8
+
+
+def test_memory_blob_cache_skips_oversized_blobs_and_counts() -> None:
+    cache = MemoryBlobCache(max_bytes=4)
+    cache.put("big", b"12345")
+    assert cache.get("big") is None
+    cache.put("a", b"12")
+    cache.put("a", b"123")
+    assert cache.get("a") == b"123"
+    assert cache.stats() == {
+        "hits": 1,
+        "misses": 1,
+        "hit_rate": 0.5,
+        "entries": 1,
+        "bytes": 3,
+    }
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+
+# --- description cache tests ---
+
+
+def test_memory_description_cache_evicts_least_recently_used() -> None:
+    cache = MemoryDescriptionCache(max_entries=2)
+    cache.put("a", "first")
+    cache.put("b", "second")
+    cache.get("a")
+    cache.put("c", "third")
+
+    assert cache.get("a") == "first"
+    assert cache.get("b") is None
+    assert cache.get("c") == "third"
+
+
+def test_memory_description_cache_rejects_invalid_size() -> None:
+    with pytest.raises(ValueError, match="max_entries"):
+        MemoryDescriptionCache(max_entries=0)
+
+
+def test_memory_description_cache_stats() -> None:
+    cache = MemoryDescriptionCache()
+    cache.put("a", "text")
+    cache.get("a")
+    cache.get("missing")
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 1}
+
+
+def test_sqlite_description_cache_persists_across_instances(tmp_path: Path) -> None:
+    path = tmp_path / "nested" / "descriptions.sqlite"
+    first = SqliteDescriptionCache(path)
+    first.put("a", "text")
+    first.put("a", "replaced")
+    first.close()
+
+    second = SqliteDescriptionCache(path)
+    assert second.get("a") == "replaced"
+    assert second.get("missing") is None
+    assert second.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 1}
+    second.close()
+
+
+# --- tensor cache tests ---
+
+
+def _tensors(n_floats: int) -> tuple[torch.Tensor, ...]:
+    return (torch.zeros(n_floats), torch.zeros(0))
+
+
+def test_tensor_cache_evicts_least_recently_used_by_bytes() -> None:
+    cache = TensorCache(max_bytes=100)
+    cache.put("a", _tensors(10))
+    cache.put("b", _tensors(10))
+    cache.get("a")
+    cache.put("c", _tensors(10))
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+    assert cache.total_bytes() == 80
+
+
+def test_tensor_cache_replacing_key_keeps_byte_count() -> None:
+    cache = TensorCache(max_bytes=100)
+    cache.put("a", _tensors(10))
+    cache.put("a", _tensors(5))
+    assert cache.total_bytes() == 20
+
+
+def test_tensor_cache_skips_values_over_budget() -> None:
+    cache = TensorCache(max_bytes=10)
+    cache.put("a", _tensors(10))
+    assert cache.get("a") is None
+    assert cache.stats() == {
+        "hits": 0,
+        "misses": 1,
+        "hit_rate": 0.0,
+        "entries": 0,
+        "bytes": 0,
+    }
+
+
+def test_tensor_cache_rejects_invalid_size() -> None:
+    with pytest.raises(ValueError, match="max_bytes"):
+        TensorCache(max_bytes=0)
@@ -0,0 +1,181 @@
+"""Tests for the batch extraction CLI."""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from docling_core.types.doc.document import DoclingDocument
+
+from pipeline import open_parquet_dataset
+from pipeline.cli import find_pdfs, main, output_path, run_extract
+
+
+def _touch(path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"%PDF-1.4")
+    return path
+
+
+def _thread_pool(max_workers, mp_context, initializer, initargs) -> ThreadPoolExecutor:
+    """Stand in for the process pool, so patched functions reach the workers."""
+    return ThreadPoolExecutor(max_workers, initializer=initializer, initargs=initargs)
+
+
+# --- find_pdfs / output_path tests ---
+
+
+def test_find_pdfs_searches_directory_recursively(tmp_path: Path) -> None:
+    a = _touch(tmp_path / "a.pdf")
+    b = _touch(tmp_path / "sub" / "b.pdf")
+    (tmp_path / "notes.txt").write_text("skip")
+
+    pdfs, root = find_pdfs(str(tmp_path))
+
+    assert pdfs == [a, b]
+    assert root == tmp_path
+
+
+def test_find_pdfs_matches_suffix_in_any_case(tmp_path: Path) -> None:
+    upper = _touch(tmp_path / "REPORT.PDF")
+    lower = _touch(tmp_path / "sub" / "a.pdf")
+    (tmp_path / "dir.pdf").mkdir()
+
+    pdfs, _ = find_pdfs(str(tmp_path))
+
+    assert pdfs == [upper, lower]
+
+
+def test_find_pdfs_accepts_glob(tmp_path: Path) -> None:
+    a = _touch(tmp_path / "x" / "a.pdf")
+    b = _touch(tmp_path / "y" / "b.pdf")
+
+    pdfs, root = find_pdfs(str(tmp_path / "*" / "*.pdf"))
+
+    assert pdfs == [a, b]
+    assert root == tmp_path
+
+
+def test_output_path_mirrors_input_tree(tmp_path: Path) -> None:
+    out = output_path(tmp_path / "in" / "sub" / "doc.pdf", tmp_path / "in", tmp_path)
+    assert out == tmp_path / "sub" / "doc.json"
+
+
+# --- extract command tests ---
+
+
+@patch("pipeline.cli.create_converter")
+@patch("pipeline.cli.convert")
+def test_extract_writes_json_and_skips_existing(
+    mock_convert: MagicMock,
+    mock_create: MagicMock,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    _touch(tmp_path / "in" / "new.pdf")
+    _touch(tmp_path / "in" / "done.pdf")
+    out = tmp_path / "out"
+    out.mkdir()
+    (out / "done.json").write_text("{}")
+    mock_convert.return_value = DoclingDocument(name="doc")
+
+    code = main(["extract", str(tmp_path / "in"), "--out", str(out)])
+
+    assert code == 0
+    mock_create.assert_called_once()
+    mock_convert.assert_called_once()
+    assert mock_convert.call_args[0][0] == str(tmp_path / "in" / "new.pdf")
+    written = json.loads((out / "new.json").read_text())
+    assert written["document_info"]["num_pictures"] == 0
+    assert (out / "done.json").read_text() == "{}"
+    assert "pages/s" in capsys.readouterr().out
+
+
+@patch("pipeline.cli.create_converter")
+@patch("pipeline.cli.convert")
+def test_extract_writes_ndjson(
+    mock_convert: MagicMock, mock_create: MagicMock, tmp_path: Path
+) -> None:
+    _touch(tmp_path / "in" / "doc.pdf")
+    mock_convert.return_value = DoclingDocument(name="doc")
+
+    code = main(
+        ["extract", str(tmp_path / "in"), "--out", str(tmp_path), "--format", "ndjson"]
+    )
+
+    assert code == 0
+    lines = (tmp_path / "doc.ndjson").read_text().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["document_info"]["num_tables"] == 0
+
+
+@patch("pipeline.cli.create_converter")
+@patch("pipeline.cli.convert")
+def test_extract_appends_to_parquet_dataset(
+    mock_convert: MagicMock, mock_create: MagicMock, tmp_path: Path
+) -> None:
+    _touch(tmp_path / "in" / "a.pdf")
+    _touch(tmp_path / "in" / "sub" / "b.pdf")
+    out = tmp_path / "out"
+    mock_convert.return_value = DoclingDocument(name="doc")
+    argv = ["extract", str(tmp_path / "in"), "--out", str(out), "--format", "parquet"]
+
+    assert main(argv) == 0
+    assert (out / "table_cells" / "sub" / "b.parquet").exists()
+    documents = open_parquet_dataset(out, "documents").to_table(columns=["document"])
+    assert sorted(documents.column("document").to_pylist()) == ["a", "sub/b"]
+
+    mock_convert.reset_mock()
+    assert main(argv) == 0
+    mock_convert.assert_not_called()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@patch("pipeline.cli.ProcessPoolExecutor", _thread_pool)
+@patch("pipeline.cli.create_converter")
+@patch("pipeline.cli.convert")
+def test_extract_continues_after_any_conversion_error(
+    mock_convert: MagicMock,
+    mock_create: MagicMock,
+    workers: int,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    _touch(tmp_path / "in" / "bad.pdf")
+    _touch(tmp_path / "in" / "good.pdf")
+
+    def convert(source: str, converter: object) -> DoclingDocument:
+        if source.endswith("bad.pdf"):
+            raise RuntimeError("Pipeline StandardPdfPipeline failed")
+        return DoclingDocument(name="doc")
+
+    mock_convert.side_effect = convert
+    out = tmp_path / "out"
+
+    code = main(
+        ["extract", str(tmp_path / "in"), "--out", str(out), "--workers", str(workers)]
+    )
+
+    assert code == 1
+    assert (out / "good.json").exists()
+    assert not (out / "bad.json").exists()
+    assert "FAILED" in capsys.readouterr().out
+
+
+@patch("pipeline.cli.ProcessPoolExecutor", _thread_pool)
+@patch("pipeline.cli.extract_one", side_effect=BrokenProcessPool("killed"))
+@patch("pipeline.cli.create_converter")
+def test_run_extract_reports_dead_workers_as_failed(
+    mock_create: MagicMock, mock_extract: MagicMock
+) -> None:
+    results = list(run_extract([("a.pdf", "a.json"), ("b.pdf", "b.json")], 2))
+
+    assert sorted(result.source for result in results) == ["a.pdf", "b.pdf"]
+    assert all("killed" in (result.error or "") for result in results)
+
+
+def test_extract_reports_missing_input(tmp_path: Path) -> None:
+    code = main(["extract", str(tmp_path / "*.pdf"), "--out", str(tmp_path)])
+    assert code == 1
@@ -1,12 +1,36 @@
 """Tests for the pipeline config module."""
 
 import warnings
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import pytest
 from docling.datamodel.base_models import InputFormat
+from docling.datamodel.pipeline_options import (
+    PdfPipelineOptions,
+    PictureDescriptionVlmOptions,
+)
 from docling.document_converter import DocumentConverter
+from docling.pipeline.standard_pdf_pipeline import StandardPdfPipeline
+from docling_core.types.doc.document import DoclingDocument
 
-from pipeline.config import convert, create_converter
+from pipeline.cache import DiskCache, MemoryDescriptionCache
+from pipeline.config import (
+    CONVERTER_PROFILES,
+    ConverterProfile,
+    cache_key,
+    convert,
+    convert_cached,
+    create_converter,
+)
+
+TEST_PDF = str(Path(__file__).parent / "data" / "pdf" / "test_pictures.pdf")
+
+
+def _pdf_options(converter: DocumentConverter) -> PdfPipelineOptions:
+    options = converter.format_to_options[InputFormat.PDF].pipeline_options
+    assert isinstance(options, PdfPipelineOptions)
+    return options
 
 
 def test_create_converter_returns_document_converter() -> None:
@@ -16,13 +40,13 @@ def test_create_converter_returns_document_converter() -> None:
 
 def test_create_converter_enables_picture_description() -> None:
     converter = create_converter()
-    opts = converter.format_to_options[InputFormat.PDF].pipeline_options
+    opts = _pdf_options(converter)
     assert opts.do_picture_description is True
 
 
 def test_create_converter_enables_image_generation() -> None:
     converter = create_converter()
-    opts = converter.format_to_options[InputFormat.PDF].pipeline_options
+    opts = _pdf_options(converter)
     assert opts.generate_picture_images is True
     # generate_table_images is deprecated upstream; suppress warning when accessing it
     with warnings.catch_warnings():
@@ -51,3 +75,134 @@ def test_convert_uses_provided_converter() -> None:
 
     mock_converter.convert.assert_called_once_with(source="test.pdf")
     assert result is mock_doc
+
+
+def test_create_converter_with_description_cache_wraps_pipeline() -> None:
+    converter = create_converter(description_cache=MemoryDescriptionCache())
+    pipeline_cls = converter.format_to_options[InputFormat.PDF].pipeline_cls
+    assert pipeline_cls is not StandardPdfPipeline
+    assert issubclass(pipeline_cls, StandardPdfPipeline)
+
+
+# --- converter profile tests ---
+
+
+def _description_options(converter: DocumentConverter) -> PictureDescriptionVlmOptions:
+    description = _pdf_options(converter).picture_description_options
+    assert isinstance(description, PictureDescriptionVlmOptions)
+    return description
+
+
+def test_default_profile_is_balanced(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("PIPELINE_CONVERTER_PROFILE", raising=False)
+    converter = create_converter()
+    assert _description_options(converter).generation_config == {
+        "max_new_tokens": 100,
+        "do_sample": True,
+        "temperature": 0.2,
+    }
+    assert _pdf_options(converter).images_scale == 2.0
+
+
+def test_fast_profile_is_greedy_without_table_images() -> None:
+    converter = create_converter(profile="fast")
+    opts = _pdf_options(converter)
+    assert _description_options(converter).generation_config == {
+        "max_new_tokens": 60,
+        "do_sample": False,
+    }
+    assert opts.images_scale == 1.0
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=DeprecationWarning)
+        assert opts.generate_table_images is False
+
+
+def test_profile_from_environment_and_custom_profiles(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("PIPELINE_CONVERTER_PROFILE", "quality")
+    assert _pdf_options(create_converter()).images_scale == 3.0
+    custom = ConverterProfile(max_new_tokens=20, images_scale=1.5)
+    converter = create_converter(profile=custom)
+    assert _description_options(converter).generation_config["max_new_tokens"] == 20
+    assert _pdf_options(converter).images_scale == 1.5
+
+
+def test_unknown_profile_raises() -> None:
+    with pytest.raises(ValueError, match="fast, balanced, quality"):
+        create_converter(profile="turbo")
+
+
+def test_cache_key_differs_between_profiles() -> None:
+    keys = {
+        cache_key(TEST_PDF, create_converter(profile=p)) for p in CONVERTER_PROFILES
+    }
+    assert len(keys) == len(CONVERTER_PROFILES)
+
+
+# --- result cache tests ---
+
+
+def test_cache_key_changes_with_pipeline_options() -> None:
+    converter = create_converter()
+    before = cache_key(TEST_PDF, converter)
+    opts = _pdf_options(converter)
+    description = opts.picture_description_options
+    assert isinstance(description, PictureDescriptionVlmOptions)
+    description.prompt = "Different prompt."
+    assert cache_key(TEST_PDF, converter) != before
+
+
+def test_cache_key_changes_with_table_options() -> None:
+    converter = create_converter()
+    before = cache_key(TEST_PDF, converter)
+    opts = _pdf_options(converter)
+    opts.table_structure_options.do_cell_matching = False
+    assert cache_key(TEST_PDF, converter) != before
+
+
+def test_cache_key_ignores_runtime_options() -> None:
+    converter = create_converter()
+    before = cache_key(TEST_PDF, converter)
+    opts = _pdf_options(converter)
+    opts.picture_description_options.batch_size = 1
+    opts.accelerator_options.num_threads = 1
+    assert cache_key(TEST_PDF, converter) == before
+
+
+def test_cache_key_stable_for_same_file_and_options() -> None:
+    assert cache_key(TEST_PDF, create_converter()) == cache_key(
+        TEST_PDF, create_converter()
+    )
+
+
+def test_convert_with_cache_skips_conversion_on_hit(tmp_path: Path) -> None:
+    converter = create_converter()
+    cache = DiskCache(tmp_path)
+    doc = DoclingDocument(name="cached")
+
+    with patch.object(converter, "convert") as mock_convert:
+        mock_convert.return_value.document = doc
+        first = convert(TEST_PDF, converter=converter, cache=cache)
+        second = convert(TEST_PDF, converter=converter, cache=cache)
+
+    mock_convert.assert_called_once_with(source=TEST_PDF)
+    assert first is doc
+    assert second == doc
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_convert_cached_reports_hit_and_original_duration(tmp_path: Path) -> None:
+    converter = create_converter()
+    cache = DiskCache(tmp_path)
+
+    with patch.object(converter, "convert") as mock_convert:
+        mock_convert.return_value.document = DoclingDocument(name="cached")
+        miss = convert_cached(TEST_PDF, cache, converter=converter)
+        hit = convert_cached(TEST_PDF, cache, converter=converter)
+
+    assert miss.cache_hit is False
+    assert hit.cache_hit is True
+    assert hit.duration_s == miss.duration_s
+    assert hit.document == miss.document
@@ -0,0 +1,99 @@
+"""Tests for the picture description cache wrapper."""
+
+from unittest.mock import MagicMock
+
+import pytest
+from docling.datamodel.pipeline_options import PictureDescriptionVlmOptions
+from docling.models.base_model import ItemAndImageEnrichmentElement
+from docling_core.types.doc.document import DoclingDocument, PictureItem
+from PIL import Image
+
+from pipeline.cache import MemoryDescriptionCache
+from pipeline.descriptions import CachedPictureDescriptionModel, description_key
+from pipeline.output import get_description
+
+
+def _options(prompt: str = "Describe.") -> PictureDescriptionVlmOptions:
+    return PictureDescriptionVlmOptions(repo_id="repo", prompt=prompt)
+
+
+def _inner(options: PictureDescriptionVlmOptions) -> MagicMock:
+    """Mock docling model that describes each image by its width."""
+    model = MagicMock()
+    model.enabled = True
+    model.options = options
+    model.provenance = "repo"
+    model.images_scale = 2.0
+    model.expansion_factor = 0.0
+    model.elements_batch_size = 8
+    model._annotate_images.side_effect = lambda images: [
+        f"width {image.width}" for image in images
+    ]
+    return model
+
+
+# --- description_key tests ---
+
+
+def test_description_key_matches_identical_images() -> None:
+    options = _options()
+    first = Image.new("RGB", (10, 10), (255, 0, 0))
+    second = Image.new("RGB", (10, 10), (255, 0, 0))
+    assert description_key(first, options) == description_key(second, options)
+
+
+def test_description_key_changes_with_pixels_and_prompt() -> None:
+    options = _options()
+    image = Image.new("RGB", (10, 10), (255, 0, 0))
+    key = description_key(image, options)
+    assert description_key(Image.new("RGB", (10, 10)), options) != key
+    assert description_key(image, _options(prompt="Other.")) != key
+
+
+def test_description_key_ignores_batch_size() -> None:
+    image = Image.new("RGB", (10, 10))
+    options = _options()
+    key = description_key(image, options)
+    options.batch_size = 1
+    assert description_key(image, options) == key
+
+
+# --- CachedPictureDescriptionModel tests ---
+
+
+def test_cached_model_only_describes_misses() -> None:
+    options = _options()
+    inner = _inner(options)
+    cache = MemoryDescriptionCache()
+    model = CachedPictureDescriptionModel(inner, cache)
+    logo = Image.new("RGB", (10, 10))
+    chart = Image.new("RGB", (20, 10))
+
+    assert list(model._annotate_images([logo])) == ["width 10"]
+    assert list(model._annotate_images([logo, chart, logo])) == [
+        "width 10",
+        "width 20",
+        "width 10",
+    ]
+
+    described = [call.args[0] for call in inner._annotate_images.call_args_list]
+    assert [len(images) for images in described] == [1, 1]
+    assert described[1][0] is chart
+    assert cache.stats()["hits"] == 2
+
+
+@pytest.mark.filterwarnings("ignore:Field `annotations` is deprecated")
+def test_cached_model_descriptions_readable_by_get_description() -> None:
+    options = _options()
+    cache = MemoryDescriptionCache()
+    image = Image.new("RGB", (10, 10))
+    cache.put(description_key(image, options), "cached text")
+    inner = _inner(options)
+    model = CachedPictureDescriptionModel(inner, cache)
+    pic = PictureItem(self_ref="#/pictures/0")
+
+    element = ItemAndImageEnrichmentElement(item=pic, image=image)
+    list(model(doc=DoclingDocument(name="test"), element_batch=[element]))
+
+    inner._annotate_images.assert_not_called()
+    assert get_description(pic) == {"created_by": "repo", "text": "cached text"}
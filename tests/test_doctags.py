@@ -1,16 +1,27 @@
 """Tests for the doctags module."""
 
+import os
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import numpy as np
+import pytest
 import torch
 from docling_core.types.doc.document import DoclingDocument
 from PIL import Image
 
+from pipeline.cache import DiskCache, MemoryBlobCache
 from pipeline.doctags import (
+    PageRenderCache,
+    _render_parallel,
+    _render_pool,
+    count_pdf_pages,
     create_doctags_model,
     export_markdown,
     generate_doctags,
+    generate_doctags_batch,
+    iter_pdf_pages,
     parse_doctags,
     render_pdf_pages,
 )
@@ -50,6 +61,216 @@ def test_render_pdf_pages_with_page_indices() -> None:
     assert first_page[0].size == all_pages[0].size
 
 
+def test_render_pdf_pages_with_workers_matches_serial_in_page_order() -> None:
+    serial = render_pdf_pages(TEST_PDF, page_indices=[2, 0, 1])
+    parallel = render_pdf_pages(TEST_PDF, page_indices=[2, 0, 1], workers=2)
+    assert [p.tobytes() for p in parallel] == [p.tobytes() for p in serial]
+
+
+def test_render_pdf_pages_with_workers_only_renders_cache_misses() -> None:
+    cache = PageRenderCache(MemoryBlobCache(256 * 1024**2))
+    render_pdf_pages(TEST_PDF, page_indices=[1], cache=cache)
+
+    with patch(
+        "pipeline.doctags._render_parallel",
+        side_effect=lambda path, indices, dpi, workers, max_dim: render_pdf_pages(
+            path, dpi, indices, max_dim=max_dim
+        ),
+    ) as render:
+        pages = render_pdf_pages(TEST_PDF, cache=cache, workers=2)
+
+    assert render.call_args.args[1] == [0, 2]
+    assert [p.tobytes() for p in pages] == [
+        p.tobytes() for p in render_pdf_pages(TEST_PDF)
+    ]
+    assert len(cache.store.keys()) == 3
+
+
+def test_render_pdf_pages_with_workers_recovers_from_broken_pool() -> None:
+    pool = _render_pool(2)
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(os._exit, 1).result()
+
+    pages = render_pdf_pages(TEST_PDF, page_indices=[0, 1], workers=2)
+
+    assert len(pages) == 2
+    assert _render_pool(2) is not pool
+
+
+def test_render_parallel_retries_once_after_broken_pool() -> None:
+    pixel = [[(1, 1, b"\x00\x00\x00")]]
+    with patch(
+        "pipeline.doctags._render_ranges",
+        side_effect=[BrokenProcessPool("worker died"), pixel],
+    ):
+        assert len(_render_parallel(TEST_PDF, [0], 72, 2)) == 1
+
+    with patch(
+        "pipeline.doctags._render_ranges", side_effect=BrokenProcessPool("again")
+    ) as render:
+        with pytest.raises(BrokenProcessPool):
+            _render_parallel(TEST_PDF, [0], 72, 2)
+    assert render.call_count == 2
+
+
+def test_render_pdf_pages_max_dim_rasterizes_to_fit() -> None:
+    full = render_pdf_pages(TEST_PDF, page_indices=[0])[0]
+    fitted = render_pdf_pages(TEST_PDF, page_indices=[0], max_dim=768)[0]
+    assert max(fitted.size) == 768
+    assert fitted.width / fitted.height == pytest.approx(
+        full.width / full.height, abs=0.01
+    )
+
+
+def test_render_pdf_pages_max_dim_leaves_small_pages_at_dpi() -> None:
+    full = render_pdf_pages(TEST_PDF, page_indices=[0])
+    assert render_pdf_pages(TEST_PDF, page_indices=[0], max_dim=5000)[0].size == (
+        full[0].size
+    )
+
+
+def test_iter_pdf_pages_and_workers_honour_max_dim() -> None:
+    streamed = list(iter_pdf_pages(TEST_PDF, max_dim=300))
+    parallel = render_pdf_pages(TEST_PDF, workers=2, max_dim=300)
+    assert [p.tobytes() for p in parallel] == [p.tobytes() for p in streamed]
+    assert all(max(p.size) == 300 for p in streamed)
+
+
+# --- count_pdf_pages tests ---
+
+
+def test_count_pdf_pages_matches_render() -> None:
+    assert count_pdf_pages(TEST_PDF) == len(render_pdf_pages(TEST_PDF))
+
+
+# --- iter_pdf_pages tests ---
+
+
+def test_iter_pdf_pages_matches_render_pdf_pages() -> None:
+    rendered = render_pdf_pages(TEST_PDF)
+    streamed = list(iter_pdf_pages(TEST_PDF))
+    assert [p.size for p in streamed] == [p.size for p in rendered]
+    assert all(p.mode == "RGB" for p in streamed)
+
+
+def test_iter_pdf_pages_with_page_indices_preserves_order() -> None:
+    rendered = render_pdf_pages(TEST_PDF, page_indices=[2, 0])
+    streamed = list(iter_pdf_pages(TEST_PDF, page_indices=[2, 0], prefetch=1))
+    assert [p.tobytes() for p in streamed] == [p.tobytes() for p in rendered]
+
+
+def test_iter_pdf_pages_is_lazy_and_can_stop_early() -> None:
+    pages = iter_pdf_pages(TEST_PDF, prefetch=1)
+    first = next(pages)
+    pages.close()
+    assert isinstance(first, Image.Image)
+
+
+def test_iter_pdf_pages_reraises_render_errors() -> None:
+    with pytest.raises(FileNotFoundError):
+        list(iter_pdf_pages("does-not-exist.pdf"))
+
+
+def test_iter_pdf_pages_reraises_base_exceptions_from_renderer() -> None:
+    class Abort(BaseException):
+        pass
+
+    with patch("pipeline.doctags._render_page", side_effect=Abort):
+        with pytest.raises(Abort):
+            list(iter_pdf_pages(TEST_PDF))
+
+
+def test_iter_pdf_pages_rejects_invalid_prefetch() -> None:
+    with pytest.raises(ValueError, match="prefetch"):
+        next(iter_pdf_pages(TEST_PDF, prefetch=0))
+
+
+# --- PageRenderCache tests ---
+
+
+def _memory_render_cache() -> PageRenderCache:
+    return PageRenderCache(MemoryBlobCache(256 * 1024**2))
+
+
+def test_render_cache_returns_identical_pages_without_rasterizing() -> None:
+    cache = _memory_render_cache()
+    first = render_pdf_pages(TEST_PDF, cache=cache)
+
+    with patch("pipeline.doctags._render_page") as render:
+        again = render_pdf_pages(TEST_PDF, cache=cache)
+        streamed = list(iter_pdf_pages(TEST_PDF, page_indices=[1], cache=cache))
+
+    render.assert_not_called()
+    assert [p.tobytes() for p in again] == [p.tobytes() for p in first]
+    assert streamed[0].tobytes() == first[1].tobytes()
+    assert cache.store.stats()["hits"] == 4
+
+
+def test_render_cache_downsamples_higher_dpi_copy() -> None:
+    cache = _memory_render_cache()
+    render_pdf_pages(TEST_PDF, dpi=144, page_indices=[0], cache=cache)
+    render_pdf_pages(TEST_PDF, dpi=288, page_indices=[0], cache=cache)
+    fresh = render_pdf_pages(TEST_PDF, dpi=100, page_indices=[0])[0]
+
+    with (
+        patch("pipeline.doctags._render_page") as render,
+        patch.object(cache.store, "get", wraps=cache.store.get) as get,
+    ):
+        (page,) = render_pdf_pages(TEST_PDF, dpi=100, page_indices=[0], cache=cache)
+
+    render.assert_not_called()
+    # The nearest higher copy is decoded, not the largest
+    assert get.call_args.args[0].endswith("-0-144")
+    assert page.size == fresh.size
+    difference = np.asarray(page, dtype=np.float32) - np.asarray(fresh, np.float32)
+    assert np.abs(difference).mean() < 2
+
+
+def test_render_cache_renders_when_only_lower_dpi_is_cached() -> None:
+    cache = _memory_render_cache()
+    render_pdf_pages(TEST_PDF, dpi=72, page_indices=[0], cache=cache)
+    (page,) = render_pdf_pages(TEST_PDF, dpi=144, page_indices=[0], cache=cache)
+    assert page.tobytes() == render_pdf_pages(TEST_PDF, page_indices=[0])[0].tobytes()
+
+
+def test_render_cache_reads_pages_stored_by_earlier_processes(tmp_path: Path) -> None:
+    store = DiskCache(tmp_path, suffix=".png")
+    render_pdf_pages(TEST_PDF, dpi=144, page_indices=[2], cache=PageRenderCache(store))
+
+    reopened = PageRenderCache(DiskCache(tmp_path, suffix=".png"))
+    with patch("pipeline.doctags._render_page") as render:
+        (page,) = render_pdf_pages(TEST_PDF, dpi=72, page_indices=[2], cache=reopened)
+
+    render.assert_not_called()
+    assert page.size == render_pdf_pages(TEST_PDF, dpi=72, page_indices=[2])[0].size
+
+
+def test_render_cache_stores_max_dim_renders_under_fractional_dpi(
+    tmp_path: Path,
+) -> None:
+    cache = PageRenderCache(DiskCache(tmp_path, suffix=".png"))
+    first = render_pdf_pages(TEST_PDF, page_indices=[0], cache=cache, max_dim=768)
+    (key,) = cache.store.keys()
+    assert "." in key.rsplit("-", 1)[1]
+
+    reopened = PageRenderCache(DiskCache(tmp_path, suffix=".png"))
+    with patch("pipeline.doctags._render_page") as render:
+        again = render_pdf_pages(
+            TEST_PDF, page_indices=[0], cache=reopened, max_dim=768
+        )
+    render.assert_not_called()
+    assert again[0].tobytes() == first[0].tobytes()
+
+
+def test_render_cache_rerenders_evicted_pages() -> None:
+    store = MemoryBlobCache(256 * 1024**2)
+    cache = PageRenderCache(store)
+    render_pdf_pages(TEST_PDF, page_indices=[0], cache=cache)
+    store.clear()
+    (page,) = render_pdf_pages(TEST_PDF, page_indices=[0], cache=cache)
+    assert page.tobytes() == render_pdf_pages(TEST_PDF, page_indices=[0])[0].tobytes()
+
+
 # --- parse_doctags tests ---
 
 
@@ -91,8 +312,8 @@ def test_export_markdown_returns_string() -> None:
 # --- create_doctags_model tests ---
 
 
-@patch("pipeline.doctags.AutoModelForVision2Seq")
-@patch("pipeline.doctags.AutoProcessor")
+@patch("pipeline.models.AutoModelForVision2Seq")
+@patch("pipeline.models.AutoProcessor")
 def test_create_doctags_model_loads_correct_model(
     mock_processor_cls: MagicMock,
     mock_model_cls: MagicMock,
@@ -109,8 +330,8 @@ def test_create_doctags_model_loads_correct_model(
     assert model is mock_model_cls.from_pretrained.return_value.to.return_value
 
 
-@patch("pipeline.doctags.AutoModelForVision2Seq")
-@patch("pipeline.doctags.AutoProcessor")
+@patch("pipeline.models.AutoModelForVision2Seq")
+@patch("pipeline.models.AutoProcessor")
 def test_create_doctags_model_moves_to_device(
     mock_processor_cls: MagicMock,
     mock_model_cls: MagicMock,
@@ -166,3 +387,102 @@ def test_generate_doctags_returns_empty_on_empty_output() -> None:
 
     result = generate_doctags(Image.new("RGB", (10, 10)), mock_processor, mock_model)
     assert result == ""
+
+
+# --- generate_doctags_batch tests ---
+
+
+def _batch_mocks(new_tokens: list[list[int]]) -> tuple[MagicMock, MagicMock]:
+    """Mock processor/model whose generate appends new_tokens rows per batch.
+
+    Token 2 is EOS and token 0 is the generation pad id. The tokenizer's own
+    pad id is deliberately different.
+    """
+    mock_processor = MagicMock()
+    mock_processor.tokenizer.padding_side = "right"
+    mock_processor.tokenizer.pad_token_id = 5
+    mock_processor.apply_chat_template.return_value = "prompt"
+
+    def make_inputs(text: list[str] | str, **_: object) -> MagicMock:
+        rows = len(text) if isinstance(text, list) else 1
+        batch = MagicMock()
+        batch.to.return_value = {"input_ids": torch.ones((rows, 3))}
+        return batch
+
+    mock_processor.side_effect = make_inputs
+    mock_processor.batch_decode.side_effect = lambda rows, **_: [
+        " " + ",".join(str(t) for t in row.tolist()) for row in rows
+    ]
+
+    mock_model = MagicMock()
+    mock_model.generation_config.eos_token_id = 2
+    mock_model.generation_config.pad_token_id = 0
+    mock_param = MagicMock()
+    mock_param.device = torch.device("cpu")
+    mock_model.parameters.side_effect = lambda: iter([mock_param])
+
+    rows = iter(new_tokens)
+
+    def generate(input_ids: torch.Tensor, **_: object) -> torch.Tensor:
+        new = torch.tensor([next(rows) for _ in range(input_ids.shape[0])])
+        return torch.cat([input_ids.long(), new], dim=1)
+
+    mock_model.generate.side_effect = generate
+    return mock_processor, mock_model
+
+
+def test_generate_doctags_batch_trims_prompt_and_padding() -> None:
+    processor, model = _batch_mocks([[7, 8, 2], [9, 2, 0]])
+    images = [Image.new("RGB", (10, 10)) for _ in range(2)]
+
+    result = generate_doctags_batch(images, processor, model, batch_size=2)
+
+    assert result == ["7,8,2", "9,2"]
+    model.generate.assert_called_once()
+    assert processor.call_args[1]["padding"] is True
+    assert processor.call_args[1]["images"] == [[images[0]], [images[1]]]
+
+
+def test_generate_doctags_batch_keeps_real_tokens_equal_to_pad_id() -> None:
+    processor, model = _batch_mocks([[7, 0, 0], [9, 2, 0]])
+    images = [Image.new("RGB", (10, 10)) for _ in range(2)]
+
+    result = generate_doctags_batch(images, processor, model, batch_size=2)
+
+    assert result == ["7,0,0", "9,2"]
+
+
+def test_generate_doctags_batch_matches_single_page_output() -> None:
+    processor, model = _batch_mocks([[7, 8, 2], [7, 8, 2]])
+    image = Image.new("RGB", (10, 10))
+
+    single = generate_doctags(image, processor, model)
+    batch = generate_doctags_batch([image], processor, model)
+
+    assert batch == [single]
+
+
+def test_generate_doctags_batch_preserves_order_across_batches() -> None:
+    processor, model = _batch_mocks([[1], [2], [3], [4], [5]])
+    images = [Image.new("RGB", (10, 10)) for _ in range(5)]
+    progress: list[int] = []
+
+    result = generate_doctags_batch(
+        images, processor, model, batch_size=2, on_batch=progress.append
+    )
+
+    assert result == ["1", "2", "3", "4", "5"]
+    assert model.generate.call_count == 3
+    assert progress == [2, 4, 5]
+
+
+def test_generate_doctags_batch_left_pads_without_touching_tokenizer() -> None:
+    processor, model = _batch_mocks([[1]])
+    generate_doctags_batch([Image.new("RGB", (10, 10))], processor, model)
+    assert processor.call_args[1]["padding_side"] == "left"
+    assert processor.tokenizer.padding_side == "right"
+
+
+def test_generate_doctags_batch_rejects_invalid_batch_size() -> None:
+    with pytest.raises(ValueError, match="batch_size"):
+        generate_doctags_batch([], MagicMock(), MagicMock(), batch_size=0)
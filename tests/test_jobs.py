@@ -0,0 +1,198 @@
+"""Tests for the background job queue."""
+
+import threading
+import time
+from collections.abc import Iterator
+
+import pytest
+
+from pipeline.jobs import Job, JobQueue
+
+
+@pytest.fixture
+def jobs() -> Iterator[JobQueue]:
+    queue = JobQueue(workers=2)
+    yield queue
+    queue.shutdown()
+
+
+def _blocker(job: Job, started: threading.Event, release: threading.Event) -> str:
+    started.set()
+    release.wait(5)
+    return job.lane
+
+
+# --- submit / result tests ---
+
+
+def test_job_result_and_progress(jobs: JobQueue) -> None:
+    def work(job: Job, n: int) -> int:
+        job.update(progress=0.5, message="half", partial=[1])
+        return n * 2
+
+    job = jobs.submit(work, 21, lane="model")
+    assert job.wait(5)
+    assert job.status == "done"
+    assert job.result == 42
+    assert (job.progress, job.message, job.partial) == (1.0, "half", [1])
+    assert jobs.get(job.id) is job
+
+
+def test_failed_job_keeps_error(jobs: JobQueue) -> None:
+    def work(job: Job) -> None:
+        raise ValueError("bad page")
+
+    job = jobs.submit(work, lane="model")
+    assert job.wait(5)
+    assert job.status == "failed"
+    assert isinstance(job.error, ValueError)
+
+
+def test_submit_rejects_invalid_workers_and_closed_queue() -> None:
+    with pytest.raises(ValueError, match="workers"):
+        JobQueue(workers=0)
+    queue = JobQueue(workers=1)
+    queue.shutdown()
+    with pytest.raises(RuntimeError, match="shut down"):
+        queue.submit(lambda job: None, lane="model")
+
+
+# --- scheduling tests ---
+
+
+def test_lane_runs_one_job_at_a_time(jobs: JobQueue) -> None:
+    started, release = threading.Event(), threading.Event()
+    first = jobs.submit(_blocker, started, release, lane="granite")
+    assert started.wait(5)
+    second = jobs.submit(lambda job: "second", lane="granite")
+
+    assert not second.wait(0.2)
+    assert second.status == "queued"
+    assert jobs.ahead(second) == 1
+    release.set()
+    assert second.wait(5)
+    assert first.result == "granite"
+    assert first.finished_at is not None and second.started_at is not None
+    assert second.started_at >= first.finished_at
+
+
+def test_other_lanes_run_concurrently(jobs: JobQueue) -> None:
+    started, release = threading.Event(), threading.Event()
+    blocked = jobs.submit(_blocker, started, release, lane="granite")
+    assert started.wait(5)
+    other = jobs.submit(lambda job: "sam", lane="sam")
+    assert other.wait(5)
+    assert not blocked.finished
+    release.set()
+    assert blocked.wait(5)
+
+
+def test_workers_bound_concurrency_across_lanes() -> None:
+    queue = JobQueue(workers=1)
+    started, release = threading.Event(), threading.Event()
+    queue.submit(_blocker, started, release, lane="a")
+    assert started.wait(5)
+    other = queue.submit(lambda job: None, lane="b")
+    assert not other.wait(0.2)
+    release.set()
+    assert other.wait(5)
+    queue.shutdown()
+
+
+# --- deduplication / retention tests ---
+
+
+def test_same_key_returns_existing_job(jobs: JobQueue) -> None:
+    calls = []
+
+    def work(job: Job) -> int:
+        calls.append(job.id)
+        return len(calls)
+
+    first = jobs.submit(work, lane="model", key="doc:abc")
+    assert first.wait(5)
+    again = jobs.submit(work, lane="model", key="doc:abc")
+    assert again is first
+    assert calls == [first.id]
+
+
+def test_failed_job_key_is_retried(jobs: JobQueue) -> None:
+    def fail(job: Job) -> None:
+        raise RuntimeError("boom")
+
+    failed = jobs.submit(fail, lane="model", key="doc:abc")
+    assert failed.wait(5)
+    retry = jobs.submit(lambda job: "ok", lane="model", key="doc:abc")
+    assert retry is not failed
+    assert retry.wait(5) and retry.result == "ok"
+
+
+def test_oldest_finished_jobs_are_dropped() -> None:
+    queue = JobQueue(workers=1, max_finished=2)
+    done = [queue.submit(lambda job: None, lane="m", key=str(i)) for i in range(3)]
+    for job in done:
+        assert job.wait(5)
+    assert queue.get(done[0].id) is None
+    assert queue.get(done[2].id) is done[2]
+    assert queue.submit(lambda job: None, lane="m", key="0") is not done[0]
+    assert queue.stats()["finished"] == 2
+    queue.shutdown()
+
+
+def test_finished_jobs_expire_after_result_ttl() -> None:
+    queue = JobQueue(workers=1, result_ttl_s=0.05)
+    job = queue.submit(lambda job: "result", lane="m", key="doc")
+    assert job.wait(5)
+    assert queue.get(job.id) is job
+
+    time.sleep(0.1)
+    assert queue.get(job.id) is None
+    assert queue.stats()["finished"] == 0
+    assert queue.submit(lambda job: None, lane="m", key="doc") is not job
+    queue.shutdown()
+
+
+# --- cancellation tests ---
+
+
+def test_cancel_queued_job_never_runs(jobs: JobQueue) -> None:
+    started, release = threading.Event(), threading.Event()
+    jobs.submit(_blocker, started, release, lane="model")
+    assert started.wait(5)
+    ran = []
+    queued = jobs.submit(lambda job: ran.append(1), lane="model")
+
+    jobs.cancel(queued.id)
+    release.set()
+    assert queued.wait(5)
+    assert queued.status == "cancelled"
+    assert ran == []
+
+
+def test_cancel_running_job_is_cooperative(jobs: JobQueue) -> None:
+    started = threading.Event()
+
+    def work(job: Job) -> str:
+        started.set()
+        while not job.cancelled:
+            job.wait(0.01)
+        return "stopped"
+
+    job = jobs.submit(work, lane="model")
+    assert started.wait(5)
+    jobs.cancel(job.id)
+    assert job.wait(5)
+    assert job.result == "stopped"
+
+
+def test_shutdown_cancels_queued_jobs() -> None:
+    queue = JobQueue(workers=1)
+    started, release = threading.Event(), threading.Event()
+    running = queue.submit(_blocker, started, release, lane="model")
+    assert started.wait(5)
+    queued = queue.submit(lambda job: None, lane="model")
+    queue.shutdown(wait=False)
+    release.set()
+    assert running.wait(5)
+    assert running.status == "done"
+    assert queued.status == "cancelled"
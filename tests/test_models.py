@@ -0,0 +1,181 @@
+"""Tests for the shared model registry."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+import torch
+
+from pipeline.doctags import create_doctags_model
+from pipeline.models import ModelRegistry, model_nbytes, registry, using_model
+from pipeline.qa import create_qa_model
+from pipeline.segmentation import create_granite_model
+
+
+class _FakeModel(torch.nn.Module):
+    def __init__(self, size: int) -> None:
+        super().__init__()
+        self.weight = torch.nn.Parameter(torch.zeros(size))
+
+
+def _classes(sizes: dict[str, int]) -> tuple[MagicMock, MagicMock]:
+    processor_cls = MagicMock()
+    model_cls = MagicMock()
+    model_cls.from_pretrained.side_effect = lambda repo, **_: _FakeModel(sizes[repo])
+    return processor_cls, model_cls
+
+
+# --- model_nbytes tests ---
+
+
+def test_model_nbytes_counts_parameters() -> None:
+    assert model_nbytes(_FakeModel(10)) == 40
+
+
+# --- ModelRegistry tests ---
+
+
+def test_acquire_loads_once_per_key() -> None:
+    processor_cls, model_cls = _classes({"repo": 4})
+    reg = ModelRegistry()
+
+    first = reg.acquire("repo", "cpu", None, processor_cls, model_cls)
+    second = reg.acquire("repo", "cpu", None, processor_cls, model_cls)
+
+    assert first[1] is second[1]
+    model_cls.from_pretrained.assert_called_once_with("repo")
+    assert reg.stats()[0]["refcount"] == 2
+
+
+def test_acquire_keys_on_dtype() -> None:
+    processor_cls, model_cls = _classes({"repo": 4})
+    reg = ModelRegistry()
+
+    reg.acquire("repo", "cpu", None, processor_cls, model_cls)
+    reg.acquire("repo", "cpu", torch.float16, processor_cls, model_cls)
+
+    assert len(reg) == 2
+    model_cls.from_pretrained.assert_called_with("repo", torch_dtype=torch.float16)
+
+
+def test_eviction_skips_referenced_models() -> None:
+    processor_cls, model_cls = _classes({"a": 10, "b": 10})
+    reg = ModelRegistry(max_bytes=50)
+
+    reg.acquire("a", "cpu", None, processor_cls, model_cls)
+    reg.acquire("b", "cpu", None, processor_cls, model_cls)
+
+    # Both referenced: over budget but nothing can be evicted
+    assert len(reg) == 2
+
+
+def test_release_evicts_least_recently_used() -> None:
+    processor_cls, model_cls = _classes({"a": 10, "b": 10})
+    reg = ModelRegistry(max_bytes=50)
+
+    reg.acquire("a", "cpu", None, processor_cls, model_cls)
+    reg.acquire("b", "cpu", None, processor_cls, model_cls)
+    reg.release("a", "cpu")
+
+    assert reg.key("a", "cpu", None) not in reg
+    assert reg.key("b", "cpu", None) in reg
+
+
+def test_release_instance_drops_reference_by_model() -> None:
+    processor_cls, model_cls = _classes({"a": 10, "b": 10})
+    reg = ModelRegistry(max_bytes=50)
+
+    _, model_a = reg.acquire("a", "cpu", None, processor_cls, model_cls)
+    reg.acquire("b", "cpu", None, processor_cls, model_cls)
+    reg.release_instance(model_a)
+
+    assert reg.key("a", "cpu", None) not in reg
+
+
+def test_loading_a_model_does_not_block_other_acquires() -> None:
+    processor_cls, model_cls = _classes({"fast": 4})
+    reg = ModelRegistry()
+    reg.acquire("fast", "cpu", None, processor_cls, model_cls)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_load(repo: str, **_: object) -> _FakeModel:
+        started.set()
+        release.wait(5)
+        return _FakeModel(4)
+
+    slow_cls = MagicMock()
+    slow_cls.from_pretrained.side_effect = slow_load
+    with ThreadPoolExecutor(3) as pool:
+        loads = [
+            pool.submit(reg.acquire, "slow", "cpu", None, processor_cls, slow_cls)
+            for _ in range(2)
+        ]
+        assert started.wait(5)
+        other = pool.submit(reg.acquire, "fast", "cpu", None, processor_cls, model_cls)
+        assert other.result(timeout=5)[1] is not None
+        assert not any(load.done() for load in loads)
+        release.set()
+        first, second = (load.result(timeout=5) for load in loads)
+
+    assert first[1] is second[1]
+    slow_cls.from_pretrained.assert_called_once()
+    assert {s["repo_id"]: s["refcount"] for s in reg.stats()} == {"fast": 2, "slow": 2}
+
+
+def test_failed_load_is_raised_and_retried() -> None:
+    processor_cls, model_cls = _classes({"repo": 4})
+    model_cls.from_pretrained.side_effect = [OSError("offline"), _FakeModel(4)]
+    reg = ModelRegistry()
+
+    with pytest.raises(OSError, match="offline"):
+        reg.acquire("repo", "cpu", None, processor_cls, model_cls)
+    reg.acquire("repo", "cpu", None, processor_cls, model_cls)
+
+    assert reg.stats()[0]["refcount"] == 1
+
+
+def test_release_unknown_model_is_noop() -> None:
+    reg = ModelRegistry()
+    reg.release("missing", "cpu")
+    assert len(reg) == 0
+
+
+# --- loader sharing tests ---
+
+
+@patch("pipeline.models.AutoModelForVision2Seq")
+@patch("pipeline.models.AutoProcessor")
+def test_segmentation_and_qa_share_granite_vision(
+    mock_processor_cls: MagicMock,
+    mock_model_cls: MagicMock,
+) -> None:
+    seg_processor, seg_model = create_granite_model(device="cpu")
+    qa_processor, qa_model = create_qa_model(device="cpu")
+
+    assert seg_processor is qa_processor
+    assert seg_model is qa_model
+    mock_model_cls.from_pretrained.assert_called_once_with(
+        "ibm-granite/granite-vision-3.3-2b"
+    )
+
+
+@patch("pipeline.models.AutoModelForVision2Seq")
+@patch("pipeline.models.AutoProcessor")
+def test_using_model_lets_budget_evict_idle_loaders(
+    mock_processor_cls: MagicMock,
+    mock_model_cls: MagicMock,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    mock_model_cls.from_pretrained.side_effect = lambda repo, **_: _FakeModel(10)
+    monkeypatch.setattr(registry, "max_bytes", 50)
+    qa_key = registry.key("ibm-granite/granite-vision-3.3-2b", "cpu", None)
+    doctags_key = registry.key("ibm-granite/granite-docling-258M", "cpu", None)
+
+    with using_model(create_qa_model, device="cpu"):
+        assert registry.stats()[0]["refcount"] == 1
+    assert qa_key in registry
+
+    with using_model(create_doctags_model, device="cpu"):
+        assert qa_key not in registry
+        assert doctags_key in registry
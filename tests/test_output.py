@@ -1,20 +1,36 @@
-"""Tests for the output module (build_output, get_description, get_table_content)."""
+"""Tests for the output module (build_output, write_output, descriptions, tables)."""
 
+import io
+import json
+import threading
 import warnings
+from collections.abc import Callable
+from unittest.mock import patch
 
+import pytest
 from docling_core.types.doc.document import (
     DescriptionAnnotation,
     DescriptionMetaField,
+    DocItemLabel,
     DoclingDocument,
+    ImageRef,
     PictureItem,
     PictureMeta,
     TableCell,
     TableData,
     TableItem,
 )
-
-from pipeline import build_output, get_description, get_table_content
-from pipeline.output import build_element
+from PIL import Image
+
+from pipeline import (
+    DocumentView,
+    build_output,
+    get_description,
+    get_table_content,
+    iter_elements,
+    write_output,
+)
+from pipeline.output import build_element, extract_table, make_element
 
 
 def _make_doc(
@@ -378,6 +394,106 @@ def test_get_table_content_merged_columns() -> None:
     assert len(result["data"]["rows"]) == 1
 
 
+# --- Tests for extract_table ---
+
+
+def _cell(
+    text: str, row: int, col: int, rows: int = 1, cols: int = 1, header: bool = False
+) -> TableCell:
+    return TableCell(
+        text=text,
+        start_row_offset_idx=row,
+        end_row_offset_idx=row + rows,
+        start_col_offset_idx=col,
+        end_col_offset_idx=col + cols,
+        column_header=header,
+    )
+
+
+_TABLES = {
+    "two_header_rows": (
+        [
+            _cell("Region", 0, 0, rows=2, header=True),
+            _cell("Sales", 0, 1, cols=2, header=True),
+            _cell("2023", 1, 1, header=True),
+            _cell("2024", 1, 2, header=True),
+            _cell("North", 2, 0),
+            _cell("1.5", 2, 1),
+            _cell("2", 2, 2),
+        ],
+        3,
+        3,
+    ),
+    "escaped_text": (
+        [_cell("a|b", 0, 0), _cell("two\nlines", 0, 1), _cell("<x> & _y_", 1, 0)],
+        2,
+        2,
+    ),
+    "overlapping_cells": (
+        [_cell("wide", 0, 0, cols=3), _cell("over", 0, 1), _cell("past", 1, 2, 4, 4)],
+        2,
+        3,
+    ),
+    "header_only": ([_cell("A", 0, 0, header=True), _cell("", 0, 1)], 1, 2),
+    "no_columns": ([], 2, 0),
+}
+
+
+@pytest.mark.parametrize("caption", [None, "Table 1: sales_by <region>"])
+@pytest.mark.parametrize("name", list(_TABLES))
+def test_extract_table_matches_docling_exports(name: str, caption: str | None) -> None:
+    cells, num_rows, num_cols = _TABLES[name]
+    doc = DoclingDocument(name="test")
+    table = doc.add_table(
+        data=TableData(table_cells=cells, num_rows=num_rows, num_cols=num_cols)
+    )
+    if caption is not None:
+        table.captions.append(
+            doc.add_text(label=DocItemLabel.CAPTION, text=caption).get_ref()
+        )
+    df = table.export_to_dataframe(doc=doc)
+
+    content = extract_table(table, doc)
+
+    assert content.markdown == table.export_to_markdown(doc=doc)
+    assert content.columns == [str(c) for c in df.columns]
+    assert content.rows == df.values.tolist()
+    assert content.dataframe.equals(df)
+
+
+def test_extract_table_skips_docling_exports() -> None:
+    cells, num_rows, num_cols = _TABLES["two_header_rows"]
+    table = _make_table(0, cells=cells, num_rows=num_rows, num_cols=num_cols)
+    doc = _make_doc(tables=[table])
+    with (
+        patch.object(TableItem, "export_to_dataframe") as to_dataframe,
+        patch.object(TableItem, "export_to_markdown") as to_markdown,
+    ):
+        content = extract_table(table, doc)
+        assert content.dataframe is content.dataframe
+    to_dataframe.assert_not_called()
+    to_markdown.assert_not_called()
+    assert content.columns == ["Region.Region", "Sales.2023", "Sales.2024"]
+    assert content.header_rows == 2
+
+
+def test_extract_table_uses_docling_for_annotated_tables() -> None:
+    table = _make_table(0, cells=[_cell("A", 0, 0)], num_rows=1, num_cols=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=DeprecationWarning)
+        table.annotations.append(
+            DescriptionAnnotation(text="A tiny table.", provenance="test")
+        )
+    doc = _make_doc(tables=[table])
+    with patch.object(
+        TableItem, "export_to_markdown", return_value="from docling"
+    ) as to_markdown:
+        content = extract_table(table, doc)
+    to_markdown.assert_called_once()
+    assert content.markdown == "from docling"
+    assert content.rows == [["A"]]
+
+
 # --- Tests for build_element ---
 
 
@@ -421,3 +537,123 @@ def test_build_element_table() -> None:
     assert result["content"]["data"]["columns"] == ["X"]
     assert result["content"]["data"]["rows"] == [["1"]]
     assert isinstance(result["content"]["markdown"], str)
+
+
+# --- iter_elements / write_output tests ---
+
+
+def _mixed_doc() -> DoclingDocument:
+    cells = [
+        TableCell(
+            text="A",
+            start_row_offset_idx=0,
+            end_row_offset_idx=1,
+            start_col_offset_idx=0,
+            end_col_offset_idx=1,
+        ),
+    ]
+    return _make_doc(
+        [_make_picture(0, text="Pic 1.", created_by="model"), _make_picture(1)],
+        [_make_table(0, cells=cells, num_rows=1, num_cols=1)],
+    )
+
+
+def test_iter_elements_matches_build_output() -> None:
+    doc = _mixed_doc()
+    assert list(iter_elements(doc)) == build_output(doc, 1.0)["elements"]
+
+
+def test_iter_elements_builds_tables_only_when_reached() -> None:
+    doc = _mixed_doc()
+    with patch("pipeline.output.extract_table") as table_content:
+        elements = iter_elements(doc)
+        next(elements)
+        next(elements)
+        table_content.assert_not_called()
+        next(elements)
+        table_content.assert_called_once()
+
+
+@pytest.mark.parametrize("indent", [2, None, 0])
+@pytest.mark.parametrize("doc_factory", [_mixed_doc, _make_doc])
+def test_write_output_json_matches_json_dump(
+    indent: int | None, doc_factory: Callable[[], DoclingDocument]
+) -> None:
+    doc = doc_factory()
+    buf = io.StringIO()
+    write_output(doc, 2.5, buf, indent=indent)
+    assert buf.getvalue() == json.dumps(build_output(doc, 2.5), indent=indent)
+
+
+def test_write_output_ndjson_writes_one_line_per_element() -> None:
+    doc = _mixed_doc()
+    buf = io.StringIO()
+    write_output(doc, 2.5, buf, format="ndjson")
+
+    lines = [json.loads(line) for line in buf.getvalue().splitlines()]
+    expected = build_output(doc, 2.5)
+    assert lines[0] == {"document_info": expected["document_info"]}
+    assert lines[1:] == expected["elements"]
+
+
+# --- DocumentView tests ---
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_document_view_matches_iter_elements(workers: int) -> None:
+    doc = _mixed_doc()
+    view = DocumentView(doc, workers=workers)
+    assert [element.to_dict() for element in view.elements()] == list(
+        iter_elements(doc)
+    )
+    assert [element.number for element in view.tables] == [3]
+    assert [element.type for element in view.pictures] == ["picture", "picture"]
+
+
+def test_document_view_builds_each_element_once() -> None:
+    doc = _mixed_doc()
+    view = DocumentView(doc, workers=2)
+    with patch("pipeline.output.extract_table", wraps=extract_table) as extract:
+        output = build_output(doc, 1.0, view=view)
+        buf = io.StringIO()
+        write_output(doc, 1.0, buf, view=view)
+        assert view.tables[0].table is view.element(3).table
+    extract.assert_called_once()
+    assert json.loads(buf.getvalue()) == output
+
+
+def test_document_view_concurrent_requests_share_one_build() -> None:
+    doc = _mixed_doc()
+    view = DocumentView(doc)
+    barrier = threading.Barrier(4)
+    results = []
+
+    def request() -> None:
+        barrier.wait()
+        results.append(view.element(1))
+
+    with patch("pipeline.output.make_element", wraps=make_element) as build:
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    build.assert_called_once()
+    assert all(element is results[0] for element in results)
+
+
+def test_document_view_keeps_decoded_images() -> None:
+    pic = _make_picture(0)
+    pic.image = ImageRef.from_pil(Image.new("RGB", (8, 6), "red"), dpi=72)
+    doc = _make_doc([pic])
+
+    assert DocumentView(doc).element(1).image is None
+    image = DocumentView(doc, images=True).element(1).image
+    assert image is not None and image.size == (8, 6)
+    assert image.getpixel((0, 0)) == (255, 0, 0)
+
+
+def test_document_view_rejects_unknown_elements() -> None:
+    view = DocumentView(_mixed_doc())
+    with pytest.raises(IndexError, match="out of range"):
+        view.element(4)
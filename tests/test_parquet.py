@@ -0,0 +1,180 @@
+"""Tests for the Parquet dataset export."""
+
+from pathlib import Path
+
+import pyarrow.parquet as pq
+from docling_core.types.doc.base import BoundingBox, CoordOrigin, Size
+from docling_core.types.doc.document import (
+    DescriptionMetaField,
+    DocItemLabel,
+    DoclingDocument,
+    PictureMeta,
+    ProvenanceItem,
+    TableCell,
+    TableData,
+)
+
+from pipeline import open_parquet_dataset, write_parquet
+from pipeline.output import TableContent
+from pipeline.parquet import (
+    PICTURE_SCHEMA,
+    TABLE_CELL_SCHEMA,
+    table_to_arrow,
+)
+
+
+def _cell(text: str, row: int, col: int, header: bool = False) -> TableCell:
+    return TableCell(
+        text=text,
+        start_row_offset_idx=row,
+        end_row_offset_idx=row + 1,
+        start_col_offset_idx=col,
+        end_col_offset_idx=col + 1,
+        column_header=header,
+    )
+
+
+def _doc(name: str = "report", tables: int = 1) -> DoclingDocument:
+    """A document with one described picture on page 2 and header tables."""
+    doc = DoclingDocument(name=name)
+    doc.add_page(page_no=2, size=Size(width=600, height=800))
+    caption = doc.add_text(label=DocItemLabel.CAPTION, text="Figure 1.")
+    pic = doc.add_picture(
+        caption=caption,
+        prov=ProvenanceItem(
+            page_no=2,
+            bbox=BoundingBox(
+                l=10, t=700, r=110, b=600, coord_origin=CoordOrigin.BOTTOMLEFT
+            ),
+            charspan=(0, 0),
+        ),
+    )
+    pic.meta = PictureMeta(
+        description=DescriptionMetaField(text="A bar chart.", created_by="model")
+    )
+    doc.add_picture()
+    for i in range(tables):
+        cells = [
+            _cell("Region", 0, 0, header=True),
+            _cell("Sales", 0, 1, header=True),
+            _cell(f"North {i}", 1, 0),
+            _cell("10", 1, 1),
+            _cell(f"South {i}", 2, 0),
+            _cell("7", 2, 1),
+        ]
+        doc.add_table(data=TableData(table_cells=cells, num_rows=3, num_cols=2))
+    return doc
+
+
+# --- write_parquet tests ---
+
+
+def test_write_parquet_writes_pictures_cells_and_document(tmp_path: Path) -> None:
+    written = write_parquet(_doc(), 2.5, tmp_path, "sub/report")
+
+    assert written == [
+        tmp_path / "pictures" / "sub" / "report.parquet",
+        tmp_path / "table_cells" / "sub" / "report.parquet",
+        tmp_path / "documents" / "sub" / "report.parquet",
+    ]
+    pictures = pq.read_table(written[0])
+    assert pictures.schema == PICTURE_SCHEMA
+    assert pictures.to_pylist() == [
+        {
+            "document": "sub/report",
+            "element_number": 1,
+            "reference": "#/pictures/0",
+            "caption": "Figure 1.",
+            "description": "A bar chart.",
+            "description_provenance": "model",
+            "page": 2,
+            "bbox": {
+                "l": 10.0,
+                "t": 700.0,
+                "r": 110.0,
+                "b": 600.0,
+                "coord_origin": "BOTTOMLEFT",
+            },
+        },
+        {
+            "document": "sub/report",
+            "element_number": 2,
+            "reference": "#/pictures/1",
+            "caption": "",
+            "description": None,
+            "description_provenance": None,
+            "page": None,
+            "bbox": None,
+        },
+    ]
+    cells = pq.read_table(written[1])
+    assert cells.schema == TABLE_CELL_SCHEMA
+    assert cells.to_pydict()["value"] == ["North 0", "10", "South 0", "7"]
+    assert cells.to_pydict()["column_name"] == ["Region", "Sales"] * 2
+    assert cells.to_pydict()["row"] == [0, 0, 1, 1]
+    assert cells.to_pydict()["element_number"] == [3] * 4
+    assert pq.read_table(written[2]).to_pylist() == [
+        {
+            "document": "sub/report",
+            "num_pages": 1,
+            "num_pictures": 2,
+            "num_tables": 1,
+            "total_duration_s": 2.5,
+        }
+    ]
+
+
+def test_documents_append_into_one_dataset(tmp_path: Path) -> None:
+    write_parquet(_doc("a"), 1.0, tmp_path, "a")
+    write_parquet(_doc("b", tables=2), 1.0, tmp_path, "b", document="b.pdf")
+    write_parquet(_doc("a", tables=0), 1.0, tmp_path, "a")
+
+    cells = open_parquet_dataset(tmp_path, "table_cells").to_table(
+        columns=["document", "value"]
+    )
+    assert cells.column_names == ["document", "value"]
+    assert sorted(set(cells.column("document").to_pylist())) == ["b.pdf"]
+    assert cells.num_rows == 8
+    documents = open_parquet_dataset(tmp_path, "documents").to_table()
+    assert sorted(documents.column("num_tables").to_pylist()) == [0, 2]
+    assert open_parquet_dataset(tmp_path, "pictures").count_rows() == 4
+
+
+def test_write_parquet_one_file_per_table(tmp_path: Path) -> None:
+    write_parquet(_doc(tables=3), 1.0, tmp_path, "report", tables="files")
+    written = write_parquet(_doc(tables=2), 1.0, tmp_path, "report", tables="files")
+
+    table_dir = tmp_path / "tables" / "report"
+    assert sorted(table_dir.iterdir()) == [
+        table_dir / "3.parquet",
+        table_dir / "4.parquet",
+    ]
+    assert table_dir / "4.parquet" in written
+    assert not (tmp_path / "table_cells").exists()
+    table = pq.read_table(table_dir / "4.parquet")
+    assert table.to_pydict() == {"Region": ["North 1", "South 1"], "Sales": ["10", "7"]}
+    assert table.schema.metadata == {
+        b"document": b"report",
+        b"reference": b"#/tables/1",
+        b"caption": b"",
+    }
+
+
+# --- table_to_arrow tests ---
+
+
+def test_table_to_arrow_names_every_column_uniquely() -> None:
+    content = TableContent(
+        columns=["a", "a", "", "a.1"],
+        rows=[["1", "2", "3", "4"]],
+        markdown="",
+        header_rows=1,
+    )
+    table = table_to_arrow(content)
+    assert table.column_names == ["a", "a.1", "column_2", "a.1.1"]
+    assert table.column("column_2").to_pylist() == ["3"]
+
+
+def test_table_to_arrow_empty_table() -> None:
+    table = table_to_arrow(TableContent(columns=[], rows=[], markdown=""))
+    assert table.num_columns == 0 and table.num_rows == 0
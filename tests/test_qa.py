@@ -6,8 +6,15 @@ import pytest
 import torch
 from PIL import Image
 
-from pipeline.qa import create_qa_model, generate_qa_response, resize_for_qa
-
+from benchmarks.standins import tiny_granite_model
+from pipeline.qa import (
+    QASession,
+    create_qa_model,
+    generate_qa_response,
+    qa_feature_cache,
+    resize_for_qa,
+    stream_qa_response,
+)
 
 # --- resize_for_qa tests ---
 
@@ -58,8 +65,8 @@ def test_resize_custom_max_dim() -> None:
 # --- create_qa_model tests ---
 
 
-@patch("pipeline.qa.AutoModelForVision2Seq")
-@patch("pipeline.qa.AutoProcessor")
+@patch("pipeline.models.AutoModelForVision2Seq")
+@patch("pipeline.models.AutoProcessor")
 def test_create_qa_model_loads_correct_model(
     mock_processor_cls: MagicMock,
     mock_model_cls: MagicMock,
@@ -76,8 +83,8 @@ def test_create_qa_model_loads_correct_model(
     assert model is mock_model_cls.from_pretrained.return_value.to.return_value
 
 
-@patch("pipeline.qa.AutoModelForVision2Seq")
-@patch("pipeline.qa.AutoProcessor")
+@patch("pipeline.models.AutoModelForVision2Seq")
+@patch("pipeline.models.AutoProcessor")
 def test_create_qa_model_moves_to_device(
     mock_processor_cls: MagicMock,
     mock_model_cls: MagicMock,
@@ -198,3 +205,162 @@ def test_generate_qa_response_returns_empty_on_no_new_tokens() -> None:
         [Image.new("RGB", (10, 10))], "question", mock_processor, mock_model
     )
     assert result == ""
+
+
+# --- stream_qa_response tests ---
+
+
+def test_stream_qa_response_rejects_bad_image_count_before_iterating() -> None:
+    with pytest.raises(ValueError, match="1 to 8"):
+        stream_qa_response([], "What is this?", MagicMock(), MagicMock())
+
+
+def test_stream_qa_response_matches_generate_qa_response() -> None:
+    processor, model = tiny_granite_model()
+    images = [Image.new("RGB", (64, 48), (200, 10, 10))]
+
+    chunks = list(stream_qa_response(images, "What is this?", processor, model))
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == generate_qa_response(
+        images, "What is this?", processor, model
+    )
+
+
+# --- QASession tests ---
+
+
+def _pages() -> list[Image.Image]:
+    return [
+        Image.new("RGB", (64, 48), (200, 10, 10)),
+        Image.new("RGB", (48, 64), (10, 10, 200)),
+    ]
+
+
+def test_qa_session_rejects_bad_image_count() -> None:
+    with pytest.raises(ValueError, match="1 to 8"):
+        QASession([])
+
+
+def test_qa_session_answers_match_generate_qa_response() -> None:
+    processor, model = tiny_granite_model()
+    pages = _pages()
+    session = QASession(pages)
+
+    for question in ["What is this?", "Which colour is the second page?"]:
+        expected = generate_qa_response(pages, question, processor, model)
+        assert session.ask(question, processor, model) == expected
+        assert "".join(session.stream(question, processor, model)) == expected
+
+
+def test_qa_session_encodes_pages_once_and_prefills_only_questions() -> None:
+    processor, model = tiny_granite_model()
+    session = QASession(_pages())
+    encode = patch.object(
+        model.model, "get_image_features", wraps=model.model.get_image_features
+    )
+    prefill = patch.object(
+        model.model.language_model,
+        "forward",
+        wraps=model.model.language_model.forward,
+    )
+
+    with encode as image_features, prefill as language_model:
+        session.ask("What is this?", processor, model)
+        language_model.reset_mock()
+        session.ask("And the title?", processor, model)
+
+    image_features.assert_called_once()
+    first_step = language_model.call_args_list[0].kwargs["inputs_embeds"]
+    assert first_step.shape[1] < session.prefix_length
+    assert session._cache is not None
+    assert session._cache.get_seq_length() == session.prefix_length
+
+
+def test_qa_session_rebuilds_prefix_for_another_model() -> None:
+    processor, model = tiny_granite_model()
+    _, other = tiny_granite_model()
+    session = QASession(_pages())
+    session.ask("What is this?", processor, model)
+
+    with patch.object(
+        other.model, "get_image_features", wraps=other.model.get_image_features
+    ) as image_features:
+        answer = session.ask("What is this?", processor, other)
+
+    image_features.assert_called_once()
+    assert answer == generate_qa_response(_pages(), "What is this?", processor, other)
+
+
+# --- feature cache tests ---
+
+
+def _page(colour: tuple[int, int, int]) -> Image.Image:
+    return Image.new("RGB", (900, 600), colour)
+
+
+def test_cached_features_match_pixel_values_path() -> None:
+    processor, model = tiny_granite_model()
+    pages = [_page((200, 10, 10)), _page((10, 200, 10))]
+    question = "What is this?"
+
+    inputs = processor.apply_chat_template(
+        [
+            {
+                "role": "user",
+                "content": [
+                    *({"type": "image", "image": resize_for_qa(p)} for p in pages),
+                    {"type": "text", "text": question},
+                ],
+            }
+        ],
+        add_generation_prompt=True,
+        tokenize=True,
+        return_dict=True,
+        return_tensors="pt",
+    )
+    with torch.inference_mode():
+        output = model.generate(**inputs, max_new_tokens=32)
+    expected = processor.decode(
+        output[0, inputs["input_ids"].shape[1] :], skip_special_tokens=True
+    )
+
+    assert generate_qa_response(pages, question, processor, model) == expected
+    assert generate_qa_response(pages, question, processor, model) == expected
+
+
+def test_feature_cache_encodes_only_new_pages() -> None:
+    processor, model = tiny_granite_model()
+    red, green, blue = _page((200, 0, 0)), _page((0, 200, 0)), _page((0, 0, 200))
+    counts: list[tuple[int, int]] = []
+
+    def record(hits: int, misses: int) -> None:
+        counts.append((hits, misses))
+
+    with patch.object(
+        model, "get_image_features", wraps=model.get_image_features
+    ) as encode:
+        generate_qa_response([red, green], "q", processor, model, record)
+        generate_qa_response([green, blue], "q", processor, model, record)
+        generate_qa_response([blue, red], "q", processor, model, record)
+
+    assert counts == [(0, 2), (1, 1), (2, 0)]
+    assert [len(call.args[1]) for call in encode.call_args_list] == [2, 1]
+    stats = qa_feature_cache(model).stats()
+    assert stats["entries"] == 3
+    assert stats["bytes"] > 0
+
+
+def test_feature_cache_respects_byte_budget() -> None:
+    processor, model = tiny_granite_model()
+    generate_qa_response([_page((1, 2, 3))], "q", processor, model)
+    entry_bytes = qa_feature_cache(model).total_bytes()
+
+    _, small = tiny_granite_model()
+    with patch("pipeline.qa.QA_FEATURE_CACHE_BYTES", entry_bytes * 2):
+        cache = qa_feature_cache(small)
+    for i in range(4):
+        generate_qa_response([_page((i, i, i))], "q", processor, small)
+
+    assert cache.stats()["entries"] == 2
+    assert cache.total_bytes() <= entry_bytes * 2
@@ -0,0 +1,145 @@
+"""Tests for QA page retrieval."""
+
+from pathlib import Path
+
+import pytest
+
+from pipeline.cache import DiskCache
+from pipeline.retrieval import PageIndex, load_page_index, pdf_page_texts, tokenize
+
+TEST_PDF = str(Path(__file__).parent / "data" / "pdf" / "test_pictures.pdf")
+
+
+def _text_pdf(path: Path, pages: list[str]) -> Path:
+    """Write a PDF with one line of Helvetica text per page."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "",  # page tree, filled in below
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    data += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    data += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode()
+    path.write_bytes(data)
+    return path
+
+
+# --- pdf_page_texts / tokenize tests ---
+
+
+def test_pdf_page_texts_reads_text_layer(tmp_path: Path) -> None:
+    pdf = _text_pdf(tmp_path / "doc.pdf", ["Revenue grew", "Staff costs"])
+    texts = pdf_page_texts(str(pdf))
+    assert [tokenize(text) for text in texts] == [
+        ["revenue", "grew"],
+        ["staff", "costs"],
+    ]
+
+
+def test_pdf_page_texts_empty_for_scanned_pages() -> None:
+    texts = pdf_page_texts(TEST_PDF)
+    assert texts == ["", "", ""]
+
+
+# --- PageIndex tests ---
+
+
+def test_search_ranks_matching_pages_and_returns_page_order() -> None:
+    index = PageIndex.from_texts(
+        [
+            "introduction and scope",
+            "revenue by region, revenue growth",
+            "staff costs",
+            "revenue outlook for the coming year",
+        ]
+    )
+    assert index.search("How did revenue change?", k=2) == [1, 3]
+    scores = index.scores("revenue")
+    assert scores[1] > scores[3] > 0
+    assert scores[0] == scores[2] == 0
+
+
+def test_search_falls_back_to_first_pages_without_matches() -> None:
+    index = PageIndex.from_texts(["", "", "", ""])
+    assert index.search("anything", k=2) == [0, 1]
+
+
+def test_search_rare_terms_outweigh_common_ones() -> None:
+    index = PageIndex.from_texts(
+        ["report summary", "report appendix", "report dividend"]
+    )
+    assert index.search("report dividend", k=1) == [2]
+
+
+def test_index_round_trips_through_json() -> None:
+    index = PageIndex.from_texts(["alpha beta", "beta gamma"])
+    loaded = PageIndex.from_json(index.to_json())
+    assert loaded.term_counts == index.term_counts
+    assert loaded.scores("beta gamma") == index.scores("beta gamma")
+
+
+def test_from_json_rejects_other_formats() -> None:
+    with pytest.raises(ValueError, match="format"):
+        PageIndex.from_json('{"format": 0, "term_counts": []}')
+
+
+# --- load_page_index tests ---
+
+
+def test_load_page_index_builds_once_per_pdf_hash(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path / "retrieval", suffix=".json")
+    first = _text_pdf(tmp_path / "a.pdf", ["alpha", "beta"])
+    copy = tmp_path / "copy.pdf"
+    copy.write_bytes(first.read_bytes())
+
+    index = load_page_index(str(first), cache)
+    again = load_page_index(str(copy), cache)
+
+    assert again.term_counts == index.term_counts
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["entries"] == 1
+    assert again.search("beta", k=1) == [1]
+
+
+def test_load_page_index_accepts_page_texts(tmp_path: Path) -> None:
+    pdf = tmp_path / "scan.pdf"
+    pdf.write_bytes(Path(TEST_PDF).read_bytes())
+    index = load_page_index(str(pdf), texts=["cover", "chart of sales", "notes"])
+    assert index.search("sales", k=1) == [1]
+
+
+def test_load_page_index_keys_text_layer_and_given_texts_apart(
+    tmp_path: Path,
+) -> None:
+    cache = DiskCache(tmp_path / "retrieval", suffix=".json")
+    pdf = _text_pdf(tmp_path / "doc.pdf", ["alpha", "beta"])
+
+    layer = load_page_index(str(pdf), cache)
+    given = load_page_index(str(pdf), cache, texts=["gamma", "delta"])
+    other = load_page_index(str(pdf), cache, texts=["delta", "gamma"])
+
+    assert layer.search("beta", k=1) == [1]
+    assert given.search("delta", k=1) == [1]
+    assert other.search("delta", k=1) == [0]
+    assert cache.stats()["hits"] == 0
+    assert load_page_index(str(pdf), cache).term_counts == layer.term_counts
@@ -1,17 +1,33 @@
 """Tests for the segmentation module."""
 
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
 import torch
 from PIL import Image
+from transformers import LogitsProcessor, LogitsProcessorList
 
+from benchmarks.standins import tiny_granite_model, tiny_sam_model
 from pipeline.segmentation import (
+    SEGMENTATION_MAX_NEW_TOKENS,
+    RunLengthParser,
+    SegmentationResult,
+    _generate_segmentations,
     compute_logits_from_mask,
+    decode_segmentation,
     draw_mask,
     extract_segmentation,
     prepare_mask,
+    refine_many_with_sam,
+    refine_with_sam,
+    sam_embedding_cache,
     sample_points,
+    segment_batch,
+    segment_many,
+    stream_segmentation,
 )
 
-
 # --- extract_segmentation tests ---
 
 
@@ -61,6 +77,80 @@ def test_extract_segmentation_multiple_labels() -> None:
     assert result == [0, 1, 1]
 
 
+# --- decode_segmentation tests ---
+
+
+def test_decode_segmentation_keeps_label_ids() -> None:
+    text = "<seg>others *1| cat *2| dog *1\n dog *2| others *1| cat *1</seg>"
+    result = decode_segmentation(text, patch_h=2, patch_w=4)
+    assert result is not None
+    grid, labels = result
+    assert labels == ["others", "cat", "dog"]
+    assert grid.tolist() == [[0, 1, 1, 2], [2, 2, 0, 1]]
+
+
+def test_decode_segmentation_others_is_always_zero() -> None:
+    result = decode_segmentation("<seg>dog *1| others *1</seg>", patch_h=1, patch_w=2)
+    assert result is not None
+    grid, labels = result
+    assert labels == ["others", "dog"]
+    assert grid.tolist() == [[1, 0]]
+
+
+def test_decode_segmentation_non_square_grid_pads_with_last_label() -> None:
+    result = decode_segmentation("<seg>others *2| cat *1</seg>", patch_h=2, patch_w=3)
+    assert result is not None
+    grid, _ = result
+    assert grid.shape == (2, 3)
+    assert grid.tolist() == [[0, 0, 1], [1, 1, 1]]
+
+
+def test_decode_segmentation_rejects_empty_runs() -> None:
+    assert decode_segmentation("<seg>dog *0</seg>") is None
+    assert decode_segmentation("<seg></seg>") is None
+
+
+def test_decode_segmentation_prepare_mask_collapses_labels() -> None:
+    result = decode_segmentation("<seg>others *1| cat *1| dog *2</seg>", 2, 2)
+    assert result is not None
+    mask = prepare_mask(result[0], patch_h=2, patch_w=2, size=(2, 2))
+    assert mask.tolist() == [[0.0, 1.0], [1.0, 1.0]]
+
+
+# --- RunLengthParser tests ---
+
+
+def test_run_length_parser_matches_decoder_for_any_chunking() -> None:
+    text = "noise <seg>others *3\n dog *1| others *2\n cat *3</seg> trailing"
+    expected = decode_segmentation(text, patch_h=3, patch_w=3)
+    assert expected is not None
+    for size in (1, 2, 5, len(text)):
+        parser = RunLengthParser()
+        for i in range(0, len(text), size):
+            parser.feed(text[i : i + size])
+        assert parser.finished
+        assert parser.total == 9
+        assert parser.labels == expected[1]
+        assert parser.run_ids == [0, 1, 0, 2]
+        assert parser.run_counts == [3, 1, 2, 3]
+
+
+def test_run_length_parser_waits_for_separator_before_counting() -> None:
+    parser = RunLengthParser()
+    parser.feed("<seg>others *1")
+    assert parser.total == 0
+    parser.feed("2| dog")
+    assert parser.total == 12
+    assert not parser.finished
+
+
+def test_run_length_parser_skips_malformed_runs() -> None:
+    parser = RunLengthParser()
+    parser.feed("<seg>others| dog *x| cat *2</seg>")
+    assert parser.labels == ["others", "cat"]
+    assert parser.total == 2
+
+
 # --- prepare_mask tests ---
 
 
@@ -190,3 +280,258 @@ def test_draw_mask_alpha_varies_with_mask() -> None:
     assert fg_pixel[0] > bg_pixel[0]
     # Foreground should be semi-transparent (not fully opaque red)
     assert fg_pixel[0] < 255
+
+
+# --- SAM refinement tests ---
+
+
+@pytest.fixture(scope="module")
+def sam() -> tuple:
+    return tiny_sam_model()
+
+
+def _coarse_mask(size: tuple[int, int]) -> torch.Tensor:
+    mask = torch.zeros(size[1], size[0])
+    mask[size[1] // 4 : size[1] // 2, size[0] // 4 : size[0] // 2] = 1
+    return mask
+
+
+def test_refine_with_sam_matches_processor_prompt_path(sam: tuple) -> None:
+    processor, model = sam
+    image = Image.new("RGB", (320, 240), (90, 120, 150))
+    mask = _coarse_mask(image.size)
+    points, labels = sample_points(mask, seed=0)
+
+    with patch("pipeline.segmentation.sample_points", return_value=(points, labels)):
+        refined = refine_with_sam(mask, image, sam)
+
+    # Reference: let SamProcessor normalize the points, as before the cache
+    inputs = processor(
+        image,
+        input_points=points[None].float(),
+        input_labels=labels[None],
+        return_tensors="pt",
+    )
+    with torch.inference_mode():
+        sparse, dense = model.prompt_encoder(
+            input_points=inputs["input_points"].float(),
+            input_labels=inputs["input_labels"],
+            input_masks=compute_logits_from_mask(mask).unsqueeze(0),
+            input_boxes=None,
+        )
+        maps = model.mask_decoder(
+            image_embeddings=model.get_image_embeddings(inputs["pixel_values"]),
+            image_positional_embeddings=model.get_image_wide_positional_embeddings(),
+            sparse_prompt_embeddings=sparse,
+            dense_prompt_embeddings=dense,
+            multimask_output=False,
+        )[0]
+    expected = processor.post_process_masks(
+        maps, inputs["original_sizes"], inputs["reshaped_input_sizes"]
+    )[0].squeeze()
+
+    assert refined.shape == (240, 320)
+    assert torch.equal(refined, (expected > 0.0).to(torch.uint8))
+
+
+def test_segment_many_encodes_image_once(sam: tuple) -> None:
+    _, model = sam
+    sam_embedding_cache(model).clear()
+    image = Image.new("RGB", (64, 48), (10, 200, 30))
+    texts = ["<seg>dog *576</seg>", "no mask", "<seg>others *300| cat *276</seg>"]
+    generated = [SegmentationResult(mask=None, text=t, new_tokens=9) for t in texts]
+
+    with (
+        patch("pipeline.segmentation._generate_segmentations", return_value=generated),
+        patch.object(
+            model, "get_image_embeddings", wraps=model.get_image_embeddings
+        ) as encode,
+    ):
+        results = segment_many(
+            image, ["dog", "bird", "cat"], (MagicMock(), MagicMock()), sam
+        )
+    masks = [result.mask for result in results]
+
+    assert encode.call_count == 1
+    assert masks[1] is None
+    assert [m.size for m in masks if m is not None] == [(64, 48), (64, 48)]
+    assert sam_embedding_cache(model).stats()["misses"] == 1
+
+
+def test_sam_embedding_cache_is_per_model(sam: tuple) -> None:
+    _, model = sam
+    _, other = tiny_sam_model()
+    assert sam_embedding_cache(model) is sam_embedding_cache(model)
+    assert sam_embedding_cache(model) is not sam_embedding_cache(other)
+
+
+def test_refine_many_with_sam_matches_single_refinement(sam: tuple) -> None:
+    images = [
+        Image.new("RGB", (320, 240), (90, 120, 150)),
+        Image.new("RGB", (200, 300), (200, 40, 40)),
+    ]
+    masks = [_coarse_mask(image.size) for image in images]
+    sampled = [sample_points(mask, seed=i) for i, mask in enumerate(masks)]
+
+    with patch("pipeline.segmentation.sample_points", side_effect=sampled):
+        batched = refine_many_with_sam(masks, images, sam)
+    with patch("pipeline.segmentation.sample_points", side_effect=sampled):
+        single = [refine_with_sam(m, img, sam) for m, img in zip(masks, images)]
+
+    assert [m.shape for m in batched] == [(240, 320), (300, 200)]
+    for batch_mask, single_mask in zip(batched, single):
+        assert torch.equal(batch_mask, single_mask)
+
+
+def test_refine_many_with_sam_pads_short_point_sets(sam: tuple) -> None:
+    image = Image.new("RGB", (64, 48))
+    full = torch.ones(48, 64)
+
+    refined = refine_many_with_sam([full, _coarse_mask((64, 48))], [image, image], sam)
+
+    assert [m.shape for m in refined] == [(48, 64), (48, 64)]
+
+
+def test_generate_segmentations_batches_match_single_calls() -> None:
+    granite = tiny_granite_model()
+    images = [Image.new("RGB", (64, 48)), Image.new("RGB", (30, 90), (9, 9, 9))]
+    prompts = ["the dog", "a much longer description of the cat"]
+
+    with patch.object(granite[1], "generate", wraps=granite[1].generate) as generate:
+        results = _generate_segmentations(images * 2, prompts * 2, granite, 3)
+
+    assert generate.call_count == 2
+    single = [
+        _generate_segmentations([img], [p], granite, 1)[0].text
+        for img, p in zip(images, prompts)
+    ]
+    assert [result.text for result in results] == single * 2
+
+
+def test_segment_batch_rejects_mismatched_inputs(sam: tuple) -> None:
+    granite = (MagicMock(), MagicMock())
+    with pytest.raises(ValueError, match="images"):
+        segment_batch([Image.new("RGB", (4, 4))], [], granite, sam)
+    with pytest.raises(ValueError, match="batch_size"):
+        segment_batch([], [], granite, sam, batch_size=0)
+
+
+# --- early stopping tests ---
+
+
+class _Script(LogitsProcessor):
+    """Force generation to follow a fixed token sequence."""
+
+    def __init__(self, token_ids: list[int]) -> None:
+        self.token_ids = token_ids
+        self.prompt_length: int | None = None
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: torch.FloatTensor
+    ) -> torch.FloatTensor:
+        if self.prompt_length is None:
+            self.prompt_length = input_ids.shape[1]
+        step = input_ids.shape[1] - self.prompt_length
+        forced = torch.full_like(scores, float("-inf"))
+        forced[:, self.token_ids[min(step, len(self.token_ids) - 1)]] = 0.0
+        return forced  # type: ignore[return-value]
+
+
+def _scripted(granite: tuple, script: str):
+    """Patch the granite model so generate follows script."""
+    processor, model = granite
+    token_ids = processor.tokenizer(script, add_special_tokens=False)["input_ids"]
+    generate = model.generate
+    return patch.object(
+        model,
+        "generate",
+        side_effect=lambda *args, **kwargs: generate(
+            *args, logits_processor=LogitsProcessorList([_Script(token_ids)]), **kwargs
+        ),
+    )
+
+
+def _scripted_generation(script: str) -> list[SegmentationResult]:
+    granite = tiny_granite_model()
+    with _scripted(granite, script):
+        return _generate_segmentations(
+            [Image.new("RGB", (32, 32))], ["the dog"], granite, 1
+        )
+
+
+def test_generation_stops_at_closing_tag() -> None:
+    mask_text = "<seg>others *576</seg>"
+    (result,) = _scripted_generation(mask_text + "\nrambling on and on")
+
+    assert result.text == mask_text
+    assert result.new_tokens == len(mask_text)
+    assert result.tokens_saved == SEGMENTATION_MAX_NEW_TOKENS - len(mask_text)
+
+
+def test_generation_stops_once_runs_fill_the_grid() -> None:
+    full = "<seg>others *500| dog *76\n"
+    (result,) = _scripted_generation(full + " others *9| dog *9| others *9")
+
+    assert result.text == full + "</seg>"
+    assert result.new_tokens == len(full)
+    assert result.tokens_saved > 0
+    decoded = decode_segmentation(result.text)
+    assert decoded is not None
+    assert int(decoded[0].gt(0).sum()) == 76
+
+
+# --- streaming tests ---
+
+
+def test_run_length_parser_grid_fills_reached_patches_only() -> None:
+    parser = RunLengthParser()
+    parser.feed("<seg>others *1| dog *2| cat *1|")
+    assert parser.grid(2, 3).tolist() == [[0, 1, 1], [2, 0, 0]]
+
+
+def test_stream_segmentation_yields_growing_mask_then_result(sam: tuple) -> None:
+    granite = tiny_granite_model()
+    script = "<seg>others *9| x *9\nx *99</seg>"
+    image = Image.new("RGB", (64, 48), (10, 200, 30))
+
+    with _scripted(granite, script):
+        updates = list(stream_segmentation(image, "the dog", granite, sam))
+
+    *progress, final = updates
+    assert [int(u.coarse.gt(0).sum()) for u in progress] == [0, 9, 108]
+    assert all(u.result is None for u in progress)
+    assert int(final.coarse.gt(0).sum()) == 108
+    assert final.result is not None
+    assert final.result.text == script
+    assert final.result.new_tokens == len(script)
+    assert final.result.mask is not None
+    assert final.result.mask.size == (64, 48)
+
+
+def test_stream_segmentation_without_mask_returns_none(sam: tuple) -> None:
+    granite = tiny_granite_model()
+    with _scripted(granite, "no mask here"):
+        (final,) = stream_segmentation(
+            Image.new("RGB", (32, 32)), "the dog", granite, sam
+        )
+    assert final.result is not None
+    assert final.result.mask is None
+    assert int(final.coarse.sum()) == 0
+
+
+def test_stream_segmentation_reraises_generation_errors(sam: tuple) -> None:
+    granite = tiny_granite_model()
+    with (
+        patch.object(granite[1], "generate", side_effect=RuntimeError("boom")),
+        pytest.raises(RuntimeError, match="boom"),
+    ):
+        list(stream_segmentation(Image.new("RGB", (32, 32)), "dog", granite, sam))
+
+
+def test_stream_segmentation_close_stops_generation(sam: tuple) -> None:
+    granite = tiny_granite_model()
+    with _scripted(granite, "<seg>" + "others *1| " * 10):
+        stream = stream_segmentation(Image.new("RGB", (32, 32)), "dog", granite, sam)
+        next(stream)
+        stream.close()
+    assert not any(t.name == "generation-stream" for t in threading.enumerate())
@@ -0,0 +1,70 @@
+"""Tests for the background generation stream."""
+
+import threading
+from unittest.mock import patch
+
+import pytest
+import torch
+
+from benchmarks.standins import tiny_granite_model
+from pipeline.streaming import GenerationStream, StopEvent
+
+
+def _inputs(processor, text: str = "hello") -> dict:
+    return dict(processor.tokenizer(text, return_tensors="pt"))
+
+
+def _running() -> bool:
+    return any(t.name == "generation-stream" for t in threading.enumerate())
+
+
+# --- GenerationStream tests ---
+
+
+def test_generation_stream_yields_text_and_output() -> None:
+    processor, model = tiny_granite_model()
+    inputs = _inputs(processor)
+
+    with GenerationStream(
+        model,
+        processor.tokenizer,
+        inputs,
+        max_new_tokens=8,
+    ) as stream:
+        text = "".join(stream)
+        output = stream.join()
+
+    prompt_length = inputs["input_ids"].shape[1]
+    assert text == processor.tokenizer.decode(
+        output[0, prompt_length:], skip_special_tokens=True
+    )
+    assert not _running()
+
+
+def test_generation_stream_reraises_errors_to_consumer() -> None:
+    processor, model = tiny_granite_model()
+    with (
+        patch.object(model, "generate", side_effect=RuntimeError("boom")),
+        GenerationStream(model, processor.tokenizer, {}) as stream,
+        pytest.raises(RuntimeError, match="boom"),
+    ):
+        list(stream)
+
+
+def test_generation_stream_close_stops_generation() -> None:
+    processor, model = tiny_granite_model()
+    with GenerationStream(
+        model, processor.tokenizer, _inputs(processor), max_new_tokens=8
+    ) as stream:
+        next(iter(stream))
+    assert not _running()
+
+
+def test_stop_event_stops_every_row_once_set() -> None:
+    event = threading.Event()
+    criterion = StopEvent(event)
+    input_ids = torch.zeros((2, 3), dtype=torch.long)
+    scores = torch.zeros((2, 5))
+    assert criterion(input_ids, scores).tolist() == [False, False]  # type: ignore[arg-type]
+    event.set()
+    assert criterion(input_ids, scores).tolist() == [True, True]  # type: ignore[arg-type]